@@ -1,111 +1,146 @@
 # backfill_nlp.py
 from __future__ import annotations
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional, Tuple
 
-from scraping.db import connect, init_db, upsert_nlp_score, upsert_extraction
+from scraping.db import connect, init_db, upsert_nlp_scores, upsert_extractions
 from scraping.settings import load_settings
+from scraping import maintenance
 
 from NLP.nlp_sentiment import score_text
 from NLP.entity_extract import extract_entities, dumps_list
+from NLP.delta import iter_text_batches
+from NLP.near_dup import copy_results, split_reusable
+from NLP.thread_context import inherit_context
 
 
 
 def now_utc_int() -> int:
     return int(datetime.now(tz=timezone.utc).timestamp())
 
-# v1 lists (replace with file-loading later)
-SHIP_KEYWORDS: List[str] = [
-    "Wonder of the Seas", "Icon of the Seas", "Oasis of the Seas",
-    "Symphony of the Seas", "Harmony of the Seas",
-]
+# v1 list, only used if NLP/ports.txt is missing (ships come from NLP/ships.txt)
 PORT_KEYWORDS: List[str] = [
     "Cozumel", "Costa Maya", "Belize City", "Roatan", "Nassau", "Labadee",
 ]
 
-def score_posts(conn):
-    cur = conn.cursor()
-    cur.execute("SELECT post_id, title, selftext FROM posts")
-    rows = cur.fetchall()
-    for i, (post_id, title, selftext) in enumerate(rows, start=1):
-        text = f"{title or ''}\n\n{selftext or ''}".strip()
-        s = score_text(text)
-
-        upsert_nlp_score(conn, {
-            "object_type": "post",
-            "object_id": post_id,
-            "sentiment_label": s.label,
-            "sentiment_score": s.score,
-            "severity_score": s.severity,
-            "model_version": "vader_v1",
-            "scored_at_utc": now_utc_int(),
-        })
-
-        ent = extract_entities(text, SHIP_KEYWORDS, PORT_KEYWORDS)
-        upsert_extraction(conn, {
-            "object_type": "post",
-            "object_id": post_id,
-            "cruise_line": ent.cruise_line,
-            "ship_ids": dumps_list(ent.ship_ids),
-            "port_ids": dumps_list(ent.port_ids),
-            "confidence": ent.confidence,
-            "extracted_at_utc": now_utc_int(),
-        })
+SENTIMENT_MODEL_VERSION = "vader_v1"
 
-        if i % 500 == 0:
-            conn.commit()
-            print(f"[POST NLP] processed {i}/{len(rows)}")
+# progress line every N objects
+LOG_EVERY = {"post": 500, "comment": 5000}
 
-    conn.commit()
-    print(f"[POST NLP] done: {len(rows)}")
 
-def score_comments(conn):
-    cur = conn.cursor()
-    cur.execute("SELECT comment_id, body, author FROM comments")
-    rows = cur.fetchall()
-    for i, (comment_id, body, author) in enumerate(rows, start=1):
-        # Skip obvious bot noise in v1
-        if author == "AutoModerator":
-            continue
-
-        text = (body or "").strip()
+def sentiment_rows(object_type: str, batch: List[Tuple[str, str]], ts: int) -> List[dict]:
+    rows = []
+    for object_id, text in batch:
         s = score_text(text)
-
-        upsert_nlp_score(conn, {
-            "object_type": "comment",
-            "object_id": comment_id,
+        rows.append({
+            "object_type": object_type,
+            "object_id": object_id,
             "sentiment_label": s.label,
             "sentiment_score": s.score,
             "severity_score": s.severity,
-            "model_version": "vader_v1",
-            "scored_at_utc": now_utc_int(),
+            "model_version": SENTIMENT_MODEL_VERSION,
+            "scored_at_utc": ts,
         })
+    return rows
+
 
-        ent = extract_entities(text, SHIP_KEYWORDS, PORT_KEYWORDS)
-        upsert_extraction(conn, {
-            "object_type": "comment",
-            "object_id": comment_id,
+def extraction_rows(object_type: str, batch: List[Tuple[str, str]], ts: int) -> List[dict]:
+    rows = []
+    for object_id, text in batch:
+        ent = extract_entities(text, ports=PORT_KEYWORDS)
+        rows.append({
+            "object_type": object_type,
+            "object_id": object_id,
             "cruise_line": ent.cruise_line,
             "ship_ids": dumps_list(ent.ship_ids),
             "port_ids": dumps_list(ent.port_ids),
             "confidence": ent.confidence,
-            "extracted_at_utc": now_utc_int(),
+            "extracted_at_utc": ts,
+            "line_source": ent.line_source,
+            "entity_source": "text" if ent.port_ids or ent.ship_ids else None,
         })
+    return rows
+
+
+def score_sentiment(
+    conn,
+    object_type: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Sentiment for posts/comments retrieved in (since, until]; one executemany + commit per batch.
+    Near-duplicate comments copy their cluster representative's scores (NLP/near_dup.py).
+    """
+    n = reused = 0
+    for batch in iter_text_batches(conn, object_type, since, until, batch_size, skip_automod=True):
+        ts = now_utc_int()
+        todo, reuse = batch, {}
+        if object_type == "comment":
+            todo, reuse = split_reusable(conn, "nlp_scores", batch, SENTIMENT_MODEL_VERSION)
+        upsert_nlp_scores(conn, sentiment_rows(object_type, todo, ts))
+        copy_results(conn, "nlp_scores", reuse, ts)
+        conn.commit()
+        reused += len(reuse)
+
+        prev, n = n, n + len(batch)
+        if n // LOG_EVERY[object_type] > prev // LOG_EVERY[object_type]:
+            print(f"[{object_type.upper()} SENTIMENT] processed {n}")
+
+    print(f"[{object_type.upper()} SENTIMENT] done: {n} ({reused} copied from near-duplicates)")
+    return n
+
+
+def extract_mentions(
+    conn,
+    object_type: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    batch_size: int = 1000,
+) -> int:
+    """Cruise line / ship / port extraction for posts/comments retrieved in (since, until]."""
+    n = reused = 0
+    for batch in iter_text_batches(conn, object_type, since, until, batch_size, skip_automod=True):
+        ts = now_utc_int()
+        todo, reuse = batch, {}
+        if object_type == "comment":
+            todo, reuse = split_reusable(conn, "extraction", batch)
+        upsert_extractions(conn, extraction_rows(object_type, todo, ts))
+        copy_results(conn, "extraction", reuse, ts)
+        conn.commit()
+        reused += len(reuse)
+
+        prev, n = n, n + len(batch)
+        if n // LOG_EVERY[object_type] > prev // LOG_EVERY[object_type]:
+            print(f"[{object_type.upper()} ENTITIES] processed {n}")
+
+    print(f"[{object_type.upper()} ENTITIES] done: {n} ({reused} copied from near-duplicates)")
+    return n
 
-        if i % 5000 == 0:
-            conn.commit()
-            print(f"[COMMENT NLP] processed {i}/{len(rows)}")
 
-    conn.commit()
-    print(f"[COMMENT NLP] done: {len(rows)}")
+def score_posts(conn):
+    score_sentiment(conn, "post")
+    extract_mentions(conn, "post")
+
+def score_comments(conn):
+    score_sentiment(conn, "comment")
+    extract_mentions(conn, "comment")
 
 def main():
     settings = load_settings()
     conn = connect(settings.sqlite_path)
     init_db(conn)
 
+    policy = maintenance.policy_from_settings(settings)
     score_posts(conn)
+    maintenance.at_stage_boundary(conn, "nlp posts", policy)
     score_comments(conn)
+    # re-extraction reset every comment's line / entities to its own text: take the thread's again
+    inherit_context(conn, "post")
+    inherit_context(conn, "comment")
+    maintenance.at_stage_boundary(conn, "nlp comments", policy)
 
     conn.close()
     print("Done NLP backfill.")
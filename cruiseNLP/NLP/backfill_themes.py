@@ -2,80 +2,89 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Iterable, Tuple
+from typing import List, Optional, Tuple
 
-from scraping.db import connect, init_db, upsert_theme
-from .theme_classifier import score_theme_hits, MODEL_VERSION
+from scraping.db import connect, init_db, upsert_themes, delete_themes
+from scraping.settings import load_settings
+from scraping import maintenance
+from .theme_classifier import score_theme_hits_batch, get_model_version
+from .delta import iter_text_batches
+from .near_dup import copy_results, split_reusable
 
 def now_utc_int() -> int:
     return int(datetime.now(tz=timezone.utc).timestamp())
 
-def iter_posts(conn) -> Iterable[Tuple[str, str]]:
-    cur = conn.cursor()
-    cur.execute("SELECT post_id, COALESCE(title,'') || ' ' || COALESCE(selftext,'') FROM posts")
-    yield from cur.fetchall()
-
-def iter_comments(conn) -> Iterable[Tuple[str, str]]:
-    cur = conn.cursor()
-    cur.execute("SELECT comment_id, COALESCE(body,'') FROM comments")
-    yield from cur.fetchall()
-
-def main():
-    import os
-    db_path = os.getenv("SQLITE_PATH", "scraping/cruise_reddit.db")
-
-    conn = connect(db_path)
-    init_db(conn)
-
-    ts = now_utc_int()
-
-    # Posts
-    post_count = 0
-    theme_rows = 0
-    for post_id, text in iter_posts(conn):
-        post_count += 1
-        hits = score_theme_hits(text, max_themes=3)
-        for h in hits:
-            upsert_theme(conn, {
-                "object_type": "post",
-                "object_id": post_id,
+# progress line every N objects
+LOG_EVERY = {"post": 1000, "comment": 20000}
+
+def theme_rows_for(object_type: str, batch: List[Tuple[str, str]], ts: int) -> List[dict]:
+    rows = []
+    model_version = get_model_version()
+    hits = score_theme_hits_batch([text for _, text in batch], max_themes=3)
+    for (object_id, _), object_hits in zip(batch, hits):
+        for h in object_hits:
+            rows.append({
+                "object_type": object_type,
+                "object_id": object_id,
                 "theme_label": h.label,
                 "theme_score": h.score,
-                "model_version": MODEL_VERSION,
+                "model_version": model_version,
                 "labeled_at_utc": ts,
             })
-            theme_rows += 1
-
-        if post_count % 1000 == 0:
-            conn.commit()
-            print(f"[POST THEMES] processed {post_count}")
-
-    conn.commit()
-    print(f"[POST THEMES] done: posts={post_count}, theme_rows_upserted={theme_rows}")
-
-    # Comments
-    comment_count = 0
+    return rows
+
+def replace_themes(conn, object_type: str, batch: List[Tuple[str, str]], rows: List[dict]) -> None:
+    """Drops the batch's old labels and writes the new ones (caller commits)."""
+    delete_themes(conn, object_type, [object_id for object_id, _ in batch])
+    upsert_themes(conn, rows)
+
+def label_themes(
+    conn,
+    object_type: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    batch_size: int = 1000,
+) -> Tuple[int, int]:
+    """
+    Themes for posts/comments retrieved in (since, until]. Each batch replaces
+    the objects' previous labels in one transaction; near-duplicate comments
+    copy their cluster representative's labels (NLP/near_dup.py).
+    Returns (objects, theme_rows).
+    """
+    count = 0
     theme_rows = 0
-    for comment_id, text in iter_comments(conn):
-        comment_count += 1
-        hits = score_theme_hits(text, max_themes=3)
-        for h in hits:
-            upsert_theme(conn, {
-                "object_type": "comment",
-                "object_id": comment_id,
-                "theme_label": h.label,
-                "theme_score": h.score,
-                "model_version": MODEL_VERSION,
-                "labeled_at_utc": ts,
-            })
-            theme_rows += 1
+    reused = 0
+    for batch in iter_text_batches(conn, object_type, since, until, batch_size):
+        ts = now_utc_int()
+        todo, reuse = batch, {}
+        if object_type == "comment":
+            todo, reuse = split_reusable(conn, "themes", batch, get_model_version())
+        rows = theme_rows_for(object_type, todo, ts)
+        replace_themes(conn, object_type, todo, rows)
+        copy_results(conn, "themes", reuse, ts)
+        conn.commit()
+        reused += len(reuse)
+
+        prev, count = count, count + len(batch)
+        theme_rows += len(rows)
+        if count // LOG_EVERY[object_type] > prev // LOG_EVERY[object_type]:
+            print(f"[{object_type.upper()} THEMES] processed {count}")
+
+    print(f"[{object_type.upper()} THEMES] done: {object_type}s={count}, theme_rows_upserted={theme_rows}, copied_from_near_duplicates={reused}")
+    return count, theme_rows
+
+def main():
+    # same database as ingestion and the NLP backfill (SQLITE_PATH)
+    settings = load_settings()
 
-        if comment_count % 20000 == 0:
-            conn.commit()
-            print(f"[COMMENT THEMES] processed {comment_count}")
+    conn = connect(settings.sqlite_path)
+    init_db(conn)
 
-    conn.commit()
-    print(f"[COMMENT THEMES] done: comments={comment_count}, theme_rows_upserted={theme_rows}")
+    policy = maintenance.policy_from_settings(settings)
+    label_themes(conn, "post")
+    maintenance.at_stage_boundary(conn, "themes posts", policy)
+    label_themes(conn, "comment")
+    maintenance.at_stage_boundary(conn, "themes comments", policy)
     print("Done themes backfill.")
 
     conn.close()
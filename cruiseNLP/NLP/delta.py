@@ -0,0 +1,80 @@
+# NLP/delta.py
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+# Incremental input for the NLP stages: rows whose retrieved_at_utc falls in
+# (since, until]. since=None means "everything up to until" (full backfill).
+# Both posts and comments get a fresh retrieved_at_utc whenever ingestion
+# rewrites them, so the window catches new *and* edited rows.
+
+# object_type -> (table, id column, text expression)
+SOURCES = {
+    "post": ("posts", "post_id", "COALESCE(title,'') || char(10) || char(10) || COALESCE(selftext,'')"),
+    "comment": ("comments", "comment_id", "COALESCE(body,'')"),
+}
+
+
+def now_utc_int() -> int:
+    return int(datetime.now(tz=timezone.utc).timestamp())
+
+
+def _window(since: Optional[int], until: Optional[int]) -> Tuple[str, list]:
+    where, params = [], []
+    if since is not None:
+        where.append("retrieved_at_utc > ?")
+        params.append(since)
+    if until is not None:
+        where.append("retrieved_at_utc <= ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+
+def delta_high(conn, object_type: str) -> int:
+    """
+    Upper bound for a stage run. Rows stamped in the current second are left for
+    the next run, since ingestion may still be writing more with the same stamp.
+    """
+    table = SOURCES[object_type][0]
+    (high,) = conn.execute(f"SELECT MAX(retrieved_at_utc) FROM {table}").fetchone()
+    return min(high or 0, now_utc_int() - 1)
+
+
+def count_delta(conn, object_type: str, since: Optional[int], until: Optional[int]) -> int:
+    table = SOURCES[object_type][0]
+    where, params = _window(since, until)
+    (n,) = conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()
+    return int(n)
+
+
+def iter_text_batches(
+    conn,
+    object_type: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    batch_size: int = 1000,
+    skip_automod: bool = False,
+) -> Iterator[List[Tuple[str, str]]]:
+    """
+    Yields lists of (object_id, text) so callers can write each batch with executemany.
+
+    Pages by rowid instead of holding one cursor open: a read transaction left
+    open across the caller's writes can't be upgraded once another stage has
+    committed (WAL snapshot), and would fail with "database is locked".
+    """
+    table, id_col, text_expr = SOURCES[object_type]
+    where, params = _window(since, until)
+    if skip_automod and object_type == "comment":
+        # Skip obvious bot noise in v1
+        where += (" AND " if where else " WHERE ") + "COALESCE(author,'') != 'AutoModerator'"
+    where += (" AND " if where else " WHERE ") + "rowid > ?"
+    sql = f"SELECT rowid, {id_col}, {text_expr} FROM {table}{where} ORDER BY rowid LIMIT ?"
+
+    last = -1
+    while True:
+        rows = conn.execute(sql, params + [last, batch_size]).fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [(oid, (text or "").strip()) for _, oid, text in rows]
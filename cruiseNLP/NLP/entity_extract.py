@@ -2,13 +2,19 @@
 from __future__ import annotations
 
 import json
+import os
 import re
+from functools import lru_cache
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 
 from .text_normalize import normalize_text
-from .ports_loader import load_ports_txt, PortDict
+from .ports_loader import load_ports_txt, load_ships_txt, PortDict, ShipDict
+from .fuzzy_match import FuzzyIndex
+
+# confidence given up per fuzzy hit (as a share of all hits of that kind)
+FUZZY_CONF_PENALTY = 0.1
 
 @dataclass
 class ExtractResult:
@@ -16,6 +22,7 @@ class ExtractResult:
     ship_ids: List[str]
     port_ids: List[str]
     confidence: float
+    line_source: Optional[str] = None  # 'text' (named in it), 'ship' (owner of a ship it names), None
 
 # ---- Cruise line patterns (normalized matching) ----
 # We run these against normalized text (accents removed, punctuation stripped),
@@ -31,6 +38,46 @@ CRUISE_LINE_PATTERNS: List[Tuple[str, List[str]]] = [
     ("Virgin",          [r"(?<!\w)virgin voyages(?!\w)", r"(?<!\w)virgin(?!\w)", r"(?<!\w)vv(?!\w)"]),
 ]
 
+@lru_cache(maxsize=1)
+def fuzzy_config() -> Tuple[bool, float]:
+    """
+    (ENTITY_FUZZY, ENTITY_FUZZY_MIN_SIM). ENTITY_FUZZY=1 also matches misspelled port /
+    ship names ("cozumal", "rotan"), see fuzzy_match.py; off by default. MIN_SIM is the
+    similarity a match needs. Read on first use, after load_settings() has loaded .env.
+    """
+    enabled = os.getenv("ENTITY_FUZZY", "0").strip() not in ("0", "false", "no", "")
+    return enabled, float(os.getenv("ENTITY_FUZZY_MIN_SIM", "0.8"))
+
+
+@lru_cache(maxsize=8)
+def cached_ports(ports_file: str) -> PortDict:
+    # parsed once per process instead of once per extract_entities() call;
+    # a missing file raises every time (exceptions aren't cached)
+    return load_ports_txt(ports_file)
+
+
+@lru_cache(maxsize=8)
+def cached_ships(ships_file: str) -> ShipDict:
+    return load_ships_txt(ships_file)
+
+
+@lru_cache(maxsize=8)
+def cached_fuzzy(load, path: str, min_similarity: float) -> FuzzyIndex:
+    # load: cached_ports or cached_ships
+    return FuzzyIndex(load(path), min_similarity)
+
+
+def warm_up(ports_file: str = "NLP/ports.txt", ships_file: str = "NLP/ships.txt") -> None:
+    fuzzy, min_sim = fuzzy_config()
+    for load, path in ((cached_ports, ports_file), (cached_ships, ships_file)):
+        try:
+            load(path)
+            if fuzzy:
+                cached_fuzzy(load, path, min_sim)
+        except FileNotFoundError:
+            pass
+
+
 def normalize_id(s: str) -> str:
     s = normalize_text(s)
     return s.replace(" ", "-")
@@ -47,31 +94,57 @@ def guess_cruise_line(text_norm: str) -> Tuple[Optional[str], float]:
                 return line, conf
     return None, 0.0
 
-def extract_ports(text_norm: str, ports: PortDict) -> Tuple[List[str], float]:
+def match_spans(text_norm: str, gazetteer: PortDict) -> List[Tuple[int, int, str]]:
     """
-    Exact match ports using aliases.
-    Multi-word aliases are matched first (aliases_sorted).
-    Uses word boundaries to avoid partial matches.
+    (start, end, id) of every alias in the text. One pass of the compiled matcher:
+    matches never overlap, and at each position the longest alias wins (so a
+    short alias doesn't match inside a longer one).
     """
-    found: List[str] = []
-    used_spans: List[Tuple[int, int]] = []
+    return [(m.start(), m.end(), gazetteer.alias_to_id[m.group(0)]) for m in gazetteer.matcher.finditer(text_norm)]
 
-    for alias_norm, port_id in ports.aliases_sorted:
-        # boundary match
-        m = re.search(rf"(?<!\w){re.escape(alias_norm)}(?!\w)", text_norm)
-        if not m:
-            continue
-
-        span = (m.start(), m.end())
+def match_ids(text_norm: str, gazetteer: PortDict) -> List[str]:
+    """Ids of every alias in the text, in order of first appearance."""
+    found: List[str] = []
+    for _, _, entity_id in match_spans(text_norm, gazetteer):
+        if entity_id not in found:
+            found.append(entity_id)
+    return found
 
-        # prevent overlap (so short alias doesn't match inside a longer one)
-        if any(not (span[1] <= s[0] or span[0] >= s[1]) for s in used_spans):
-            continue
+def fuzzy_ids(text_norm: str, spans: List[Tuple[int, int, str]], index: FuzzyIndex) -> List[str]:
+    """Ids matched only with a typo, in the words left over by the exact matches (spans)."""
+    tokens = text_norm.split(" ") if text_norm else []
+    if not any(index.candidates(tok) for tok in tokens):
+        return []  # the usual case: no word is one edit away from an alias token
+    taken = [False] * len(tokens)
+    if spans:
+        pos = 0
+        for i, tok in enumerate(tokens):
+            end = pos + len(tok)
+            taken[i] = any(s < end and pos < e for s, e, _ in spans)
+            pos = end + 1
+    return [entity_id for _, _, entity_id in index.find(tokens, taken)]
 
-        if port_id not in found:
-            found.append(port_id)
-            used_spans.append(span)
+def _match_with_fuzzy(text_norm: str, gazetteer: PortDict, fuzzy: Optional[FuzzyIndex]) -> Tuple[List[str], int]:
+    """Exact ids, then ids found only by the fuzzy index; also returns how many are fuzzy."""
+    spans = match_spans(text_norm, gazetteer)
+    found: List[str] = []
+    for _, _, entity_id in spans:
+        if entity_id not in found:
+            found.append(entity_id)
+    n_exact = len(found)
+    if fuzzy is not None:
+        for entity_id in fuzzy_ids(text_norm, spans, fuzzy):
+            if entity_id not in found:
+                found.append(entity_id)
+    return found, len(found) - n_exact
 
+def extract_ports(text_norm: str, ports: PortDict, fuzzy: Optional[FuzzyIndex] = None) -> Tuple[List[str], float]:
+    """
+    Exact match ports using aliases (ports.txt), multi-word aliases first.
+    Uses word boundaries to avoid partial matches. With a fuzzy index, misspelled
+    aliases count too, at a lower confidence.
+    """
+    found, fuzzy_hits = _match_with_fuzzy(text_norm, ports, fuzzy)
     if not found:
         return [], 0.0
 
@@ -83,13 +156,21 @@ def extract_ports(text_norm: str, ports: PortDict) -> Tuple[List[str], float]:
             multiword_hits += 1
 
     conf = min(0.95, 0.70 + 0.05 * len(found) + 0.05 * multiword_hits)
+    conf -= FUZZY_CONF_PENALTY * fuzzy_hits / len(found)
+    return found, conf
+
+def extract_ships(text_norm: str, ships: ShipDict, fuzzy: Optional[FuzzyIndex] = None) -> Tuple[List[str], float]:
+    """Exact match ships using the ships.txt aliases (same matcher as ports)."""
+    found, fuzzy_hits = _match_with_fuzzy(text_norm, ships, fuzzy)
+    if not found:
+        return [], 0.0
+    conf = min(0.9, 0.70 + 0.05 * len(found))
+    conf -= FUZZY_CONF_PENALTY * fuzzy_hits / len(found)
     return found, conf
 
 def extract_ships_v1(text_norm: str, ships: List[str]) -> Tuple[List[str], float]:
     """
-    Keep ships conservative for now (exact match only).
-    Ships are optional in your current pipeline.
-    Later we can add fuzzy matching with a high threshold.
+    Fallback when ships.txt is missing: exact match against a plain list of names.
     """
     if not ships:
         return [], 0.0
@@ -114,35 +195,55 @@ def extract_ships_v1(text_norm: str, ships: List[str]) -> Tuple[List[str], float
 
 def extract_entities(
     text: str,
-    ships: List[str],
-    ports: List[str],  # kept for backward compatibility; not used if ports.txt is present
+    ships: Sequence[str] = (),  # kept for backward compatibility; not used if ships.txt is present
+    ports: Sequence[str] = (),  # kept for backward compatibility; not used if ports.txt is present
     ports_file: str = "NLP/ports.txt",
+    ships_file: str = "NLP/ships.txt",
+    fuzzy: Optional[bool] = None,  # None = ENTITY_FUZZY (fuzzy_config())
 ) -> ExtractResult:
     """
-    v2 entity extraction:
+    v3 entity extraction:
     - normalize text (accents/punct/whitespace)
     - cruise line: regex patterns over normalized text
-    - ports: load from ports.txt with aliases; exact match multiword-first
-    - ships: conservative exact match only (for now)
+    - ports / ships: load from ports.txt / ships.txt with aliases; exact match multiword-first
+    - no line mentioned: the line that owns the first matched ship (ships.txt)
+    - fuzzy: also misspelled port / ship aliases (fuzzy_match.py)
     """
     text_norm = normalize_text(text or "")
+    enabled, min_sim = fuzzy_config()
+    fuzzy = enabled if fuzzy is None else fuzzy
 
     # cruise line
     line, line_conf = guess_cruise_line(text_norm)
+    line_source = "text" if line else None
 
     # ports (from file)
     port_ids: List[str] = []
     port_conf = 0.0
     try:
-        ports_dict = load_ports_txt(ports_file)
-        port_ids, port_conf = extract_ports(text_norm, ports_dict)
+        ports_dict = cached_ports(ports_file)
+        ports_fuzzy = cached_fuzzy(cached_ports, ports_file, min_sim) if fuzzy else None
+        port_ids, port_conf = extract_ports(text_norm, ports_dict, ports_fuzzy)
     except FileNotFoundError:
         # fallback: use provided ports list as exact matches (v1 behavior)
         port_ids = [normalize_id(p) for p in ports if p and re.search(rf"(?<!\w){re.escape(normalize_text(p))}(?!\w)", text_norm)]
         port_conf = 0.65 if port_ids else 0.0
 
-    # ships (conservative)
-    ship_ids, ship_conf = extract_ships_v1(text_norm, ships)
+    # ships (from file)
+    ship_owner: Dict[str, str] = {}
+    try:
+        ships_dict = cached_ships(ships_file)
+        ships_fuzzy = cached_fuzzy(cached_ships, ships_file, min_sim) if fuzzy else None
+        ship_ids, ship_conf = extract_ships(text_norm, ships_dict, ships_fuzzy)
+        ship_owner = ships_dict.line_of
+    except FileNotFoundError:
+        ship_ids, ship_conf = extract_ships_v1(text_norm, list(ships))
+
+    # "loved the Wonder OTS": the ship names its line even when the text doesn't
+    if not line:
+        owner = next((ship_owner[sid] for sid in ship_ids if sid in ship_owner), None)
+        if owner:
+            line, line_conf, line_source = owner, ship_conf, "ship"
 
     # overall confidence (weighted; line strongest, then ports, then ships)
     conf = 0.0
@@ -158,6 +259,7 @@ def extract_entities(
         ship_ids=ship_ids,
         port_ids=port_ids,
         confidence=round(float(conf), 3),
+        line_source=line_source,
     )
 
 def dumps_list(xs: List[str]) -> str:
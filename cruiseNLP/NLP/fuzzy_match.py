@@ -0,0 +1,144 @@
+# fuzzy_match.py
+"""
+Typo-tolerant matching of ports.txt / ships.txt aliases ("cozumal", "rotan",
+"harmony of the sea") at close to the cost of the exact matcher.
+
+Comparing every alias with every window of the text is far too slow, so
+candidates come from a symmetric-delete index over alias *tokens*:
+
+  - every alias token of 5+ letters, and the last word of a multi-word alias
+    (minus filler like "of" / "the"), is indexed under itself
+    and each string left after deleting one character ("cozumel" -> "ozumel",
+    "czumel", ..., "cozume")
+  - only text tokens that aren't alias tokens can start a fuzzy match (a typo
+    makes one); each is looked up under itself and its one-character deletes,
+    so two strings within one edit always meet on a shared key
+  - a hit on alias token k of an alias anchors a window of the alias's length
+    around the text token; it's kept only if its first character and length fit,
+    then verified with an edit distance (optimal string alignment, so a
+    transposition is one edit)
+
+A window is accepted when similarity = 1 - edits / max(len) is at least
+min_similarity (at most 2 edits), every aligned token is within one edit, and
+it isn't the alias plus a suffix ("dominican" is not Dominica).
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Set, Tuple
+
+from .ports_loader import PortDict
+
+# distinct text tokens whose index lookup is remembered; text vocabulary is Zipfian,
+# so after a few thousand documents nearly every token is a dict hit
+MEMO_TOKENS = 200_000
+
+# too common to anchor on ("the" -> "they", "then", ...); the other tokens of the alias still can
+ANCHOR_STOPWORDS = {"of", "the", "and", "st", "de", "la", "san", "port", "ots"}
+MAX_EDITS = 2
+
+
+def deletes1(s: str) -> Set[str]:
+    return {s[:i] + s[i + 1:] for i in range(len(s))}
+
+
+def osa_distance(a: str, b: str, max_d: int) -> int:
+    """Optimal string alignment distance, or max_d + 1 as soon as it must exceed max_d."""
+    if abs(len(a) - len(b)) > max_d:
+        return max_d + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+        if min(cur) > max_d:
+            return max_d + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class FuzzyIndex:
+    def __init__(self, gazetteer: PortDict, min_similarity: float = 0.8):
+        self.min_similarity = min_similarity
+        self.alias_to_id = gazetteer.alias_to_id
+        self.vocab: Set[str] = set()
+        # delete-key -> [(alias, index of the matching token in the alias)]
+        self.index: Dict[str, List[Tuple[str, int]]] = {}
+        for alias in gazetteer.alias_to_id:
+            tokens = alias.split(" ")
+            self.vocab.update(tokens)
+            for k, tok in enumerate(tokens):
+                # short tokens are one edit from too many words ("fort" / "for", "wish" / "with");
+                # only the last word of a longer alias may be short ("harmony of the sea")
+                last = k == len(tokens) - 1 and k > 0
+                if tok in ANCHOR_STOPWORDS or len(tok) < (3 if last else 5):
+                    continue
+                for key in deletes1(tok) | {tok}:
+                    self.index.setdefault(key, []).append((alias, k))
+        self._memo: Dict[str, Tuple[Tuple[str, int], ...]] = {}
+
+    def max_edits(self, length: int) -> int:
+        return min(MAX_EDITS, int((1.0 - self.min_similarity) * length + 1e-9))
+
+    def candidates(self, tok: str) -> Tuple[Tuple[str, int], ...]:
+        """(alias, token index) pairs a text token could be a misspelling of; () for alias tokens."""
+        hit = self._memo.get(tok)
+        if hit is None:
+            if tok in self.vocab or len(tok) < 3:
+                hit = ()
+            else:
+                found: Set[Tuple[str, int]] = set()
+                for key in deletes1(tok) | {tok}:
+                    found.update(self.index.get(key, ()))
+                hit = tuple(found)
+            if len(self._memo) >= MEMO_TOKENS:
+                self._memo.clear()
+            self._memo[tok] = hit
+        return hit
+
+    def _accept(self, window: List[str], alias: str) -> Optional[int]:
+        text = " ".join(window)
+        if text[0] != alias[0] or text.startswith(alias):
+            return None
+        max_d = self.max_edits(max(len(text), len(alias)))
+        if max_d == 0 or abs(len(text) - len(alias)) > max_d:
+            return None
+        d = osa_distance(text, alias, max_d)
+        if d > max_d or 1.0 - d / max(len(text), len(alias)) < self.min_similarity:
+            return None
+        alias_tokens = alias.split(" ")
+        if len(alias_tokens) == len(window) and any(
+            osa_distance(w, t, 1) > 1 for w, t in zip(window, alias_tokens)
+        ):
+            return None
+        return d
+
+    def find(self, tokens: List[str], taken: List[bool]) -> List[Tuple[int, int, str]]:
+        """
+        (first token, last token + 1, id) of fuzzy matches among `tokens`, skipping
+        tokens already taken (exact matches) and marking the ones it matches.
+        """
+        out: List[Tuple[int, int, str]] = []
+        for i, tok in enumerate(tokens):
+            candidates = self.candidates(tok)
+            if not candidates or taken[i]:
+                continue
+            best: Optional[Tuple[int, int, int, int, str]] = None  # (edits, -len, start, end, alias)
+            for alias, k in candidates:
+                n = alias.count(" ") + 1
+                start, end = i - k, i - k + n
+                if start < 0 or end > len(tokens) or tokens[start][0] != alias[0] or any(taken[start:end]):
+                    continue
+                d = self._accept(tokens[start:end], alias)
+                if d is not None and (best is None or (d, -len(alias)) < best[:2]):
+                    best = (d, -len(alias), start, end, alias)
+            if best is not None:
+                _, _, start, end, alias = best
+                for j in range(start, end):
+                    taken[j] = True
+                out.append((start, end, self.alias_to_id[alias]))
+        return out
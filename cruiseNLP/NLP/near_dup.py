@@ -0,0 +1,270 @@
+# NLP/near_dup.py
+"""
+Near-duplicate comments (cross-posts, copy-pasted complaints, bot templates):
+found once, then scored once per cluster and shown once per feed.
+
+Signatures are MinHash over word 3-shingles of the normalized text: each
+shingle is hashed once with SHAKE-128 (stable across processes) into SIG_BINS
+independent 32-bit values, and bin i keeps the minimum of value i over all
+shingles (column minimums, so both steps run in C). The share of equal bins
+of two signatures estimates the Jaccard similarity of their shingle sets.
+
+LSH: the signature is cut into BANDS bands of ROWS bins; each band hashes to a
+bucket in near_dup_bands. Two comments sharing any bucket are candidates
+(probability 1 - (1 - J^ROWS)^BANDS: 98% at J = 0.8, 10% at J = 0.4), and a
+candidate joins a cluster only if its estimated similarity is >= DUP_MIN_SIM.
+
+Clusters are keyed by their first-seen member (the representative); only
+representatives have band rows, so a new comment is compared against one
+signature per cluster. Indexing is incremental: new comments join a cluster
+or start one, a comment whose text changed is re-indexed, and when a
+representative's text changes its members are re-clustered.
+
+Comments under DUP_MIN_TOKENS words ("this", "me too") aren't indexed.
+"""
+from __future__ import annotations
+
+import operator
+import os
+import struct
+from functools import lru_cache
+from hashlib import blake2b, shake_128
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .delta import iter_text_batches, now_utc_int
+from .text_normalize import normalize_text
+
+BANDS = 10
+ROWS = 5
+SIG_BINS = BANDS * ROWS
+SHINGLE = 3
+
+_SIG = struct.Struct(f"<{SIG_BINS}I")
+
+# progress line every N comments
+LOG_EVERY = 20000
+
+
+@lru_cache(maxsize=1)
+def dup_config() -> Tuple[int, float]:
+    """(DUP_MIN_TOKENS, DUP_MIN_SIM), read on first use, after load_settings() has loaded .env."""
+    return int(os.getenv("DUP_MIN_TOKENS", "5")), float(os.getenv("DUP_MIN_SIM", "0.8"))
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "little")
+
+
+def signature(text: str) -> Optional[bytes]:
+    """Packed MinHash signature, or None for text too short to index."""
+    tokens = normalize_text(text or "").split()
+    if len(tokens) < dup_config()[0]:
+        return None
+    shingles = {" ".join(tokens[i:i + SHINGLE]) for i in range(len(tokens) - SHINGLE + 1)}
+    rows = (_SIG.unpack(shake_128(sh.encode("utf-8")).digest(_SIG.size)) for sh in shingles)
+    return _SIG.pack(*map(min, zip(*rows)))
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(map(operator.eq, _SIG.unpack(a), _SIG.unpack(b))) / SIG_BINS
+
+
+def band_keys(sig: bytes) -> List[Tuple[int, int]]:
+    """(band, bucket) per band; buckets are signed 64-bit so they fit an SQLite INTEGER."""
+    width = ROWS * 4
+    return [
+        (band, _hash64(bytes([band]) + sig[band * width:(band + 1) * width]) - (1 << 63))
+        for band in range(BANDS)
+    ]
+
+
+# ---- index ----
+def _find_cluster(conn, sig: bytes) -> Optional[str]:
+    keys = band_keys(sig)
+    rows = conn.execute(
+        f"""
+        WITH k(band, bucket) AS (VALUES {', '.join(['(?, ?)'] * len(keys))})
+        SELECT DISTINCT d.comment_id, d.signature
+        FROM k
+        JOIN near_dup_bands b ON b.band = k.band AND b.bucket = k.bucket
+        JOIN near_dups d ON d.comment_id = b.comment_id
+        """,
+        [x for key in keys for x in key],
+    ).fetchall()
+    best, best_sim = None, dup_config()[1]
+    for rep, rep_sig in rows:
+        sim = similarity(sig, rep_sig)
+        if sim >= best_sim:
+            best, best_sim = rep, sim
+    return best
+
+
+def _assign(conn, comment_id: str, sig: bytes, ts: int) -> bool:
+    """Adds a comment to the closest cluster, or starts one. True if it joined a cluster."""
+    rep = _find_cluster(conn, sig)
+    conn.execute(
+        "INSERT INTO near_dups (comment_id, cluster_id, signature, indexed_at_utc) VALUES (?, ?, ?, ?)",
+        (comment_id, rep or comment_id, sig, ts),
+    )
+    if rep is None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO near_dup_bands (band, bucket, comment_id) VALUES (?, ?, ?)",
+            [(band, bucket, comment_id) for band, bucket in band_keys(sig)],
+        )
+    return rep is not None
+
+
+def _drop(conn, comment_id: str, sig: bytes, cluster_id: str, ts: int) -> None:
+    """Removes a comment; a representative's members are re-clustered (the oldest may take over)."""
+    conn.execute("DELETE FROM near_dups WHERE comment_id = ?", (comment_id,))
+    if cluster_id != comment_id:
+        return
+    conn.executemany(
+        "DELETE FROM near_dup_bands WHERE band = ? AND bucket = ? AND comment_id = ?",
+        [(band, bucket, comment_id) for band, bucket in band_keys(sig)],
+    )
+    members = conn.execute(
+        "SELECT comment_id, signature FROM near_dups WHERE cluster_id = ? ORDER BY rowid", (comment_id,)
+    ).fetchall()
+    conn.execute("DELETE FROM near_dups WHERE cluster_id = ?", (comment_id,))
+    for member, member_sig in members:
+        _assign(conn, member, member_sig, ts)
+
+
+def index_comments(conn, batch: Sequence[Tuple[str, str]], ts: Optional[int] = None) -> int:
+    """
+    Indexes (comment_id, text) pairs, skipping ones whose signature is unchanged.
+    Returns how many joined an existing cluster. Doesn't commit.
+    """
+    ts = ts or now_utc_int()
+    ids = [oid for oid, _ in batch]
+    known: Dict[str, Tuple[bytes, str]] = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        for oid, sig, cluster_id in conn.execute(
+            f"SELECT comment_id, signature, cluster_id FROM near_dups WHERE comment_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ):
+            known[oid] = (sig, cluster_id)
+
+    joined = 0
+    for oid, text in batch:
+        sig = signature(text)
+        old = known.get(oid)
+        if old is not None:
+            if old[0] == sig:
+                continue
+            # re-read: dropping an earlier representative in this batch may have re-clustered this comment
+            old = conn.execute(
+                "SELECT signature, cluster_id FROM near_dups WHERE comment_id = ?", (oid,)
+            ).fetchone()
+            _drop(conn, oid, old[0], old[1], ts)
+        if sig is not None:
+            joined += _assign(conn, oid, sig, ts)
+    return joined
+
+
+def index_near_dups(
+    conn,
+    object_type: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    batch_size: int = 1000,
+) -> int:
+    """Pipeline stage: indexes comments retrieved in (since, until]; posts aren't clustered."""
+    if object_type != "comment":
+        return 0
+    n = joined = 0
+    for batch in iter_text_batches(conn, "comment", since, until, batch_size):
+        joined += index_comments(conn, batch)
+        conn.commit()
+
+        prev, n = n, n + len(batch)
+        if n // LOG_EVERY > prev // LOG_EVERY:
+            print(f"[COMMENT DEDUP] processed {n}")
+
+    print(f"[COMMENT DEDUP] done: {n} indexed, {joined} near-duplicates")
+    return n
+
+
+# ---- reuse ----
+# table -> SQL copying the representative's row to each member in dup_reuse (:ts = new timestamp)
+_COPY_SQL = {
+    "nlp_scores": """
+        INSERT OR REPLACE INTO nlp_scores (
+          object_type, object_id, sentiment_label, sentiment_score, severity_score,
+          model_version, scored_at_utc
+        )
+        SELECT 'comment', m.member, r.sentiment_label, r.sentiment_score, r.severity_score,
+               r.model_version, :ts
+        FROM dup_reuse m
+        JOIN nlp_scores r ON r.object_type = 'comment' AND r.object_id = m.rep
+    """,
+    # only what the representative's own text gave: thread context is the member's own (inherit stage)
+    "extraction": """
+        INSERT OR REPLACE INTO extraction (
+          object_type, object_id, cruise_line, ship_ids, port_ids, confidence,
+          extracted_at_utc, line_source, entity_source
+        )
+        SELECT 'comment', m.member,
+               CASE WHEN r.line_source IN ('post', 'subreddit') THEN NULL ELSE r.cruise_line END,
+               CASE WHEN r.entity_source = 'post' THEN '[]' ELSE r.ship_ids END,
+               CASE WHEN r.entity_source = 'post' THEN '[]' ELSE r.port_ids END,
+               r.confidence, :ts,
+               CASE WHEN r.line_source IN ('post', 'subreddit') THEN NULL ELSE r.line_source END,
+               CASE WHEN r.entity_source = 'post' THEN NULL ELSE r.entity_source END
+        FROM dup_reuse m
+        JOIN extraction r ON r.object_type = 'comment' AND r.object_id = m.rep
+    """,
+    "themes": """
+        INSERT INTO themes (object_type, object_id, theme_label, theme_score, model_version, labeled_at_utc)
+        SELECT 'comment', m.member, r.theme_label, r.theme_score, r.model_version, :ts
+        FROM dup_reuse m
+        JOIN themes r ON r.object_type = 'comment' AND r.object_id = m.rep
+    """,
+}
+
+
+def split_reusable(
+    conn,
+    table: str,
+    batch: Sequence[Tuple[str, str]],
+    model_version: Optional[str] = None,
+) -> Tuple[List[Tuple[str, str]], Dict[str, str]]:
+    """
+    Splits a comment batch into (to score, {member: representative}): members whose
+    representative is outside the batch and already has a row in `table` (of
+    model_version, where the table has one) are copied instead of scored.
+    """
+    ids = [oid for oid, _ in batch]
+    in_batch = set(ids)
+    version = " AND r.model_version = ?" if model_version else ""
+    reuse: Dict[str, str] = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        rows = conn.execute(
+            f"""
+            SELECT d.comment_id, d.cluster_id FROM near_dups d
+            WHERE d.comment_id IN ({','.join('?' * len(chunk))})
+              AND d.cluster_id != d.comment_id
+              AND EXISTS (SELECT 1 FROM {table} r
+                          WHERE r.object_type = 'comment' AND r.object_id = d.cluster_id{version})
+            """,
+            chunk + ([model_version] if model_version else []),
+        )
+        reuse.update((member, rep) for member, rep in rows if rep not in in_batch)
+    return [(oid, text) for oid, text in batch if oid not in reuse], reuse
+
+
+def copy_results(conn, table: str, reuse: Dict[str, str], ts: int) -> None:
+    """Writes each member's copy of its representative's `table` rows (caller commits)."""
+    if not reuse:
+        return
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS dup_reuse (member TEXT PRIMARY KEY, rep TEXT NOT NULL)")
+    conn.execute("DELETE FROM dup_reuse")
+    conn.executemany("INSERT INTO dup_reuse (member, rep) VALUES (?, ?)", list(reuse.items()))
+    if table == "themes":
+        conn.execute("DELETE FROM themes WHERE object_type = 'comment' AND object_id IN (SELECT member FROM dup_reuse)")
+    conn.execute(_COPY_SQL[table], {"ts": ts})
+    conn.execute("DELETE FROM dup_reuse")
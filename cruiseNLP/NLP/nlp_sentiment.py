@@ -1,9 +1,28 @@
 # nlp_sentiment.py
 from __future__ import annotations
+import threading
 from dataclasses import dataclass
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-analyzer = SentimentIntensityAnalyzer()
+# VADER (package import + lexicon parse, ~30ms) is loaded on the first score_text()
+# call, not at import: CLIs that only need --help / --dry-run and the API never pay it.
+# Long-running workers call warm_up() at startup so the first batch doesn't either.
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def warm_up() -> None:
+    get_analyzer()
+
 
 @dataclass
 class SentimentResult:
@@ -20,7 +39,7 @@ def score_text(text: str) -> SentimentResult:
     if not text:
         return SentimentResult("neu", 0.0, 0.0)
 
-    vs = analyzer.polarity_scores(text)
+    vs = get_analyzer().polarity_scores(text)
     compound = float(vs["compound"])
 
     if compound >= 0.05:
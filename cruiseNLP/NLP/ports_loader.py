@@ -1,7 +1,8 @@
 # ports_loader.py
+import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Pattern, Tuple
 
 from .text_normalize import normalize_text
 
@@ -11,40 +12,66 @@ class PortDict:
     canonical: Dict[str, str]              # port_id -> Canonical Name
     alias_to_id: Dict[str, str]            # normalized alias -> port_id
     aliases_sorted: List[Tuple[str, str]]  # (alias_norm, port_id) sorted by alias length desc
+    line_of: Dict[str, str]                # id -> owning cruise line (ships.txt third column; empty for ports)
+    matcher: Pattern[str]                  # every alias in one alternation, longest first, word-bounded
+
+# ships.txt has the same layout (plus the owning line), and loads into the same structure
+ShipDict = PortDict
 
 def slugify(name: str) -> str:
     return normalize_text(name).replace(" ", "-")
 
-def load_ports_txt(path: str) -> PortDict:
+def compile_matcher(aliases_sorted: List[Tuple[str, str]]) -> Pattern[str]:
+    # one scan of the text instead of one re.search per alias; at each position the
+    # longest alias wins because the alternation is ordered longest first
+    alts = "|".join(re.escape(a) for a, _ in aliases_sorted) or r"(?!x)x"
+    return re.compile(rf"(?<!\w)(?:{alts})(?!\w)")
+
+def load_gazetteer(path: str) -> PortDict:
+    """
+    One entry per line: Canonical|alias, alias, ...|Cruise Line
+    (aliases and the line are optional; '#' starts a comment line)
+    """
     p = Path(path)
     if not p.exists():
-        raise FileNotFoundError(f"ports file not found: {path}")
+        raise FileNotFoundError(f"gazetteer file not found: {path}")
 
     canonical: Dict[str, str] = {}
     alias_to_id: Dict[str, str] = {}
+    line_of: Dict[str, str] = {}
 
     for raw in p.read_text(encoding="utf-8").splitlines():
         line = raw.strip()
         if not line or line.startswith("#"):
             continue
 
-        if "|" in line:
-            canon, alias_part = line.split("|", 1)
-            canon = canon.strip()
-            aliases = [a.strip() for a in alias_part.split(",") if a.strip()]
-        else:
-            canon = line
-            aliases = []
+        parts = [x.strip() for x in line.split("|")]
+        canon = parts[0]
+        aliases = [a.strip() for a in parts[1].split(",") if a.strip()] if len(parts) > 1 else []
 
-        port_id = slugify(canon)
-        canonical[port_id] = canon
+        entity_id = slugify(canon)
+        canonical[entity_id] = canon
+        if len(parts) > 2 and parts[2]:
+            line_of[entity_id] = parts[2]
 
         # include canonical as alias too
         all_aliases = aliases + [canon]
         for a in all_aliases:
             an = normalize_text(a)
             if an:
-                alias_to_id[an] = port_id
+                alias_to_id[an] = entity_id
 
     aliases_sorted = sorted(alias_to_id.items(), key=lambda x: len(x[0]), reverse=True)
-    return PortDict(canonical=canonical, alias_to_id=alias_to_id, aliases_sorted=aliases_sorted)
+    return PortDict(
+        canonical=canonical,
+        alias_to_id=alias_to_id,
+        aliases_sorted=aliases_sorted,
+        line_of=line_of,
+        matcher=compile_matcher(aliases_sorted),
+    )
+
+def load_ports_txt(path: str) -> PortDict:
+    return load_gazetteer(path)
+
+def load_ships_txt(path: str) -> ShipDict:
+    return load_gazetteer(path)
@@ -0,0 +1,153 @@
+# NLP/stream_scorer.py
+"""
+Streaming NLP consumer: scores posts/comments seconds after ingestion writes them,
+instead of waiting for the next backfill / pipeline run.
+
+  STREAM_SCORING=1 python run_ingest.py        # (from scraping/) queues new + changed rows
+  python -m NLP.stream_scorer                   # (from cruiseNLP/) drains the queue continuously
+  python -m NLP.stream_scorer --once            # drain what's queued, then exit
+
+Each micro-batch runs sentiment, extraction and themes and writes all three in
+one transaction together with removing the batch from scoring_queue, so a crash
+never loses or half-applies a batch. The API computes its aggregates at query
+time, so updated scores show up in feeds and rollups as soon as the batch commits.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+from scraping.db import connect, init_db, upsert_nlp_scores, upsert_extractions
+from scraping.settings import load_settings
+from scraping import maintenance
+
+from NLP.backfill_nlp import SENTIMENT_MODEL_VERSION, sentiment_rows, extraction_rows
+from NLP.backfill_themes import theme_rows_for, replace_themes
+from NLP.delta import SOURCES, now_utc_int
+from NLP.near_dup import copy_results, index_comments, split_reusable
+from NLP.theme_classifier import get_model_version as theme_model_version
+from NLP.thread_context import inherit_for
+from NLP import entity_extract, nlp_sentiment
+
+
+def claim_batch(conn, limit: int) -> List[Tuple[int, str, str, int]]:
+    """Oldest queued entries: (seq, object_type, object_id, enqueued_utc)."""
+    return conn.execute(
+        "SELECT seq, object_type, object_id, enqueued_utc FROM scoring_queue ORDER BY seq LIMIT ?",
+        (limit,),
+    ).fetchall()
+
+
+def load_texts(conn, object_type: str, ids: List[str]) -> Dict[str, Tuple[str, str]]:
+    """object_id -> (text, author); ids deleted since they were queued are simply missing."""
+    table, id_col, text_expr = SOURCES[object_type]
+    out: Dict[str, Tuple[str, str]] = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            f"SELECT {id_col}, {text_expr}, COALESCE(author,'') FROM {table} WHERE {id_col} IN ({marks})",
+            chunk,
+        )
+        for oid, text, author in cur:
+            out[oid] = ((text or "").strip(), author)
+    return out
+
+
+def score_batch(conn, entries: List[Tuple[int, str, str, int]]) -> int:
+    ts = now_utc_int()
+    for object_type in SOURCES:
+        ids = [oid for _, ot, oid, _ in entries if ot == object_type]
+        if not ids:
+            continue
+        texts = load_texts(conn, object_type, ids)
+        batch = [(oid, texts[oid][0]) for oid in ids if oid in texts]
+        # Skip obvious bot noise in v1 (themes still label it, like the backfill)
+        scored = [(oid, text) for oid, text in batch if texts[oid][1] != "AutoModerator"]
+
+        if object_type != "comment":
+            upsert_nlp_scores(conn, sentiment_rows(object_type, scored, ts))
+            upsert_extractions(conn, extraction_rows(object_type, scored, ts))
+            replace_themes(conn, object_type, batch, theme_rows_for(object_type, batch, ts))
+            continue
+
+        # near-duplicates of already scored comments copy their results
+        index_comments(conn, batch, ts)
+        todo, reuse = split_reusable(conn, "nlp_scores", scored, SENTIMENT_MODEL_VERSION)
+        upsert_nlp_scores(conn, sentiment_rows(object_type, todo, ts))
+        copy_results(conn, "nlp_scores", reuse, ts)
+        todo, reuse = split_reusable(conn, "extraction", scored)
+        upsert_extractions(conn, extraction_rows(object_type, todo, ts))
+        copy_results(conn, "extraction", reuse, ts)
+        todo, reuse = split_reusable(conn, "themes", batch, theme_model_version())
+        replace_themes(conn, object_type, todo, theme_rows_for(object_type, todo, ts))
+        copy_results(conn, "themes", reuse, ts)
+
+    # new comments take their thread's context; a re-scored post passes its entities on
+    inherit_for(
+        conn,
+        post_ids=[oid for _, ot, oid, _ in entries if ot == "post"],
+        comment_ids=[oid for _, ot, oid, _ in entries if ot == "comment"],
+    )
+    conn.executemany("DELETE FROM scoring_queue WHERE seq = ?", [(seq,) for seq, _, _, _ in entries])
+    conn.commit()
+    return len(entries)
+
+
+def run(conn, batch_size: int, poll_seconds: float, once: bool = False,
+        maint_policy: Optional[maintenance.MaintenancePolicy] = None) -> int:
+    total = 0
+    maintained_at = 0
+    while True:
+        entries = claim_batch(conn, batch_size)
+        if not entries:
+            # queue drained: a natural stage boundary (only if something was written since the last one)
+            if maint_policy is not None and total > maintained_at:
+                maintenance.at_stage_boundary(conn, "stream", maint_policy)
+                maintained_at = total
+            if once:
+                return total
+            time.sleep(poll_seconds)
+            continue
+
+        t0 = time.perf_counter()
+        n = score_batch(conn, entries)
+        total += n
+        lag = now_utc_int() - min(e[3] for e in entries)
+        (backlog,) = conn.execute("SELECT COUNT(*) FROM scoring_queue").fetchone()
+        print(f"[STREAM] scored {n} in {(time.perf_counter() - t0) * 1000:.0f}ms, "
+              f"oldest lag {lag}s, backlog {backlog}, total {total}")
+
+
+def main():
+    settings = load_settings()
+    ap = argparse.ArgumentParser(description="Score queued posts/comments in micro-batches")
+    ap.add_argument("--batch-size", type=int, default=settings.stream_batch_size)
+    ap.add_argument("--poll-seconds", type=float, default=settings.stream_poll_seconds)
+    ap.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = ap.parse_args()
+
+    conn = connect(settings.sqlite_path)
+    init_db(conn)
+    conn.execute("PRAGMA busy_timeout=60000;")  # ingestion's writer holds the lock during flushes
+
+    # load the VADER lexicon and ports.txt (and hash the theme model) now, so the first
+    # micro-batch's lag doesn't include them and a bad THEME_ENGINE fails here
+    t0 = time.perf_counter()
+    nlp_sentiment.warm_up()
+    entity_extract.warm_up()
+    theme_model_version()
+    print(f"[STREAM] warmed up in {(time.perf_counter() - t0) * 1000:.0f}ms")
+
+    try:
+        total = run(conn, args.batch_size, args.poll_seconds, once=args.once,
+                    maint_policy=maintenance.policy_from_settings(settings))
+        print(f"Done streaming scorer: {total} scored.")
+    except KeyboardInterrupt:
+        print("Stopped streaming scorer.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,51 @@
 # NLP/theme_classifier.py
 from __future__ import annotations
 
+import hashlib
+import os
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
 
 from .text_normalize import normalize_text
 
-MODEL_VERSION = "themes_v1_rules_2025-12-28"
+RULES_MODEL_VERSION = "themes_v1_rules_2025-12-28"
+
+DEFAULT_MODEL_PATH = str(Path(__file__).with_name("theme_model.npz"))
+
+
+@lru_cache(maxsize=1)
+def get_theme_engine() -> Tuple[str, str]:
+    """
+    (THEME_ENGINE, THEME_MODEL_PATH): rules (keyword counts, below) or linear (hashing
+    vectorizer + trained weights, theme_linear.py; needs numpy and a model from
+    `python -m NLP.theme_linear train`). Read on first use, after load_settings() has
+    loaded .env, so importing this module never fails.
+    """
+    engine = os.getenv("THEME_ENGINE", "rules").strip().lower()
+    if engine not in ("rules", "linear"):
+        raise ValueError(f"THEME_ENGINE must be 'rules' or 'linear', not {engine!r}")
+    return engine, os.getenv("THEME_MODEL_PATH", "").strip() or DEFAULT_MODEL_PATH
+
+
+def linear_model_version(path: str) -> str:
+    """Tied to the weights file, so retraining relabels everything on the next --full run."""
+    try:
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError as e:
+        raise FileNotFoundError(
+            f"THEME_ENGINE=linear but no theme model at {path} (python -m NLP.theme_linear train --db <sqlite db>)"
+        ) from e
+    return f"themes_v2_linear_{digest[:10]}"
+
+
+@lru_cache(maxsize=1)
+def get_model_version() -> str:
+    """model_version of the labels the configured engine writes."""
+    engine, path = get_theme_engine()
+    return RULES_MODEL_VERSION if engine == "rules" else linear_model_version(path)
 
 @dataclass(frozen=True)
 class ThemeHit:
@@ -120,3 +159,11 @@ def score_theme_hits(text: str, max_themes: int = 3) -> List[ThemeHit]:
     # prioritize higher hits, then higher score
     hits.sort(key=lambda x: (x.hits, x.score), reverse=True)
     return hits[:max_themes]
+
+def score_theme_hits_batch(texts: Sequence[str], max_themes: int = 3) -> List[List[ThemeHit]]:
+    """Themes for a batch of texts with the THEME_ENGINE engine (get_model_version() labels the result)."""
+    engine, path = get_theme_engine()
+    if engine == "linear":
+        from .theme_linear import load_model
+        return load_model(path).hits_batch(texts, max_themes)
+    return [score_theme_hits(t, max_themes=max_themes) for t in texts]
@@ -0,0 +1,276 @@
+# NLP/theme_linear.py
+"""
+Linear theme engine (THEME_ENGINE=linear, see theme_classifier.py): a hashing
+vectorizer and one logistic regression per theme, stored as a NumPy weight
+matrix and scored a whole batch at a time.
+
+  features   unigrams and bigrams of the normalized text, crc32-hashed into
+             n_features buckets (binary; no vocabulary to keep in sync)
+  scoring    X (batch x n_features, sparse CSR) @ W (n_features x themes) + b,
+             sigmoid; themes with p >= threshold, most probable first
+  training   offline, from the rules engine's labels (uncapped) plus manual
+             corrections; full-batch logistic regression with Adagrad and L2
+
+Only the rows of W for features seen in training are stored (model .npz:
+feature_ids, weights, bias, labels, meta). Needs numpy (pip install numpy).
+
+Train from cruiseNLP/:
+  python -m NLP.theme_linear train --db cruise_reddit.db --out NLP/theme_model.npz
+  python -m NLP.theme_linear train --db cruise_reddit.db --corrections fixes.csv --epochs 60
+
+corrections.csv: object_type,object_id,theme_label,label (1 = has the theme, 0 = doesn't)
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .text_normalize import normalize_text
+from .theme_classifier import THEME_KEYWORDS, ThemeHit, score_theme_hits
+
+N_FEATURES = 1 << 18
+THRESHOLD = 0.5
+
+
+# ---- features ----
+def feature_ids(text: str, n_features: int = N_FEATURES) -> Set[int]:
+    tokens = normalize_text(text or "").split()
+    mask = n_features - 1
+    grams = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+    return {zlib.crc32(g.encode("utf-8")) & mask for g in grams}
+
+
+def vectorize(texts: Sequence[str], n_features: int = N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR structure (indptr, indices) of the binary feature matrix; every stored value is 1."""
+    indptr = [0]
+    indices: List[int] = []
+    for t in texts:
+        indices.extend(feature_ids(t, n_features))
+        indptr.append(len(indices))
+    return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64)
+
+
+def _row_sums(values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Per-row sums of CSR values (nnz x k) -> (rows x k); empty rows give 0."""
+    rows = len(indptr) - 1
+    out = np.zeros((rows, values.shape[1]), dtype=np.float64)
+    if rows == 0 or len(values) == 0:
+        return out
+    nonempty = indptr[1:] > indptr[:-1]
+    out[nonempty] = np.add.reduceat(values, indptr[:-1][nonempty], axis=0)
+    return out
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30.0, 30.0)))
+
+
+# ---- model ----
+@dataclass
+class LinearThemeModel:
+    labels: List[str]
+    weights: np.ndarray        # n_features x labels (float32)
+    bias: np.ndarray           # labels
+    n_features: int = N_FEATURES
+    threshold: float = THRESHOLD
+    meta: Dict[str, object] = field(default_factory=dict)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Batch x labels probabilities: one sparse x dense product for the whole batch."""
+        indptr, indices = vectorize(texts, self.n_features)
+        return _sigmoid(_row_sums(self.weights[indices], indptr) + self.bias)
+
+    def hits_batch(self, texts: Sequence[str], max_themes: int = 3) -> List[List[ThemeHit]]:
+        indptr, indices = vectorize(texts, self.n_features)
+        gathered = self.weights[indices]
+        proba = _sigmoid(_row_sums(gathered, indptr) + self.bias)
+        # "hits": how many of the text's features push towards the theme (the rules engine counts keywords)
+        support = _row_sums((gathered > 0).astype(np.float64), indptr)
+        out: List[List[ThemeHit]] = []
+        for p, s in zip(proba, support):
+            ranked = [j for j in np.argsort(-p, kind="stable")[:max_themes] if p[j] >= self.threshold]
+            out.append([ThemeHit(label=self.labels[j], score=round(float(p[j]), 3), hits=int(s[j])) for j in ranked])
+        return out
+
+
+def save_model(model: LinearThemeModel, path: str) -> None:
+    used = np.flatnonzero(np.any(model.weights != 0, axis=1))
+    np.savez_compressed(
+        path,
+        feature_ids=used.astype(np.int64),
+        weights=model.weights[used],
+        bias=model.bias.astype(np.float32),
+        labels=np.asarray(model.labels),
+        n_features=np.int64(model.n_features),
+        threshold=np.float64(model.threshold),
+        meta=np.asarray(json.dumps(model.meta)),
+    )
+
+
+@lru_cache(maxsize=4)
+def load_model(path: str) -> LinearThemeModel:
+    try:
+        z = np.load(path, allow_pickle=False)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(
+            f"theme model not found: {path} (train one: python -m NLP.theme_linear train --db <sqlite db>)"
+        ) from e
+    n_features = int(z["n_features"])
+    weights = np.zeros((n_features, len(z["labels"])), dtype=np.float32)
+    weights[z["feature_ids"]] = z["weights"]
+    return LinearThemeModel(
+        labels=[str(x) for x in z["labels"]],
+        weights=weights,
+        bias=z["bias"].astype(np.float64),
+        n_features=n_features,
+        threshold=float(z["threshold"]),
+        meta=json.loads(str(z["meta"])),
+    )
+
+
+# ---- training ----
+def train(
+    texts: Sequence[str],
+    label_sets: Sequence[Set[str]],
+    labels: Sequence[str] = tuple(THEME_KEYWORDS),
+    n_features: int = N_FEATURES,
+    epochs: int = 40,
+    lr: float = 1.5,
+    l2: float = 1e-4,
+) -> LinearThemeModel:
+    """One-vs-rest logistic regression on binary hashed features (full batch, Adagrad)."""
+    indptr, indices = vectorize(texts, n_features)
+    rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+    col = {label: j for j, label in enumerate(labels)}
+    y = np.zeros((len(texts), len(labels)), dtype=np.float64)
+    for i, s in enumerate(label_sets):
+        for label in s:
+            if label in col:
+                y[i, col[label]] = 1.0
+
+    # work on the features that occur, grouped so X^T R is one reduceat
+    used, compact = np.unique(indices, return_inverse=True)
+    order = np.argsort(compact, kind="stable")
+    group_starts = np.flatnonzero(np.r_[True, np.diff(compact[order]) != 0])
+    w = np.zeros((len(used), len(labels)), dtype=np.float64)
+    b = np.zeros(len(labels), dtype=np.float64)
+    acc_w = np.full_like(w, 1e-8)
+    acc_b = np.full_like(b, 1e-8)
+
+    for _ in range(epochs):
+        r = (_sigmoid(_row_sums(w[compact], indptr) + b) - y) / max(1, len(texts))
+        grad_w = np.add.reduceat(r[rows[order]], group_starts, axis=0) + l2 * w
+        grad_b = r.sum(axis=0)
+        acc_w += grad_w ** 2
+        acc_b += grad_b ** 2
+        w -= lr * grad_w / np.sqrt(acc_w)
+        b -= lr * grad_b / np.sqrt(acc_b)
+
+    weights = np.zeros((n_features, len(labels)), dtype=np.float32)
+    weights[used] = w
+    return LinearThemeModel(labels=list(labels), weights=weights, bias=b, n_features=n_features)
+
+
+def agreement(model: LinearThemeModel, texts: Sequence[str], label_sets: Sequence[Set[str]]) -> Dict[str, float]:
+    """Micro precision / recall / F1 of the model's themes (uncapped) against label_sets."""
+    tp = fp = fn = 0
+    for hits, truth in zip(model.hits_batch(texts, max_themes=len(model.labels)), label_sets):
+        got = {h.label for h in hits}
+        tp += len(got & truth)
+        fp += len(got - truth)
+        fn += len(truth - got)
+    p = tp / max(1, tp + fp)
+    r = tp / max(1, tp + fn)
+    return {"precision": round(p, 4), "recall": round(r, 4), "f1": round(2 * p * r / max(1e-9, p + r), 4)}
+
+
+def rule_labels(texts: Sequence[str]) -> List[Set[str]]:
+    """The rules engine's themes, without its max_themes cap."""
+    return [{h.label for h in score_theme_hits(t, max_themes=len(THEME_KEYWORDS))} for t in texts]
+
+
+def load_corrections(path: str) -> Dict[Tuple[str, str], Dict[str, bool]]:
+    out: Dict[Tuple[str, str], Dict[str, bool]] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            key = (row["object_type"].strip(), row["object_id"].strip())
+            out.setdefault(key, {})[row["theme_label"].strip()] = row["label"].strip() not in ("0", "false", "no", "")
+    return out
+
+
+def training_set(
+    db_path: str, limit: Optional[int], corrections: Dict[Tuple[str, str], Dict[str, bool]]
+) -> Tuple[List[str], List[Set[str]]]:
+    # same texts the themes stage reads (NLP/delta.py SOURCES)
+    from .delta import SOURCES
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    keys: List[Tuple[str, str]] = []
+    texts: List[str] = []
+    try:
+        for object_type, (table, id_col, text_expr) in SOURCES.items():
+            sql = f"SELECT {id_col}, {text_expr} FROM {table} ORDER BY rowid"
+            params: tuple = ()
+            if limit:
+                sql += " LIMIT ?"
+                params = (limit,)
+            for oid, text in conn.execute(sql, params):
+                keys.append((object_type, oid))
+                texts.append(text or "")
+    finally:
+        conn.close()
+
+    label_sets = rule_labels(texts)
+    for key, s in zip(keys, label_sets):
+        for label, has in corrections.get(key, {}).items():
+            (s.add if has else s.discard)(label)
+    return texts, label_sets
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Train the linear theme engine from rule labels plus corrections")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    t = sub.add_parser("train")
+    t.add_argument("--db", required=True, help="SQLite database with posts / comments")
+    t.add_argument("--out", default="NLP/theme_model.npz")
+    t.add_argument("--corrections", default=None, help="CSV: object_type,object_id,theme_label,label")
+    t.add_argument("--limit", type=int, default=None, help="at most this many posts and this many comments")
+    t.add_argument("--epochs", type=int, default=40)
+    t.add_argument("--lr", type=float, default=1.5)
+    t.add_argument("--l2", type=float, default=1e-4)
+    t.add_argument("--n-features", type=int, default=N_FEATURES, help="power of two")
+    t.add_argument("--holdout", type=float, default=0.1, help="share kept out of training for the agreement check")
+    args = ap.parse_args()
+
+    corrections = load_corrections(args.corrections) if args.corrections else {}
+    texts, label_sets = training_set(args.db, args.limit, corrections)
+    cut = int(len(texts) * (1.0 - args.holdout))
+    print(f"[THEMES] {len(texts)} texts ({cut} train), {sum(len(c) for c in corrections.values())} corrections")
+
+    t0 = time.perf_counter()
+    model = train(texts[:cut], label_sets[:cut], n_features=args.n_features,
+                  epochs=args.epochs, lr=args.lr, l2=args.l2)
+    seconds = time.perf_counter() - t0
+    held = agreement(model, texts[cut:], label_sets[cut:]) if cut < len(texts) else {}
+    model.meta = {
+        "trained_at_utc": int(time.time()),
+        "texts": cut,
+        "corrections": sum(len(c) for c in corrections.values()),
+        "epochs": args.epochs,
+        "holdout": held,
+    }
+    save_model(model, args.out)
+    print(f"[THEMES] trained in {seconds:.1f}s, holdout vs labels {held}; wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
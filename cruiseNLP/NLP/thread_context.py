@@ -0,0 +1,143 @@
+# NLP/thread_context.py
+"""
+Thread context for comments: "we loved it there!" under a post titled
+"Cozumel on Carnival Mardi Gras" names nothing itself, but the thread does.
+
+For comments whose own text gave no cruise line, the line comes from
+  1. the parent post's extraction (text, or a ship it names), else
+  2. the post's subreddit (posts.cruise_line_from_subreddit; not for 'Mixed' subs)
+and comments that named no port and no ship take the post's port_ids / ship_ids.
+
+extraction records where each value came from:
+  line_source    text | ship | post | subreddit | NULL (no line)
+  entity_source  text | post | NULL (no ports / ships)
+Only NULL and inherited values are (re)written here, so a comment's own
+extraction always wins, and a re-extracted post passes its new entities on.
+
+Everything is one UPDATE ... FROM per field group over the affected comments
+(set-based, in SQLite), never a Python loop over rows.
+"""
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+# catch-all subreddits map to this (settings.subreddits); it names no line
+MIXED_LINE = "Mixed"
+
+# comment_id -> the values its thread would give it
+_SOURCE = f"""
+SELECT
+  t.comment_id,
+  NULLIF(TRIM(pe.cruise_line), '') AS post_line,
+  NULLIF(NULLIF(TRIM(p.cruise_line_from_subreddit), ''), '{MIXED_LINE}') AS sub_line,
+  CASE WHEN COALESCE(pe.port_ids, '[]') != '[]' OR COALESCE(pe.ship_ids, '[]') != '[]' THEN 1 ELSE 0 END AS post_has_entities,
+  COALESCE(pe.port_ids, '[]') AS post_port_ids,
+  COALESCE(pe.ship_ids, '[]') AS post_ship_ids
+FROM inherit_targets t
+JOIN comments c ON c.comment_id = t.comment_id
+JOIN posts p ON p.post_id = c.post_id
+LEFT JOIN extraction pe ON pe.object_type = 'post' AND pe.object_id = c.post_id
+"""
+
+INHERIT_LINE_SQL = f"""
+UPDATE extraction AS e
+SET cruise_line = COALESCE(src.post_line, src.sub_line),
+    line_source = CASE WHEN src.post_line IS NOT NULL THEN 'post'
+                       WHEN src.sub_line IS NOT NULL THEN 'subreddit' END
+FROM ({_SOURCE}) AS src
+WHERE e.object_type = 'comment'
+  AND e.object_id = src.comment_id
+  AND (e.line_source IS NULL OR e.line_source IN ('post', 'subreddit'))
+  AND (e.cruise_line IS NOT COALESCE(src.post_line, src.sub_line)
+       OR e.line_source IS NOT CASE WHEN src.post_line IS NOT NULL THEN 'post'
+                                    WHEN src.sub_line IS NOT NULL THEN 'subreddit' END);
+"""
+
+INHERIT_ENTITIES_SQL = f"""
+UPDATE extraction AS e
+SET port_ids = src.post_port_ids,
+    ship_ids = src.post_ship_ids,
+    entity_source = CASE WHEN src.post_has_entities THEN 'post' END
+FROM ({_SOURCE}) AS src
+WHERE e.object_type = 'comment'
+  AND e.object_id = src.comment_id
+  AND (e.entity_source IS NULL OR e.entity_source = 'post')
+  AND (e.port_ids IS NOT src.post_port_ids OR e.ship_ids IS NOT src.post_ship_ids
+       OR e.entity_source IS NOT CASE WHEN src.post_has_entities THEN 'post' END);
+"""
+
+# targets for a pipeline window: changed comments, and every comment under a changed post
+_TARGETS_SQL = {
+    "comment": "SELECT comment_id FROM comments WHERE {where}",
+    "post": "SELECT c.comment_id FROM posts p JOIN comments c ON c.post_id = p.post_id WHERE {where}",
+}
+
+
+def _prepare_targets(conn) -> None:
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS inherit_targets (comment_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM inherit_targets")
+
+
+def _apply(conn) -> int:
+    n = conn.execute(INHERIT_LINE_SQL).rowcount
+    n += conn.execute(INHERIT_ENTITIES_SQL).rowcount
+    conn.execute("DELETE FROM inherit_targets")
+    return n
+
+
+def inherit_context(
+    conn,
+    object_type: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+) -> int:
+    """
+    Pipeline stage: thread context for comments retrieved in (since, until] (object_type
+    'comment') or under posts retrieved in it ('post'). Returns the updates made
+    (line and entities counted separately).
+    """
+    prefix = "p." if object_type == "post" else ""
+    where, params = ["1"], []
+    if since is not None:
+        where.append(f"{prefix}retrieved_at_utc > ?")
+        params.append(since)
+    if until is not None:
+        where.append(f"{prefix}retrieved_at_utc <= ?")
+        params.append(until)
+
+    # write lock up front: a read snapshot taken by the target SELECT can't be upgraded
+    # for the UPDATE once a parallel stage has committed ("database is locked")
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    _prepare_targets(conn)
+    conn.execute(
+        "INSERT OR IGNORE INTO inherit_targets " + _TARGETS_SQL[object_type].format(where=" AND ".join(where)),
+        params,
+    )
+    n = _apply(conn)
+    conn.commit()
+    print(f"[{object_type.upper()} INHERIT] done: {n} updates")
+    return n
+
+
+def inherit_for(conn, post_ids: Sequence[str] = (), comment_ids: Sequence[str] = ()) -> int:
+    """
+    Same for explicit ids (stream scorer batches): the comments, and every comment
+    under the posts. Doesn't commit, so it lands in the caller's transaction.
+    """
+    _prepare_targets(conn)
+    for i in range(0, len(comment_ids), 500):
+        chunk = list(comment_ids[i:i + 500])
+        conn.execute(
+            f"INSERT OR IGNORE INTO inherit_targets SELECT comment_id FROM comments "
+            f"WHERE comment_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+    for i in range(0, len(post_ids), 500):
+        chunk = list(post_ids[i:i + 500])
+        conn.execute(
+            f"INSERT OR IGNORE INTO inherit_targets SELECT comment_id FROM comments "
+            f"WHERE post_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+    return _apply(conn)
@@ -1,11 +1,22 @@
 # cruiseNLP/api/app.py
 from __future__ import annotations
 
-from fastapi import FastAPI, Query
+import csv
+import io
+import json
+import zlib
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+
+from fastapi import FastAPI, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import Iterator, Literal, Optional
 
-from .db import get_conn, get_sqlite_path, fetch_all, fetch_one
+from .db import (
+    API_WARMUP, warm_up,
+    get_analytics, get_conn, get_snapshot_generation, get_sqlite_path, fetch_all, fetch_one, iter_rows,
+)
 from . import queries as Q
 from .models import (
     Health, SearchResponse, EntityRef,
@@ -13,7 +24,14 @@ from .models import (
     ThemeRow, FeedItem
 )
 
-app = FastAPI(title="Cruise Reddit Analytics API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if API_WARMUP:
+        warm_up()
+    yield
+
+
+app = FastAPI(title="Cruise Reddit Analytics API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,10 +46,15 @@ app.add_middleware(
 def health():
     with get_conn() as conn:
         tables = fetch_all(conn, Q.DEBUG_TABLES, ())
+    analytics = get_analytics()
     return {
         "ok": True,
         "sqlite_path": get_sqlite_path(),
         "tables": [t["name"] for t in tables],
+        # "duckdb" only once the mirror file exists; until then everything runs on SQLite
+        "analytics_backend": analytics.name if analytics.available() else "sqlite",
+        # None = reading the live database (SQLITE_SNAPSHOTS off, or nothing published yet)
+        "snapshot_generation": get_snapshot_generation(),
     }
 
 
@@ -45,8 +68,7 @@ def debug_tables():
 # ---------- ID discovery ----------
 @app.get("/ports", response_model=list[EntityRef])
 def list_ports(limit: int = Query(50, ge=1, le=500)):
-    with get_conn() as conn:
-        rows = fetch_all(conn, Q.LIST_PORTS, (limit,))
+    rows = get_analytics().fetch_all("LIST_PORTS", (limit,))
     return [
         EntityRef(entity_type="port", id=r["port_id"], name=r["port_id"], mentions=r["mentions"])
         for r in rows
@@ -55,8 +77,7 @@ def list_ports(limit: int = Query(50, ge=1, le=500)):
 
 @app.get("/lines", response_model=list[EntityRef])
 def list_lines(limit: int = Query(50, ge=1, le=200)):
-    with get_conn() as conn:
-        rows = fetch_all(conn, Q.LIST_LINES, (limit,))
+    rows = get_analytics().fetch_all("LIST_LINES", (limit,))
     return [
         EntityRef(entity_type="line", id=r["line_id"], name=r["line_name"], mentions=r["mentions"])
         for r in rows
@@ -90,8 +111,7 @@ def search(
 # ---------- Port ----------
 @app.get("/ports/{port_id}", response_model=PortSummary)
 def port_summary(port_id: str):
-    with get_conn() as conn:
-        row = fetch_one(conn, Q.PORT_SENTIMENT_SUMMARY, (port_id,))
+    row = get_analytics().fetch_one("PORT_SENTIMENT_SUMMARY", (port_id,))
 
     if not row:
         return PortSummary(port_id=port_id, sentiment=SentimentSummary(mentions=0))
@@ -105,8 +125,7 @@ def port_themes(
     limit: int = Query(15, ge=1, le=100),
     min_n: int = Query(30, ge=1, le=5000),
 ):
-    with get_conn() as conn:
-        rows = fetch_all(conn, Q.PORT_THEMES, (port_id, min_n, limit))
+    rows = get_analytics().fetch_all("PORT_THEMES", (port_id, min_n, limit))
     return [ThemeRow(**r) for r in rows]
 
 
@@ -128,8 +147,7 @@ def port_feed(
 # ---------- Line ----------
 @app.get("/lines/{line_id}", response_model=LineSummary)
 def line_summary(line_id: str):
-    with get_conn() as conn:
-        row = fetch_one(conn, Q.LINE_SENTIMENT_SUMMARY, (line_id,))
+    row = get_analytics().fetch_one("LINE_SENTIMENT_SUMMARY", (line_id,))
 
     if not row:
         return LineSummary(line_id=line_id, sentiment=SentimentSummary(mentions=0))
@@ -143,8 +161,7 @@ def line_themes(
     limit: int = Query(15, ge=1, le=100),
     min_n: int = Query(30, ge=1, le=5000),
 ):
-    with get_conn() as conn:
-        rows = fetch_all(conn, Q.LINE_THEMES, (line_id, min_n, limit))
+    rows = get_analytics().fetch_all("LINE_THEMES", (line_id, min_n, limit))
     return [ThemeRow(**r) for r in rows]
 
 
@@ -160,26 +177,22 @@ def line_feed(
 
 @app.get("/ports/{port_id}/trend")
 def port_trend(port_id: str):
-    with get_conn() as conn:
-        return fetch_all(conn, Q.PORT_TREND, (port_id,))
+    return get_analytics().fetch_all("PORT_TREND", (port_id,))
 @app.get("/ports/{port_id}/lines")
 def port_lines(port_id: str, limit: int = Query(30, ge=1, le=200)):
-    with get_conn() as conn:
-        rows = fetch_all(conn, Q.PORT_LINES, (port_id, limit))
+    rows = get_analytics().fetch_all("PORT_LINES", (port_id, limit))
     return rows  # each row has line_id, line_name, mentions
 
 
 @app.get("/ports/{port_id}/ships")
 def port_ships(port_id: str, limit: int = Query(30, ge=1, le=200)):
-    with get_conn() as conn:
-        rows = fetch_all(conn, Q.PORT_SHIPS, (port_id, limit))
+    rows = get_analytics().fetch_all("PORT_SHIPS", (port_id, limit))
     return rows  # each row has ship_id, mentions
 
 
 @app.get("/lines/{line_id}/ports")
 def line_ports(line_id: str, limit: int = Query(20, ge=1, le=200)):
-    with get_conn() as conn:
-        rows = fetch_all(conn, Q.LINE_PORTS, (line_id, limit))
+    rows = get_analytics().fetch_all("LINE_PORTS", (line_id, limit))
     return rows  # port_id, mentions, avg_sev, avg_sent
 
 @app.get("/lines/{line_id}/top-comments")
@@ -204,8 +217,7 @@ def line_worst_comments(
 
 @app.get("/lines/{line_id}/trend")
 def line_trend(line_id: str):
-    with get_conn() as conn:
-        return fetch_all(conn, Q.LINE_TREND, (line_id,))
+    return get_analytics().fetch_all("LINE_TREND", (line_id,))
 
     from .models import ShipSummary  # you'll add this model below
 
@@ -259,8 +271,7 @@ from .models import ShipSummary  # make sure this exists (step 3)
 
 @app.get("/ships/{ship_id}", response_model=ShipSummary)
 def ship_summary(ship_id: str):
-    with get_conn() as conn:
-        row = fetch_one(conn, Q.SHIP_SENTIMENT_SUMMARY, (ship_id,))
+    row = get_analytics().fetch_one("SHIP_SENTIMENT_SUMMARY", (ship_id,))
 
     if not row:
         return ShipSummary(ship_id=ship_id, sentiment=SentimentSummary(mentions=0))
@@ -270,8 +281,7 @@ def ship_summary(ship_id: str):
 
 @app.get("/ships/{ship_id}/ports")
 def ship_ports(ship_id: str, limit: int = Query(80, ge=1, le=200)):
-    with get_conn() as conn:
-        return fetch_all(conn, Q.SHIP_PORTS, (ship_id, limit))
+    return get_analytics().fetch_all("SHIP_PORTS", (ship_id, limit))
 
 
 @app.get("/ships/{ship_id}/themes", response_model=list[ThemeRow])
@@ -287,8 +297,7 @@ def ship_themes(
 
 @app.get("/ships/{ship_id}/trend")
 def ship_trend(ship_id: str):
-    with get_conn() as conn:
-        return fetch_all(conn, Q.SHIP_TREND, (ship_id,))
+    return get_analytics().fetch_all("SHIP_TREND", (ship_id,))
 
 
 @app.get("/ships/{ship_id}/top-comments")
@@ -309,3 +318,93 @@ def ship_worst_comments(
 ):
     with get_conn() as conn:
         return fetch_all(conn, Q.SHIP_WORST_COMMENTS, (preview_chars, ship_id, limit))
+
+
+# ---------- Export ----------
+EXPORT_FIELDS = [
+    "comment_id", "post_id", "subreddit", "created_utc", "author", "score",
+    "sentiment_label", "sentiment_score", "severity_score",
+    "cruise_line", "port_ids", "ship_ids", "themes", "body", "permalink",
+]
+EXPORT_JSON_FIELDS = ("port_ids", "ship_ids", "themes")
+
+
+def _day_to_utc(d: date | None) -> int | None:
+    if d is None:
+        return None
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp())
+
+
+def _export_lines(params: dict, fmt: str, chunk_size: int = 1000) -> Iterator[str]:
+    # Opens its own connection: the request handler has already returned
+    # by the time the body is being streamed.
+    with get_conn(check_same_thread=False) as conn:
+        rows = iter_rows(conn, Q.EXPORT_COMMENTS, params, chunk_size=chunk_size)
+
+        if fmt == "csv":
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            w.writerow(EXPORT_FIELDS)
+            n = 0
+            for r in rows:
+                w.writerow([r[f] for f in EXPORT_FIELDS])
+                n += 1
+                if n % chunk_size == 0:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+            yield buf.getvalue()
+            return
+
+        for r in rows:
+            for f in EXPORT_JSON_FIELDS:
+                r[f] = json.loads(r[f]) if r[f] else []
+            yield json.dumps(r, ensure_ascii=False) + "\n"
+
+
+def _gzip_stream(chunks: Iterator[str]) -> Iterator[bytes]:
+    # wbits=31 -> gzip container, compressed incrementally chunk by chunk
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = z.compress(chunk.encode("utf-8"))
+        if out:
+            yield out
+    yield z.flush()
+
+
+@app.get("/export")
+def export_comments(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    port: str | None = Query(None),
+    line: str | None = Query(None),
+    ship: str | None = Query(None),
+    theme: str | None = Query(None),
+    sentiment: Literal["neg", "neu", "pos"] | None = Query(None),
+    start: date | None = Query(None, description="inclusive, UTC day"),
+    end: date | None = Query(None, description="exclusive, UTC day"),
+    accept_encoding: str | None = Header(None),
+):
+    """
+    Stream a filtered comment set, e.g. negative Cozumel comments on Carnival in 2025:
+      /export?port=cozumel&line=carnival&sentiment=neg&start=2025-01-01&end=2026-01-01
+    """
+    params = {
+        "port_id": port,
+        "line_id": line,
+        "ship_id": ship,
+        "theme": theme,
+        "sentiment": sentiment,
+        "start_utc": _day_to_utc(start),
+        "end_utc": _day_to_utc(end),
+    }
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"comments_export.{fmt}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    body = _export_lines(params, fmt)
+    if accept_encoding and "gzip" in accept_encoding.lower():
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(_gzip_stream(body), media_type=media_type, headers=headers)
+
+    return StreamingResponse(body, media_type=media_type, headers=headers)
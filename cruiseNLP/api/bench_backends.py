@@ -0,0 +1,130 @@
+# cruiseNLP/api/bench_backends.py
+"""
+SQLite vs DuckDB mirror on the aggregate endpoints' queries.
+
+Generates a synthetic database (bench/analytics.py: posts, comments, nlp_scores,
+extraction, themes with skewed port / line / ship / theme distributions), builds
+the DuckDB mirror from it, then times every query in queries_duckdb.ROUTED on both engines and
+checks they return the same rows.
+
+Run from cruiseNLP/:
+  python -m api.bench_backends                          # ~10M comments (slow to generate)
+  python -m api.bench_backends --comments 500000 --repeat 5
+  python -m api.bench_backends --db /tmp/bench.db --reuse --json bench_backends.json
+
+--reuse keeps an existing --db / mirror instead of regenerating them.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+from typing import Any, Dict, List, Sequence
+
+from bench.analytics import generate, p95, query_params, time_runs
+
+from . import queries as Q
+from . import queries_duckdb as QD
+from .db import fetch_all
+from .duckdb_mirror import build_mirror, default_duckdb_path
+
+
+# ---------- timing ----------
+def _duckdb_rows(cur, sql: str, params: Sequence[Any]) -> List[dict]:
+    cur.execute(sql, list(params))
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def _normalize(rows: List[dict]) -> List[tuple]:
+    return [tuple(round(v, 6) if isinstance(v, float) else v for v in r.values()) for r in rows]
+
+
+def bench(db_path: str, mirror_path: str, repeat: int) -> List[Dict]:
+    import duckdb
+
+    sq = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    sq.row_factory = sqlite3.Row
+    dk = duckdb.connect(mirror_path, read_only=True)
+    cur = dk.cursor()
+
+    # the busiest entities, i.e. the slowest pages
+    port = fetch_all(sq, Q.LIST_PORTS, (1,))[0]["port_id"]
+    line = fetch_all(sq, Q.LIST_LINES, (1,))[0]["line_id"]
+    (ship,) = sq.execute(
+        "SELECT je.value FROM extraction e JOIN json_each(e.ship_ids) je GROUP BY je.value ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()
+    print(f"[BENCH] port={port} line={line} ship={ship}")
+
+    results = []
+    for name in QD.ROUTED:
+        params = query_params(name, port, line, ship)
+        sqlite_ms, sqlite_rows = time_runs(lambda: fetch_all(sq, getattr(Q, name), params), repeat)
+        duck_ms, duck_rows = time_runs(lambda: _duckdb_rows(cur, getattr(QD, name), params), repeat)
+
+        a, b = _normalize(sqlite_rows), _normalize(duck_rows)
+        parity = "ok" if a == b else "ok (tie order)" if sorted(a, key=repr) == sorted(b, key=repr) else "MISMATCH"
+        r = {
+            "query": name,
+            "params": list(params),
+            "rows": len(sqlite_rows),
+            "sqlite_p50_ms": round(statistics.median(sqlite_ms), 2),
+            "sqlite_p95_ms": round(p95(sqlite_ms), 2),
+            "duckdb_p50_ms": round(statistics.median(duck_ms), 2),
+            "duckdb_p95_ms": round(p95(duck_ms), 2),
+            "parity": parity,
+        }
+        r["speedup"] = round(r["sqlite_p50_ms"] / max(r["duckdb_p50_ms"], 1e-3), 1)
+        results.append(r)
+        print(f"  {name:<24} rows={r['rows']:<4} sqlite p50={r['sqlite_p50_ms']:>9.1f}ms "
+              f"duckdb p50={r['duckdb_p50_ms']:>7.1f}ms  x{r['speedup']:<6} {parity}")
+
+    cur.close()
+    dk.close()
+    sq.close()
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the SQLite and DuckDB analytics backends")
+    ap.add_argument("--comments", type=int, default=10_000_000)
+    ap.add_argument("--db", default=None, help="where to generate the SQLite db (default: a temp dir)")
+    ap.add_argument("--reuse", action="store_true", help="use an existing --db and mirror as-is")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per query and engine")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", dest="json_out", default=None, help="also write results here")
+    args = ap.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_backends_"), "bench.db")
+    mirror_path = default_duckdb_path(db_path)
+
+    if not (args.reuse and os.path.exists(db_path)):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        print(f"[BENCH] generating {args.comments} comments into {db_path}")
+        generate(db_path, args.comments, seed=args.seed)
+    if not (args.reuse and os.path.exists(mirror_path)):
+        build_mirror(db_path, mirror_path)
+
+    (n,) = sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM comments").fetchone()
+    print(f"[BENCH] {n} comments, {args.repeat} runs per query")
+    results = bench(db_path, mirror_path, args.repeat)
+
+    total_sqlite = sum(r["sqlite_p50_ms"] for r in results)
+    total_duck = sum(r["duckdb_p50_ms"] for r in results)
+    print(f"[BENCH] all routed queries (sum of p50): sqlite {total_sqlite:.0f}ms, duckdb {total_duck:.0f}ms")
+    mismatches = [r["query"] for r in results if r["parity"] == "MISMATCH"]
+    if mismatches:
+        print(f"[BENCH] result mismatch: {', '.join(mismatches)}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"comments": n, "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"[BENCH] wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# cruiseNLP/api/bench_columnar.py
+"""
+SQLite vs the in-memory NumPy engine (columnar.py) on the aggregate endpoints' queries.
+
+Generates the synthetic database from bench/analytics.py (or reuses one, or
+points at a real one with --db --reuse), loads it into columns, then
+  - times every query in queries_duckdb.ROUTED on both engines for the busiest
+    port / line / ship and checks they return the same rows
+  - checks parity (untimed) for every routed query on the --entities busiest
+    ports, lines and ships, plus one id that doesn't exist
+
+Run from cruiseNLP/:
+  python -m api.bench_columnar --comments 1000000
+  python -m api.bench_columnar --db cruise_reddit.db --reuse --entities 200      # parity on real data
+
+Exits non-zero on any mismatch.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from bench.analytics import generate, p95, query_params, same_rows, time_runs
+
+from . import queries as Q
+from . import queries_duckdb as QD
+from .columnar import ROUTES, Columns
+from .db import fetch_all
+
+MISSING_ID = "__no_such_entity__"
+
+
+def _parity(a: List[dict], b: List[dict]) -> str:
+    if [list(r) for r in a] != [list(r) for r in b]:
+        return "MISMATCH (columns)"
+    x, y = [tuple(r.values()) for r in a], [tuple(r.values()) for r in b]
+    # sorting by repr would separate floats that differ in the last bits; the keys come first in every row
+    by_key = lambda r: repr(tuple(v for v in r if not isinstance(v, float)))  # noqa: E731
+    return "ok" if same_rows(x, y) else "ok (tie order)" if same_rows(sorted(x, key=by_key), sorted(y, key=by_key)) else "MISMATCH"
+
+
+def bench(sq: sqlite3.Connection, cols: Columns, port: str, line: str, ship: str, repeat: int) -> List[Dict]:
+    results = []
+    for name in QD.ROUTED:
+        params = query_params(name, port, line, ship)
+        sqlite_ms, sqlite_rows = time_runs(lambda: fetch_all(sq, getattr(Q, name), params), repeat)
+        numpy_ms, numpy_rows = time_runs(lambda: ROUTES[name](cols, *params), repeat)
+        parity = _parity(sqlite_rows, numpy_rows)
+        r = {
+            "query": name,
+            "params": list(params),
+            "rows": len(sqlite_rows),
+            "sqlite_p50_ms": round(statistics.median(sqlite_ms), 2),
+            "sqlite_p95_ms": round(p95(sqlite_ms), 2),
+            "numpy_p50_ms": round(statistics.median(numpy_ms), 3),
+            "numpy_p95_ms": round(p95(numpy_ms), 3),
+            "parity": parity,
+        }
+        r["speedup"] = round(r["sqlite_p50_ms"] / max(r["numpy_p50_ms"], 1e-3), 1)
+        results.append(r)
+        print(f"  {name:<24} rows={r['rows']:<4} sqlite p50={r['sqlite_p50_ms']:>9.1f}ms "
+              f"numpy p50={r['numpy_p50_ms']:>7.2f}ms  x{r['speedup']:<7} {parity}")
+    return results
+
+
+def parity_sweep(sq: sqlite3.Connection, cols: Columns, n_entities: int) -> Tuple[int, List[str]]:
+    """Every routed query on the n busiest ports / lines / ships; returns (checks, mismatches)."""
+    ports = [r["port_id"] for r in fetch_all(sq, Q.LIST_PORTS, (n_entities,))] + [MISSING_ID]
+    lines = [r["line_id"] for r in fetch_all(sq, Q.LIST_LINES, (n_entities,))] + [MISSING_ID]
+    ships = [r[0] for r in sq.execute(
+        "SELECT je.value FROM extraction e JOIN json_each(e.ship_ids) je "
+        "GROUP BY je.value ORDER BY COUNT(*) DESC LIMIT ?", (n_entities,))] + [MISSING_ID]
+
+    checks, mismatches = 0, []
+    for name in QD.ROUTED:
+        keys = ports if name.startswith("PORT") else lines if name.startswith("LINE") else ships
+        for key in keys[:1] if name.startswith("LIST") else keys:
+            params: Tuple[Any, ...] = query_params(name, key, key, key)
+            if name.endswith("_THEMES"):
+                params = (key, 3, 100)   # exercise HAVING
+            checks += 1
+            if _parity(fetch_all(sq, getattr(Q, name), params), ROUTES[name](cols, *params)).startswith("MISMATCH"):
+                mismatches.append(f"{name}{params}")
+    return checks, mismatches
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark and parity-check the NumPy analytics engine against SQLite")
+    ap.add_argument("--comments", type=int, default=1_000_000)
+    ap.add_argument("--db", default=None, help="where to generate the SQLite db (default: a temp dir)")
+    ap.add_argument("--reuse", action="store_true", help="use an existing --db as-is")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per query and engine")
+    ap.add_argument("--entities", type=int, default=50, help="busiest ports / lines / ships in the parity sweep")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", dest="json_out", default=None, help="also write results here")
+    args = ap.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_columnar_"), "bench.db")
+    if not (args.reuse and os.path.exists(db_path)):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        print(f"[BENCH] generating {args.comments} comments into {db_path}")
+        generate(db_path, args.comments, seed=args.seed)
+
+    sq = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    sq.row_factory = sqlite3.Row
+    loader = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    cols = Columns(loader)
+    loader.close()
+    print(f"[BENCH] loaded {cols.n} facts, {len(cols.port_mentions)} port mentions in {cols.load_seconds:.1f}s")
+
+    port = fetch_all(sq, Q.LIST_PORTS, (1,))[0]["port_id"]
+    line = fetch_all(sq, Q.LIST_LINES, (1,))[0]["line_id"]
+    (ship,) = sq.execute(
+        "SELECT je.value FROM extraction e JOIN json_each(e.ship_ids) je GROUP BY je.value ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()
+    print(f"[BENCH] port={port} line={line} ship={ship}, {args.repeat} runs per query")
+    results = bench(sq, cols, port, line, ship, args.repeat)
+
+    total_sqlite = sum(r["sqlite_p50_ms"] for r in results)
+    total_numpy = sum(r["numpy_p50_ms"] for r in results)
+    print(f"[BENCH] all routed queries (sum of p50): sqlite {total_sqlite:.0f}ms, numpy {total_numpy:.1f}ms")
+
+    t0 = time.perf_counter()
+    checks, mismatches = parity_sweep(sq, cols, args.entities)
+    mismatches = [r["query"] for r in results if r["parity"].startswith("MISMATCH")] + mismatches
+    print(f"[BENCH] parity sweep: {checks} queries in {time.perf_counter() - t0:.1f}s, {len(mismatches)} mismatch(es)")
+    for m in mismatches[:20]:
+        print(f"  MISMATCH {m}")
+    sq.close()
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({
+                "facts": cols.n,
+                "load_seconds": round(cols.load_seconds, 2),
+                "repeat": args.repeat,
+                "results": results,
+                "parity_checks": checks,
+                "mismatches": mismatches,
+            }, f, indent=2)
+        print(f"[BENCH] wrote {args.json_out}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# cruiseNLP/api/bench_schema_v2.py
+"""
+Schema v1 vs v2 (scraping/schema_v2.py): on-disk size and query latency.
+
+Generates the synthetic database from bench/analytics.py (or reuses one),
+migrates it to v2, then reports
+  - file size and per-table size (tables + their indexes, from dbstat)
+  - p50 / p95 of every query in queries_v2.PORTED on both schemas, with a
+    check that both return the same rows
+
+Run from cruiseNLP/:
+  python -m api.bench_schema_v2 --comments 1000000
+  python -m api.bench_schema_v2 --db /tmp/bench.db --reuse --json schema_v2.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from bench.analytics import generate, p95, query_params, same_rows, time_runs
+from scraping.schema_v2 import migrate
+
+from . import queries as Q
+from . import queries_v2 as Q2
+from .db import fetch_all
+
+PREVIEW_CHARS = 240
+# generated comments put in a near-duplicate cluster, so the feeds' dedupe is compared too
+DUP_SHARE = 0.3
+
+
+def add_near_dups(db_path: str, share: float = DUP_SHARE, seed: int = 7) -> int:
+    """
+    Clusters `share` of the comments with a random earlier comment of the same post
+    (no real signatures). Members take their representative's scores and entities,
+    as the pipeline copies them (NLP/near_dup.py), so copies compete in the feeds.
+    """
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    cluster = {}
+    for (ids,) in conn.execute("SELECT group_concat(comment_id) FROM comments GROUP BY post_id"):
+        ids = ids.split(",")
+        for i, cid in enumerate(ids):
+            cluster[cid] = cluster[rnd.choice(ids[:i])] if i and rnd.random() < share else cid
+    conn.executemany(
+        "INSERT OR REPLACE INTO near_dups (comment_id, cluster_id, signature, indexed_at_utc) VALUES (?, ?, x'', 0)",
+        cluster.items(),
+    )
+    conn.executescript("""
+        UPDATE nlp_scores AS m
+        SET sentiment_label = r.sentiment_label, sentiment_score = r.sentiment_score, severity_score = r.severity_score
+        FROM near_dups d JOIN nlp_scores r ON r.object_type = 'comment' AND r.object_id = d.cluster_id
+        WHERE m.object_type = 'comment' AND m.object_id = d.comment_id AND d.cluster_id != d.comment_id;
+        UPDATE extraction AS m
+        SET cruise_line = r.cruise_line, port_ids = r.port_ids, ship_ids = r.ship_ids
+        FROM near_dups d JOIN extraction r ON r.object_type = 'comment' AND r.object_id = d.cluster_id
+        WHERE m.object_type = 'comment' AND m.object_id = d.comment_id AND d.cluster_id != d.comment_id;
+    """)
+    conn.commit()
+    n = sum(1 for cid, rep in cluster.items() if cid != rep)
+    conn.close()
+    return n
+
+
+def table_sizes(db_path: str) -> Dict[str, int]:
+    """Bytes per table, its indexes included."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    owner = dict(conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')"))
+    sizes: Dict[str, int] = {}
+    for name, size in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"):
+        table = owner.get(name, name)
+        sizes[table] = sizes.get(table, 0) + size
+    conn.close()
+    return sizes
+
+
+def _params(query_name: str, port: str, line: str, ship: str) -> Tuple[Any, ...]:
+    # the feeds aren't aggregate queries: they take a preview length first
+    if query_name.endswith(("_FEED", "_COMMENTS")):
+        key = port if query_name.startswith("PORT") else line if query_name.startswith("LINE") else ship
+        return (PREVIEW_CHARS, key, 50)
+    return query_params(query_name, port, line, ship)
+
+
+def bench(v1_path: str, v2_path: str, repeat: int) -> List[Dict]:
+    v1 = sqlite3.connect(f"file:{v1_path}?mode=ro", uri=True)
+    v2 = sqlite3.connect(f"file:{v2_path}?mode=ro", uri=True)
+    v1.row_factory = v2.row_factory = sqlite3.Row
+
+    port = fetch_all(v1, Q.LIST_PORTS, (1,))[0]["port_id"]
+    line = fetch_all(v1, Q.LIST_LINES, (1,))[0]["line_id"]
+    (ship,) = v2.execute(
+        "SELECT sh.ship_id FROM ship_mentions sm JOIN ships sh ON sh.ship_key = sm.ship_key "
+        "GROUP BY sm.ship_key ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()
+    print(f"[BENCH] port={port} line={line} ship={ship}")
+
+    results = []
+    for name in Q2.PORTED:
+        params = _params(name, port, line, ship)
+        v1_ms, v1_rows = time_runs(lambda: fetch_all(v1, getattr(Q, name), params), repeat)
+        v2_ms, v2_rows = time_runs(lambda: fetch_all(v2, getattr(Q2, name), params), repeat)
+
+        a, b = [tuple(r) for r in v1_rows], [tuple(r) for r in v2_rows]
+        parity = "ok" if same_rows(a, b) else "ok (tie order)" if same_rows(sorted(a, key=repr), sorted(b, key=repr)) else "MISMATCH"
+        r = {
+            "query": name,
+            "params": list(params),
+            "rows": len(v1_rows),
+            "v1_p50_ms": round(statistics.median(v1_ms), 2),
+            "v1_p95_ms": round(p95(v1_ms), 2),
+            "v2_p50_ms": round(statistics.median(v2_ms), 2),
+            "v2_p95_ms": round(p95(v2_ms), 2),
+            "parity": parity,
+        }
+        r["speedup"] = round(r["v1_p50_ms"] / max(r["v2_p50_ms"], 1e-3), 1)
+        results.append(r)
+        print(f"  {name:<24} rows={r['rows']:<4} v1 p50={r['v1_p50_ms']:>9.1f}ms "
+              f"v2 p50={r['v2_p50_ms']:>8.1f}ms  x{r['speedup']:<6} {parity}")
+
+    v1.close()
+    v2.close()
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compare schema v1 and v2 size and query latency")
+    ap.add_argument("--comments", type=int, default=1_000_000)
+    ap.add_argument("--db", default=None, help="v1 database to generate / reuse (default: a temp dir)")
+    ap.add_argument("--reuse", action="store_true", help="use an existing --db (and its _v2.db) as-is")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per query and schema")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", dest="json_out", default=None, help="also write results here")
+    args = ap.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_schema_v2_"), "bench.db")
+    v2_path = os.path.splitext(db_path)[0] + "_v2.db"
+
+    if not (args.reuse and os.path.exists(db_path)):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        print(f"[BENCH] generating {args.comments} comments into {db_path}")
+        generate(db_path, args.comments, seed=args.seed)
+        print(f"[BENCH] {add_near_dups(db_path, seed=args.seed)} comments put in near-duplicate clusters")
+    migration = None
+    if not (args.reuse and os.path.exists(v2_path)):
+        migration = migrate(db_path, v2_path)
+
+    s1, s2 = table_sizes(db_path), table_sizes(v2_path)
+    f1, f2 = os.path.getsize(db_path), os.path.getsize(v2_path)
+    print(f"[BENCH] file size: v1 {f1 / 1e6:.1f}MB, v2 {f2 / 1e6:.1f}MB ({f2 / f1:.0%})")
+    # v2 splits extraction's JSON columns into port_mentions / ship_mentions
+    groups = {
+        "objects": ("objects",), "posts": ("posts",), "comments": ("comments",), "nlp_scores": ("nlp_scores",),
+        "extraction": ("extraction", "port_mentions", "ship_mentions", "ports", "ships", "cruise_lines"),
+        "themes": ("themes", "theme_labels"),
+    }
+    sizes = {}
+    for table, v2_tables in groups.items():
+        a, b = s1.get(table, 0), sum(s2.get(t, 0) for t in v2_tables)
+        sizes[table] = {"v1_bytes": a, "v2_bytes": b}
+        ratio = f"{b / a:.0%}" if a else "new"
+        print(f"  {table:<12} v1 {a / 1e6:>8.1f}MB  v2 {b / 1e6:>8.1f}MB  ({ratio})  [{' + '.join(v2_tables)}]")
+
+    results = bench(db_path, v2_path, args.repeat)
+    total_v1 = sum(r["v1_p50_ms"] for r in results)
+    total_v2 = sum(r["v2_p50_ms"] for r in results)
+    print(f"[BENCH] all ported queries (sum of p50): v1 {total_v1:.0f}ms, v2 {total_v2:.0f}ms")
+    mismatches = [r["query"] for r in results if r["parity"] == "MISMATCH"]
+    if mismatches:
+        print(f"[BENCH] result mismatch: {', '.join(mismatches)}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({
+                "repeat": args.repeat,
+                "file_bytes": {"v1": f1, "v2": f2},
+                "tables": sizes,
+                "migration_seconds": migration,
+                "results": results,
+            }, f, indent=2)
+        print(f"[BENCH] wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+# cruiseNLP/api/columnar.py
+"""
+In-memory columnar engine for the aggregate endpoints (ANALYTICS_BACKEND=numpy).
+
+Without comment bodies the serving data fits in RAM as a handful of columns, so
+instead of running SQL per request this loads the mention facts into NumPy
+arrays once per database generation and answers the routed queries
+(queries_duckdb.ROUTED) with bincount and masked reductions:
+
+  facts    one row per extraction row: line code, is_comment / has_score /
+           has_comment flags, sentiment, severity, label code, month code
+  ports    port mentions, grouped by port (-> facts) and by fact (-> ports)
+  ships    the same for ship mentions
+  themes   comment themes, grouped by fact
+
+A page selects its entity's facts (one slice of the by-entity grouping; a fact
+naming a port twice counts twice, as with json_each), masks them the way the
+SQL's inner joins filter, then reduces; breakdowns gather the selected facts'
+ports / ships / themes and bincount those. Rows have the SQL versions' columns,
+types and order: AVG of nothing is None, NULL months sort first, ties in
+ORDER BY go by key. Any other query name falls through to SQLite.
+
+The arrays are rebuilt when the data the API reads changes: straight away when
+SQLITE_SNAPSHOTS publishes a new generation, and at most every
+COLUMNAR_RELOAD_SECONDS when reading a live database that is being written.
+Requests are served from the previous load while a reload runs.
+Needs numpy (pip install numpy).
+
+  python -m api.bench_columnar --comments 1000000      # SQLite vs NumPy timings + parity
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .db import SQLiteBackend, get_conn, get_snapshot_generation, get_sqlite_path
+
+COLUMNAR_RELOAD_SECONDS = float(os.getenv("COLUMNAR_RELOAD_SECONDS", "60"))
+
+# sentiment_label -> code; anything else (NULL, unexpected labels) is len(LABELS)
+LABELS = ("neg", "pos", "neu")
+
+# all read in one transaction; extraction.rowid ties mentions / themes to facts
+FACTS_SQL = """
+SELECT
+  e.rowid,
+  e.object_type = 'comment',
+  NULLIF(TRIM(e.cruise_line), ''),
+  LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')),
+  s.object_id IS NOT NULL,
+  s.sentiment_label,
+  s.sentiment_score,
+  s.severity_score,
+  c.comment_id IS NOT NULL,
+  c.created_utc
+FROM extraction e
+LEFT JOIN nlp_scores s
+  ON s.object_type = e.object_type AND s.object_id = e.object_id
+LEFT JOIN comments c
+  ON e.object_type = 'comment' AND c.comment_id = e.object_id
+ORDER BY e.rowid
+"""
+
+MENTIONS_SQL = """
+SELECT e.rowid, je.value
+FROM extraction e
+JOIN json_each(e.{column}) AS je
+WHERE e.{column} IS NOT NULL
+  AND e.{column} != '[]'
+"""
+
+THEMES_SQL = """
+SELECT e.rowid, t.theme_label
+FROM themes t
+JOIN extraction e
+  ON e.object_type = t.object_type AND e.object_id = t.object_id
+WHERE t.object_type = 'comment'
+"""
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def _read_columns(conn, sql: str, n_cols: int, chunk_size: int = 200_000) -> List[List[Any]]:
+    cols: List[List[Any]] = [[] for _ in range(n_cols)]
+    cur = conn.execute(sql)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        for col, values in zip(cols, zip(*rows)):
+            col.extend(values)
+    return cols
+
+
+def _encode(values: Sequence[Any]) -> Tuple[List[Any], np.ndarray]:
+    """Distinct values (sorted, so code order is key order) and each value's code."""
+    keys = sorted(set(values))
+    code = {k: i for i, k in enumerate(keys)}
+    return keys, np.fromiter((code[v] for v in values), dtype=np.int64, count=len(values))
+
+
+def _floats(values: Sequence[Any]) -> np.ndarray:
+    # None -> NaN, which the reductions below treat as SQL NULL
+    return np.array(values, dtype=np.float64) if len(values) else np.zeros(0)
+
+
+class _Groups:
+    """Members of each group (CSR): group g owns members[indptr[g]:indptr[g + 1]]."""
+
+    def __init__(self, groups: np.ndarray, members: np.ndarray, n_groups: int):
+        order = np.argsort(groups, kind="stable")
+        self.members = members[order]
+        self.indptr = np.zeros(n_groups + 1, dtype=np.int64)
+        np.cumsum(np.bincount(groups, minlength=n_groups), out=self.indptr[1:])
+
+    def of(self, group: int) -> np.ndarray:
+        return self.members[self.indptr[group]:self.indptr[group + 1]]
+
+    def gather(self, groups: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Members of every group in `groups` (repeats included) and, for each, its position in `groups`."""
+        starts = self.indptr[groups]
+        lens = self.indptr[groups + 1] - starts
+        total = int(lens.sum())
+        if total == 0:
+            return _EMPTY, self.members[:0]
+        owner = np.repeat(np.arange(len(groups)), lens)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lens) - lens, lens)
+        return owner, self.members[starts[owner] + offsets]
+
+
+def _avg(values: np.ndarray) -> Optional[float]:
+    ok = ~np.isnan(values)
+    n = int(ok.sum())
+    return float(values[ok].sum() / n) if n else None
+
+
+def _group_avgs(codes: np.ndarray, values: np.ndarray, n_groups: int) -> List[Optional[float]]:
+    ok = ~np.isnan(values)
+    sums = np.bincount(codes[ok], weights=values[ok], minlength=n_groups)
+    counts = np.bincount(codes[ok], minlength=n_groups)
+    return [float(s / c) if c else None for s, c in zip(sums, counts)]
+
+
+def _top(counts: np.ndarray, limit: int) -> List[int]:
+    """Groups with rows, most first; ties by code (= key order)."""
+    present = np.flatnonzero(counts)
+    return present[np.argsort(-counts[present], kind="stable")][:limit].tolist()
+
+
+class Columns:
+    """One load of the aggregate data; read-only once built, so requests share it without locking."""
+
+    def __init__(self, conn):
+        t0 = time.perf_counter()
+        if not conn.in_transaction:
+            conn.execute("BEGIN")  # one read snapshot for all four queries
+        try:
+            (rowid, is_comment, line_name, line_id, has_score, label, sent, sev, has_comment, created) = \
+                _read_columns(conn, FACTS_SQL, 10)
+            port_rowid, port_value = _read_columns(conn, MENTIONS_SQL.format(column="port_ids"), 2)
+            ship_rowid, ship_value = _read_columns(conn, MENTIONS_SQL.format(column="ship_ids"), 2)
+            theme_rowid, theme_value = _read_columns(conn, THEMES_SQL, 2)
+        finally:
+            conn.rollback()
+
+        self.n = n = len(rowid)
+        self.rowid = np.array(rowid, dtype=np.int64)
+        self.is_comment = np.array(is_comment, dtype=bool)
+        self.has_score = np.array(has_score, dtype=bool)
+        self.has_comment = np.array(has_comment, dtype=bool)
+        self.sent = _floats(sent)
+        self.sev = _floats(sev)
+        label_code = {name: i for i, name in enumerate(LABELS)}
+        self.label = np.fromiter((label_code.get(x, len(LABELS)) for x in label), dtype=np.int64, count=n)
+        # the inner joins every routed query makes (comment with a score, plus the comment row for trends)
+        self.scored = self.is_comment & self.has_score
+        self.scored_comment = self.scored & self.has_comment
+
+        # lines: grouped by trimmed name like the SQL; an id covers every name that maps to it
+        named = [i for i, name in enumerate(line_name) if name is not None]
+        self.line_names, codes = _encode([line_name[i] for i in named])
+        self.line = np.full(n, -1, dtype=np.int64)
+        self.line[named] = codes
+        self.line_ids: List[str] = [""] * len(self.line_names)
+        for i, c in zip(named, codes.tolist()):
+            self.line_ids[c] = line_id[i]
+        self.line_codes: Dict[str, List[int]] = {}
+        for c, lid in enumerate(self.line_ids):
+            self.line_codes.setdefault(lid, []).append(c)
+        self.line_facts = _Groups(codes, np.array(named, dtype=np.int64), len(self.line_names))
+
+        # months as strftime('%Y-%m') in UTC; code 0 is NULL (no created_utc), which sorts first in SQL
+        created_s = _floats(created)
+        dated = ~np.isnan(created_s)
+        month_index = created_s[dated].astype(np.int64).astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+        uniq, inv = np.unique(month_index, return_inverse=True)
+        self.months: List[Optional[str]] = [None] + [str(m) for m in uniq.astype("datetime64[M]")]
+        self.month = np.zeros(n, dtype=np.int64)
+        self.month[dated] = inv.reshape(-1) + 1
+
+        self.ports, self.port_code, self.port_facts, self.fact_ports, self.port_mention_facts, self.port_mentions = \
+            self._mentions(port_rowid, port_value)
+        self.ships, self.ship_code, self.ship_facts, self.fact_ships, _, _ = self._mentions(ship_rowid, ship_value)
+        self.themes, _, _, self.fact_themes, _, _ = self._mentions(theme_rowid, theme_value)
+        self.load_seconds = time.perf_counter() - t0
+
+    def _facts_of(self, rowids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Fact index of each rowid, and which rowids have one."""
+        r = np.array(rowids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.rowid, r), max(self.n - 1, 0))
+        return pos, (self.rowid[pos] == r) if self.n else np.zeros(len(r), dtype=bool)
+
+    def _mentions(self, rowids: Sequence[int], values: Sequence[Any]):
+        facts, ok = self._facts_of(rowids)
+        facts = facts[ok]
+        keys, codes = _encode([v for v, keep in zip(values, ok.tolist()) if keep])
+        return (
+            keys,
+            {k: i for i, k in enumerate(keys)},
+            _Groups(codes, facts, len(keys)),   # key -> facts
+            _Groups(facts, codes, self.n),      # fact -> keys
+            facts,
+            codes,
+        )
+
+    # ---- selections ----
+    def port(self, port_id: Any) -> np.ndarray:
+        code = self.port_code.get(port_id)
+        return self.port_facts.of(code) if code is not None else _EMPTY
+
+    def ship(self, ship_id: Any) -> np.ndarray:
+        code = self.ship_code.get(ship_id)
+        return self.ship_facts.of(code) if code is not None else _EMPTY
+
+    def line_of(self, line_id: Any) -> np.ndarray:
+        codes = self.line_codes.get(line_id, ())
+        return np.concatenate([self.line_facts.of(c) for c in codes]) if codes else _EMPTY
+
+    # ---- reductions ----
+    def list_ports(self, limit: int) -> List[dict]:
+        codes = self.port_mentions[self.scored[self.port_mention_facts]]
+        counts = np.bincount(codes, minlength=len(self.ports))
+        return [{"port_id": self.ports[g], "mentions": int(counts[g])} for g in _top(counts, limit)]
+
+    def list_lines(self, limit: int) -> List[dict]:
+        counts = np.bincount(self.line[self.line >= 0], minlength=len(self.line_names))
+        return [
+            {"line_name": self.line_names[g], "line_id": self.line_ids[g], "mentions": int(counts[g])}
+            for g in _top(counts, limit)
+        ]
+
+    def summary(self, facts: np.ndarray) -> dict:
+        f = facts[self.scored[facts]]
+        n = len(f)
+        labels = np.bincount(self.label[f], minlength=len(LABELS) + 1)
+        return {
+            "mentions": n,
+            "avg_sentiment": _avg(self.sent[f]),
+            "avg_severity": _avg(self.sev[f]),
+            # SUM over no rows is NULL
+            "neg_count": int(labels[0]) if n else None,
+            "pos_count": int(labels[1]) if n else None,
+            "neu_count": int(labels[2]) if n else None,
+        }
+
+    def theme_rows(self, facts: np.ndarray, min_n: int, limit: int) -> List[dict]:
+        f = facts[self.scored[facts]]
+        owner, codes = self.fact_themes.gather(f)
+        tf = f[owner]
+        k = len(self.themes)
+        counts = np.bincount(codes, minlength=k)
+        avgs = _group_avgs(codes, self.sent[tf], k)
+        neg = np.bincount(codes, weights=(self.label[tf] == 0).astype(np.float64), minlength=k)
+        keep = [g for g in np.flatnonzero(counts).tolist() if counts[g] >= min_n]
+        # ORDER BY avg_sent ASC: NULL first
+        keep.sort(key=lambda g: (avgs[g] is not None, avgs[g] or 0.0, g))
+        return [
+            {"theme_label": self.themes[g], "n": int(counts[g]), "avg_sent": avgs[g], "neg_count": int(neg[g])}
+            for g in keep[:limit]
+        ]
+
+    def trend(self, facts: np.ndarray, with_mentions: bool = True) -> List[dict]:
+        f = facts[self.scored_comment[facts]]
+        codes = self.month[f]
+        k = len(self.months)
+        counts = np.bincount(codes, minlength=k)
+        sev, sent = _group_avgs(codes, self.sev[f], k), _group_avgs(codes, self.sent[f], k)
+        rows = []
+        for g in np.flatnonzero(counts).tolist():
+            row = {"month": self.months[g], "avg_sev": sev[g], "avg_sent": sent[g]}
+            if with_mentions:
+                row["mentions"] = int(counts[g])
+            rows.append(row)
+        return rows
+
+    def line_breakdown(self, facts: np.ndarray, limit: int) -> List[dict]:
+        f = facts[self.scored_comment[facts] & (self.line[facts] >= 0)]
+        counts = np.bincount(self.line[f], minlength=len(self.line_names))
+        return [
+            {"line_id": self.line_ids[g], "line_name": self.line_names[g], "mentions": int(counts[g])}
+            for g in _top(counts, limit)
+        ]
+
+    def ship_breakdown(self, facts: np.ndarray, limit: int) -> List[dict]:
+        _, codes = self.fact_ships.gather(facts[self.scored[facts]])
+        counts = np.bincount(codes, minlength=len(self.ships))
+        return [{"ship_id": self.ships[g], "mentions": int(counts[g])} for g in _top(counts, limit)]
+
+    def port_breakdown(self, facts: np.ndarray, limit: int) -> List[dict]:
+        f = facts[self.scored[facts]]
+        owner, codes = self.fact_ports.gather(f)
+        pf = f[owner]
+        k = len(self.ports)
+        counts = np.bincount(codes, minlength=k)
+        sev, sent = _group_avgs(codes, self.sev[pf], k), _group_avgs(codes, self.sent[pf], k)
+        return [
+            {"port_id": self.ports[g], "mentions": int(counts[g]), "avg_sev": sev[g], "avg_sent": sent[g]}
+            for g in _top(counts, limit)
+        ]
+
+
+# query name (queries.py / queries_duckdb.py) -> rows, from the same parameters
+ROUTES: Dict[str, Callable[..., List[dict]]] = {
+    "LIST_PORTS": lambda c, limit: c.list_ports(limit),
+    "LIST_LINES": lambda c, limit: c.list_lines(limit),
+    "PORT_SENTIMENT_SUMMARY": lambda c, port: [c.summary(c.port(port))],
+    "LINE_SENTIMENT_SUMMARY": lambda c, line: [c.summary(c.line_of(line))],
+    "SHIP_SENTIMENT_SUMMARY": lambda c, ship: [c.summary(c.ship(ship))],
+    "PORT_THEMES": lambda c, port, min_n, limit: c.theme_rows(c.port(port), min_n, limit),
+    "LINE_THEMES": lambda c, line, min_n, limit: c.theme_rows(c.line_of(line), min_n, limit),
+    "PORT_TREND": lambda c, port: c.trend(c.port(port), with_mentions=False),
+    "LINE_TREND": lambda c, line: c.trend(c.line_of(line)),
+    "SHIP_TREND": lambda c, ship: c.trend(c.ship(ship)),
+    "PORT_LINES": lambda c, port, limit: c.line_breakdown(c.port(port), limit),
+    "PORT_SHIPS": lambda c, port, limit: c.ship_breakdown(c.port(port), limit),
+    "LINE_PORTS": lambda c, line, limit: c.port_breakdown(c.line_of(line), limit),
+    "SHIP_PORTS": lambda c, ship, limit: c.port_breakdown(c.ship(ship), limit),
+}
+
+
+def load_columns() -> Columns:
+    with get_conn() as conn:
+        conn.row_factory = None
+        cols = Columns(conn)
+    print(f"[api] loaded columnar analytics: {cols.n} facts, {len(cols.port_mentions)} port mentions "
+          f"in {cols.load_seconds:.1f}s")
+    return cols
+
+
+class ColumnarBackend:
+    """
+    Routed queries from in-memory columns; everything else goes to SQLite.
+    One request (re)loads the columns while the others keep using the previous load.
+    """
+    name = "numpy"
+
+    def __init__(self, fallback: SQLiteBackend):
+        self.fallback = fallback
+        self._cols: Optional[Columns] = None
+        self._key: Optional[tuple] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return True
+
+    @staticmethod
+    def _generation() -> tuple:
+        gen = get_snapshot_generation()
+        if gen is not None:
+            return ("snapshot", gen)
+        stamps = []
+        for path in (get_sqlite_path(), get_sqlite_path() + "-wal"):
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return ("live", tuple(stamps))
+
+    def columns(self) -> Columns:
+        key = self._generation()
+        cols = self._cols
+        if cols is not None and (
+            key == self._key
+            or (key[0] == "live" and time.monotonic() - self._loaded_at < COLUMNAR_RELOAD_SECONDS)
+        ):
+            return cols
+        if not self._lock.acquire(blocking=cols is None):
+            return cols  # another request is reloading
+        try:
+            if self._cols is None or self._key != key:
+                self._loaded_at = time.monotonic()
+                self._cols = load_columns()
+                self._key = key
+            return self._cols
+        finally:
+            self._lock.release()
+
+    def fetch_all(self, query_name: str, params: Tuple[Any, ...] = ()) -> list[dict]:
+        route = ROUTES.get(query_name)
+        if route is None:
+            return self.fallback.fetch_all(query_name, params)
+        return route(self.columns(), *params)
+
+    def fetch_one(self, query_name: str, params: Tuple[Any, ...] = ()) -> dict | None:
+        route = ROUTES.get(query_name)
+        if route is None:
+            return self.fallback.fetch_one(query_name, params)
+        rows = route(self.columns(), *params)
+        return rows[0] if rows else None
@@ -3,9 +3,17 @@ from __future__ import annotations
 
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Tuple
+from typing import TYPE_CHECKING, Any, Iterator, Mapping, Optional, Sequence, Tuple, Union
+
+from .duckdb_mirror import default_duckdb_path
+from .snapshot import default_snapshot_dir, read_pointer
+
+if TYPE_CHECKING:
+    from .columnar import ColumnarBackend
 
 # Single source of truth for DB path:
 # Set SQLITE_PATH in your shell to avoid accidentally using another DB.
@@ -13,26 +21,105 @@ _DEFAULT = "cruise_reddit.db"
 _SQLITE_PATH = str(Path(os.getenv("SQLITE_PATH", _DEFAULT)).expanduser().resolve())
 
 
+# Aggregate endpoints can run on a DuckDB mirror (see duckdb_mirror.py) or on
+# in-memory NumPy columns (see columnar.py) instead:
+#   ANALYTICS_BACKEND=sqlite (default) | duckdb | numpy
+#   DUCKDB_PATH defaults to the SQLite path with a .duckdb suffix
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "sqlite").strip().lower()
+_DUCKDB_PATH = str(Path(os.getenv("DUCKDB_PATH") or default_duckdb_path(_SQLITE_PATH)).expanduser().resolve())
+
+
+# Read snapshots (see snapshot.py): with SQLITE_SNAPSHOTS=1 every API connection
+# opens the newest published snapshot read-only (immutable=1 + mmap) instead of
+# the live database; until the first publish it falls back to the live file.
+SQLITE_SNAPSHOTS = os.getenv("SQLITE_SNAPSHOTS", "0").strip() not in ("0", "false", "no", "")
+_SNAPSHOT_DIR = str(Path(os.getenv("SNAPSHOT_DIR") or default_snapshot_dir(_SQLITE_PATH)).expanduser().resolve())
+SNAPSHOT_MMAP_BYTES = int(os.getenv("SNAPSHOT_MMAP_BYTES", str(1 << 30)))
+
+
+class _SnapshotPointer:
+    """CURRENT, re-read only when the file changes (it's replaced on every publish)."""
+
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = snapshot_dir
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._current: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def current(self, force: bool = False) -> Optional[dict]:
+        try:
+            st = os.stat(os.path.join(self.snapshot_dir, "CURRENT"))
+            stamp: Optional[Tuple[int, int]] = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+        with self._lock:
+            if force or stamp != self._stamp:
+                self._current = read_pointer(self.snapshot_dir) if stamp else None
+                self._stamp = stamp
+                if self._current:
+                    print(f"[api] serving snapshot generation {self._current['generation']} ({self._current['path']})")
+            return self._current
+
+
+_snapshots = _SnapshotPointer(_SNAPSHOT_DIR)
+
+
 def get_sqlite_path() -> str:
     return _SQLITE_PATH
 
 
-def _connect() -> sqlite3.Connection:
-    # You want to see this every time the API touches the DB
-    print(f"[api] connecting sqlite_path={_SQLITE_PATH}")
+def get_snapshot_generation() -> Optional[int]:
+    """Generation the API currently reads, or None when it reads the live database."""
+    snap = _snapshots.current() if SQLITE_SNAPSHOTS else None
+    return snap["generation"] if snap else None
 
-    conn = sqlite3.connect(_SQLITE_PATH)
+
+def get_duckdb_path() -> str:
+    return _DUCKDB_PATH
+
+
+def _open_snapshot(check_same_thread: bool) -> Optional[sqlite3.Connection]:
+    for force in (False, True):
+        snap = _snapshots.current(force=force)
+        if snap is None:
+            return None
+        conn = sqlite3.connect(
+            Path(snap["path"]).as_uri() + "?mode=ro&immutable=1", uri=True, check_same_thread=check_same_thread,
+        )
+        try:
+            conn.execute(f"PRAGMA mmap_size={SNAPSHOT_MMAP_BYTES};")
+            conn.execute("PRAGMA schema_version;")  # opens the file now, not on the first query
+            return conn
+        except sqlite3.OperationalError:
+            # pruned between reading CURRENT and opening it: re-read CURRENT once
+            conn.close()
+    return None
+
+
+def _connect(check_same_thread: bool = True) -> sqlite3.Connection:
+    conn = _open_snapshot(check_same_thread) if SQLITE_SNAPSHOTS else None
+    if conn is None:
+        # You want to see this every time the API touches the DB
+        print(f"[api] connecting sqlite_path={_SQLITE_PATH}")
+        conn = sqlite3.connect(_SQLITE_PATH, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
 
     # Ensure JSON1 is available (most modern SQLite builds have it)
     # Not strictly required, but safe:
     conn.execute("PRAGMA foreign_keys=ON;")
+
+    # the feeds join near_dups (NLP/near_dup.py); a database the pipeline hasn't run on
+    # since it was added just has no clusters
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'near_dups'").fetchone() is None:
+        conn.execute("CREATE TEMP TABLE near_dups (comment_id TEXT PRIMARY KEY, cluster_id TEXT)")
     return conn
 
 
 @contextmanager
-def get_conn():
-    conn = _connect()
+def get_conn(check_same_thread: bool = True):
+    # Streaming responses iterate their generator from Starlette's threadpool,
+    # so each chunk may be pulled on a different thread.
+    conn = _connect(check_same_thread=check_same_thread)
     try:
         yield conn
     finally:
@@ -49,3 +136,167 @@ def fetch_one(conn: sqlite3.Connection, sql: str, params: Tuple[Any, ...] = ())
     cur = conn.execute(sql, params)
     row = cur.fetchone()
     return dict(row) if row else None
+
+
+def iter_rows(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: Union[Sequence[Any], Mapping[str, Any]] = (),
+    chunk_size: int = 1000,
+) -> Iterator[dict]:
+    """
+    Server-side cursor: pulls fetchmany() chunks so memory stays flat
+    no matter how many rows the query matches.
+    """
+    cur = conn.execute(sql, params)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        for r in rows:
+            yield dict(r)
+
+
+# ---------- analytics backends ----------
+# Both take a query *name*: the SQL lives in queries.py (SQLite) and
+# queries_duckdb.py (DuckDB) under the same constant name.
+class SQLiteBackend:
+    name = "sqlite"
+
+    def available(self) -> bool:
+        return True
+
+    def fetch_all(self, query_name: str, params: Tuple[Any, ...] = ()) -> list[dict]:
+        from . import queries as Q
+        with get_conn() as conn:
+            return fetch_all(conn, getattr(Q, query_name), params)
+
+    def fetch_one(self, query_name: str, params: Tuple[Any, ...] = ()) -> dict | None:
+        from . import queries as Q
+        with get_conn() as conn:
+            return fetch_one(conn, getattr(Q, query_name), params)
+
+
+class DuckDBBackend:
+    """
+    Read-only DuckDB mirror; anything it doesn't define (or a missing mirror
+    file) goes to SQLite. The mirror is rebuilt by swapping the file, so the
+    connection is reopened whenever the file's inode/mtime changes.
+    """
+    name = "duckdb"
+
+    def __init__(self, path: str, fallback: SQLiteBackend):
+        self.path = path
+        self.fallback = fallback
+        self._con = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._active = 0
+        self._cond = threading.Condition()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _acquire(self):
+        import duckdb
+
+        stamp = self._stat()
+        with self._cond:
+            if stamp != self._stamp:
+                # DuckDB hands back its cached instance while any connection to the
+                # path is open, so let in-flight queries finish before reopening.
+                while self._active:
+                    self._cond.wait()
+                if self._con is not None:
+                    self._con.close()
+                    self._con = None
+                if stamp is not None:
+                    print(f"[api] opening duckdb mirror {self.path}")
+                    self._con = duckdb.connect(self.path, read_only=True)
+                self._stamp = stamp
+            if self._con is None:
+                return None
+            self._active += 1
+            return self._con.cursor()
+
+    def _release(self, cur) -> None:
+        cur.close()
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def available(self) -> bool:
+        return self._stat() is not None
+
+    def _run(self, query_name: str, params: Tuple[Any, ...], one: bool):
+        from . import queries_duckdb as QD
+
+        sql = getattr(QD, query_name, None)
+        cur = self._acquire() if sql is not None else None
+        if cur is None:
+            if one:
+                return self.fallback.fetch_one(query_name, params)
+            return self.fallback.fetch_all(query_name, params)
+        try:
+            cur.execute(sql, list(params))
+            cols = [d[0] for d in cur.description]
+            rows = cur.fetchmany(1) if one else cur.fetchall()
+        finally:
+            self._release(cur)
+        out = [dict(zip(cols, r)) for r in rows]
+        if one:
+            return out[0] if out else None
+        return out
+
+    def fetch_all(self, query_name: str, params: Tuple[Any, ...] = ()) -> list[dict]:
+        return self._run(query_name, params, one=False)
+
+    def fetch_one(self, query_name: str, params: Tuple[Any, ...] = ()) -> dict | None:
+        return self._run(query_name, params, one=True)
+
+
+@lru_cache(maxsize=1)
+def get_analytics() -> Union[SQLiteBackend, DuckDBBackend, "ColumnarBackend"]:
+    """Backend for the summary/theme/trend/breakdown endpoints (ANALYTICS_BACKEND)."""
+    sqlite_backend = SQLiteBackend()
+    if ANALYTICS_BACKEND == "duckdb":
+        return DuckDBBackend(_DUCKDB_PATH, sqlite_backend)
+    if ANALYTICS_BACKEND == "numpy":
+        from .columnar import ColumnarBackend  # imports numpy
+        return ColumnarBackend(sqlite_backend)
+    if ANALYTICS_BACKEND != "sqlite":
+        raise ValueError(f"ANALYTICS_BACKEND must be 'sqlite', 'duckdb' or 'numpy', got {ANALYTICS_BACKEND!r}")
+    return sqlite_backend
+
+
+# API_WARMUP=1: app.py calls warm_up() at startup, so the first real request doesn't
+# also pay for resolving the snapshot, opening the file (mmap) and, with
+# ANALYTICS_BACKEND=duckdb, importing duckdb and opening the mirror
+# (=numpy: loading the columns).
+API_WARMUP = os.getenv("API_WARMUP", "0").strip() not in ("0", "false", "no", "")
+
+
+def warm_up() -> dict:
+    import time
+
+    t0 = time.perf_counter()
+    with get_conn() as conn:
+        # schema parse + the first pages of every table / index
+        fetch_all(conn, "SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")
+    analytics = get_analytics()
+    if isinstance(analytics, DuckDBBackend):
+        cur = analytics._acquire()
+        if cur is not None:
+            analytics._release(cur)
+    elif analytics.name == "numpy":
+        analytics.columns()
+    out = {
+        "snapshot_generation": get_snapshot_generation(),
+        "analytics_backend": analytics.name if analytics.available() else "sqlite",
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+    print(f"[api] warmed up in {out['ms']}ms ({out['analytics_backend']}, snapshot {out['snapshot_generation']})")
+    return out
@@ -0,0 +1,190 @@
+# cruiseNLP/api/duckdb_mirror.py
+"""
+Builds the DuckDB analytical mirror of the SQLite database.
+
+The mirror holds only what the aggregate endpoints read, pre-joined and with the
+JSON id arrays exploded into mention tables, so DuckDB can answer them with
+vectorized, multi-core scans instead of json_each() per row:
+
+  facts           one row per extraction row, joined to its scores and comment
+  port_mentions   (object_type, object_id, port_id)  from extraction.port_ids
+  ship_mentions   (object_type, object_id, ship_id)  from extraction.ship_ids
+  themes          (object_type, object_id, theme_label)
+
+Every build writes a fresh file next to the target and os.replace()s it in, so
+readers see either the old or the new mirror, never a half-built one. The API
+notices the new file and reopens it (see api/db.py).
+
+  python -m api.duckdb_mirror              # SQLITE_PATH -> DUCKDB_PATH
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from typing import Dict, Sequence, Tuple
+
+# sqlite table -> (column, duckdb type) copied into the mirror; no comment bodies, feeds stay on SQLite
+SOURCE_COLUMNS: Dict[str, Sequence[Tuple[str, str]]] = {
+    "extraction": (
+        ("object_type", "VARCHAR"), ("object_id", "VARCHAR"), ("cruise_line", "VARCHAR"),
+        ("ship_ids", "VARCHAR"), ("port_ids", "VARCHAR"),
+    ),
+    "nlp_scores": (
+        ("object_type", "VARCHAR"), ("object_id", "VARCHAR"), ("sentiment_label", "VARCHAR"),
+        ("sentiment_score", "DOUBLE"), ("severity_score", "DOUBLE"),
+    ),
+    "comments": (
+        ("comment_id", "VARCHAR"), ("created_utc", "BIGINT"), ("subreddit", "VARCHAR"),
+        ("author", "VARCHAR"), ("score", "BIGINT"),
+    ),
+    "themes": (("object_type", "VARCHAR"), ("object_id", "VARCHAR"), ("theme_label", "VARCHAR")),
+}
+
+DERIVED_SQL = [
+    # month is precomputed with the same UTC '%Y-%m' the SQLite trend queries use
+    """
+    CREATE TABLE facts AS
+    SELECT
+      e.object_type,
+      e.object_id,
+      TRIM(e.cruise_line) AS cruise_line,
+      LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) AS line_id,
+      s.object_id IS NOT NULL AS has_score,
+      s.sentiment_label,
+      s.sentiment_score,
+      s.severity_score,
+      c.comment_id IS NOT NULL AS has_comment,
+      c.created_utc,
+      strftime(make_timestamp(c.created_utc * 1000000), '%Y-%m') AS month,
+      LOWER(TRIM(c.subreddit)) AS subreddit,
+      c.score
+    FROM src_extraction e
+    LEFT JOIN src_nlp_scores s
+      ON s.object_type = e.object_type AND s.object_id = e.object_id
+    LEFT JOIN src_comments c
+      -- key on a CASE rather than ANDing the object_type test into ON: that keeps it a hash join
+      ON c.comment_id = CASE WHEN e.object_type = 'comment' THEN e.object_id END
+    """,
+    """
+    CREATE TABLE port_mentions AS
+    SELECT object_type, object_id, UNNEST(from_json(port_ids, '["VARCHAR"]')) AS port_id
+    FROM src_extraction
+    WHERE port_ids IS NOT NULL AND port_ids != '[]'
+    """,
+    """
+    CREATE TABLE ship_mentions AS
+    SELECT object_type, object_id, UNNEST(from_json(ship_ids, '["VARCHAR"]')) AS ship_id
+    FROM src_extraction
+    WHERE ship_ids IS NOT NULL AND ship_ids != '[]'
+    """,
+    "CREATE TABLE themes AS SELECT * FROM src_themes",
+]
+
+
+def default_duckdb_path(sqlite_path: str) -> str:
+    root, _ = os.path.splitext(sqlite_path)
+    return root + ".duckdb"
+
+
+def _create_staging(con) -> None:
+    for table, cols in SOURCE_COLUMNS.items():
+        ddl = ", ".join(f"{name} {typ}" for name, typ in cols)
+        con.execute(f"CREATE OR REPLACE TABLE src_{table} ({ddl})")
+
+
+def _copy_via_attach(con, sqlite_path: str) -> None:
+    """Fast path: DuckDB scans SQLite directly (needs the extension: `INSTALL sqlite` once)."""
+    con.execute("ATTACH ? AS src (TYPE sqlite, READ_ONLY)", (sqlite_path,))
+    try:
+        for table, cols in SOURCE_COLUMNS.items():
+            names = ", ".join(name for name, _ in cols)
+            con.execute(f"INSERT INTO src_{table} SELECT {names} FROM src.{table}")
+    finally:
+        con.execute("DETACH src")
+
+
+def _copy_via_arrow(con, sqlite_path: str, chunk_size: int = 200_000) -> None:
+    """Fallback: stream each table out of SQLite with fetchmany() and append it as Arrow batches."""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("building the mirror without DuckDB's sqlite extension needs 'pyarrow' (pip install pyarrow)") from e
+
+    src = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    try:
+        for table, cols in SOURCE_COLUMNS.items():
+            names = [name for name, _ in cols]
+            cur = src.execute(f"SELECT {', '.join(names)} FROM {table}")
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                con.register("batch", pa.table({n: [r[i] for r in rows] for i, n in enumerate(names)}))
+                con.execute(f"INSERT INTO src_{table} SELECT {', '.join(names)} FROM batch")
+                con.unregister("batch")
+    finally:
+        src.close()
+
+
+def build_mirror(sqlite_path: str, duckdb_path: str) -> Dict[str, int]:
+    """Rebuilds the whole mirror from `sqlite_path` and atomically replaces `duckdb_path`."""
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("the analytics mirror needs the 'duckdb' package (pip install duckdb)") from e
+
+    tmp = duckdb_path + ".building"
+    for p in (tmp, tmp + ".wal"):
+        if os.path.exists(p):
+            os.remove(p)
+
+    t0 = time.perf_counter()
+    # never download the sqlite extension mid-build; without it we take the Arrow path
+    con = duckdb.connect(tmp, config={"autoinstall_known_extensions": False})
+    try:
+        _create_staging(con)
+        try:
+            _copy_via_attach(con, sqlite_path)
+            how = "attach"
+        except duckdb.Error:
+            _create_staging(con)  # start over if the attach got partway
+            _copy_via_arrow(con, sqlite_path)
+            how = "arrow"
+
+        for sql in DERIVED_SQL:
+            con.execute(sql)
+        con.execute(
+            "CREATE TABLE mirror_meta AS SELECT ?::VARCHAR AS sqlite_path, ?::BIGINT AS built_at_utc",
+            (os.path.abspath(sqlite_path), int(time.time())),
+        )
+        for table in SOURCE_COLUMNS:
+            con.execute(f"DROP TABLE src_{table}")
+
+        counts = {
+            t: con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+            for t in ("facts", "port_mentions", "ship_mentions", "themes")
+        }
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+
+    os.replace(tmp, duckdb_path)
+    print(f"[MIRROR] {duckdb_path} built via {how} in {time.perf_counter() - t0:.1f}s: {counts}")
+    return counts
+
+
+def main() -> None:
+    import argparse
+
+    from .db import get_duckdb_path, get_sqlite_path
+
+    ap = argparse.ArgumentParser(description="Rebuild the DuckDB analytics mirror from SQLite")
+    ap.add_argument("--sqlite", default=get_sqlite_path())
+    ap.add_argument("--out", default=get_duckdb_path())
+    args = ap.parse_args()
+    build_mirror(args.sqlite, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ class Health(BaseModel):
     ok: bool
     sqlite_path: str
     tables: List[str] = []
+    analytics_backend: Optional[str] = None
+    snapshot_generation: Optional[int] = None
 
 
 class EntityRef(BaseModel):
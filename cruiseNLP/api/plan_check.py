@@ -0,0 +1,282 @@
+# cruiseNLP/api/plan_check.py
+"""
+Query plan regression check for the SQL in api/queries.py.
+
+Runs EXPLAIN QUERY PLAN for every query constant against a database with the
+production schema (scraping/db.py SCHEMA, indexes included) and planner stats
+for a typical ~1M comment database (FIXTURE_ROWS / CARDINALITY), and flags:
+
+  SCAN <table>          full scan of a large table (covering-index scans too)
+  WEAK SEARCH <table>   index lookup on low-cardinality columns only, e.g.
+                        object_type=?: walks most of the table, so it's a scan
+                        in practice (the json_each / LOWER(REPLACE()) filters
+                        can't use an index and end up here)
+  TEMP B-TREE ORDER BY  rows sorted after the fact instead of read in order
+                        (not flagged when sorting GROUP BY output: that's groups)
+
+Plans and flags are compared with the checked-in baseline (plan_baseline.json).
+A query that picks up a flag it didn't have, or a query new since the baseline
+that has any flag, is a regression, reported with the endpoints that run it
+(found by reading app.py's AST). Plan changes that add no flag are listed but
+don't fail the check.
+
+Run from cruiseNLP/:
+  python -m api.plan_check                     # compare, exit 1 on regressions
+  python -m api.plan_check --update            # accept the current plans as the baseline
+  python -m api.plan_check --db cruise_reddit.db   # use a real db (and its ANALYZE stats)
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from typing import Dict, Iterator, List, Optional, Set
+
+from scraping.db import connect, init_db
+
+from . import queries as Q
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(HERE, "app.py")
+BASELINE_PATH = os.path.join(HERE, "plan_baseline.json")
+
+LARGE_TABLES = {"posts", "comments", "nlp_scores", "extraction", "themes"}
+
+# sqlite_stat1 for the fixture: rows per table and distinct values per column
+# (columns not listed are treated as unique)
+FIXTURE_ROWS = {"posts": 40_000, "comments": 1_000_000, "extraction": 1_040_000,
+                "nlp_scores": 1_040_000, "themes": 1_300_000, "near_dups": 1_000_000}
+CARDINALITY = {
+    "object_type": 2, "sentiment_label": 3, "theme_label": 12, "cruise_line": 12, "subreddit": 12,
+    ("comments", "post_id"): 40_000,
+}
+LOW_CARDINALITY = 20
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)\b(?!\s*\()(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|GROUP\b)(\w+))?", re.I)
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+_NAMED = re.compile(r"(?<!:):(\w+)")
+_SEARCH = re.compile(r"^SEARCH (\w+) USING .*?\((.*)\)")
+_LAST_SELECT_GROUPED = re.compile(r"SELECT(?!.*\bSELECT\b).*\bGROUP BY\b", re.S | re.I)
+
+
+def _cardinality(table: str, column: str, rows: int) -> int:
+    return CARDINALITY.get((table, column)) or CARDINALITY.get(column) or rows
+
+
+def seed_stats(conn: sqlite3.Connection) -> None:
+    """Writes FIXTURE_ROWS-sized sqlite_stat1 rows for every index, so the planner sees a production-sized db."""
+    conn.execute("ANALYZE")  # creates sqlite_stat1
+    conn.execute("DELETE FROM sqlite_stat1")
+    for table, rows in FIXTURE_ROWS.items():
+        for _, index, unique, *_ in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            cols = [r[2] for r in conn.execute(f"PRAGMA index_info({index})")]
+            stat, distinct = [rows], 1
+            for i, col in enumerate(cols):
+                distinct *= _cardinality(table, col, rows)
+                last_unique = unique and i == len(cols) - 1
+                stat.append(1 if last_unique else max(1, rows // distinct))
+            conn.execute("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)",
+                         (table, index, " ".join(map(str, stat))))
+    conn.commit()
+
+
+def query_constants() -> Dict[str, str]:
+    return {
+        name: sql for name, sql in vars(Q).items()
+        if name.isupper() and isinstance(sql, str) and sql.lstrip().upper().startswith(("SELECT", "WITH"))
+    }
+
+
+def aliases(sql: str) -> Dict[str, str]:
+    """alias (or bare table name) -> table, from the FROM / JOIN clauses."""
+    out = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        out[table] = table
+        if alias:
+            out[alias] = table
+    return out
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """EXPLAIN QUERY PLAN as indented detail lines (all parameters bound to NULL)."""
+    names = set(_NAMED.findall(sql))
+    params = {n: None for n in names} if names else (None,) * sql.count("?")
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+
+    depth: Dict[int, int] = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def flags_for(sql: str, plan: List[str]) -> List[str]:
+    alias_map = aliases(sql)
+    sorts_groups = bool(_LAST_SELECT_GROUPED.search(sql))
+    flags = []
+    for line in plan:
+        detail = line.strip()
+        m = _SCAN.match(detail)
+        if m and alias_map.get(m.group(1), m.group(1)) in LARGE_TABLES:
+            flags.append(f"SCAN {alias_map.get(m.group(1), m.group(1))}")
+        m = _SEARCH.match(detail)
+        if m and alias_map.get(m.group(1), m.group(1)) in LARGE_TABLES:
+            table = alias_map.get(m.group(1), m.group(1))
+            cols = re.findall(r"(\w+)[=<>]", m.group(2))
+            if cols and all(_cardinality(table, c, FIXTURE_ROWS[table]) <= LOW_CARDINALITY for c in cols):
+                flags.append(f"WEAK SEARCH {table} ({', '.join(cols)})")
+        if "TEMP B-TREE" in detail and "ORDER BY" in detail and not sorts_groups:
+            flags.append("TEMP B-TREE ORDER BY")
+    return sorted(set(flags))
+
+
+# ---------- query -> endpoint, from app.py ----------
+def _own_nodes(fn: ast.AST) -> Iterator[ast.AST]:
+    """Nodes of a function body without descending into nested defs."""
+    stack = list(ast.iter_child_nodes(fn))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        yield node
+        stack.extend(ast.iter_child_nodes(node))
+
+
+def _route_path(fn: ast.FunctionDef) -> Optional[str]:
+    for dec in fn.decorator_list:
+        if (isinstance(dec, ast.Call) and isinstance(dec.func, ast.Attribute)
+                and dec.func.attr in ("get", "post", "put", "delete", "patch")
+                and dec.args and isinstance(dec.args[0], ast.Constant)):
+            return f"{dec.func.attr.upper()} {dec.args[0].value}"
+    return None
+
+
+def endpoints_by_query(app_path: str = APP_PATH) -> Dict[str, List[str]]:
+    """
+    Query constant -> endpoints. A function uses a query if it references Q.NAME,
+    or passes "NAME" to an analytics backend call; helpers it calls count too.
+    """
+    with open(app_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), app_path)
+    names = set(query_constants())
+
+    funcs = {n.name: n for n in tree.body if isinstance(n, ast.FunctionDef)}
+    uses: Dict[str, Set[str]] = {}
+    calls: Dict[str, Set[str]] = {}
+    for name, fn in funcs.items():
+        uses[name], calls[name] = set(), set()
+        for node in _own_nodes(fn):
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "Q":
+                uses[name].add(node.attr)
+            elif isinstance(node, ast.Constant) and node.value in names:
+                uses[name].add(node.value)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in funcs:
+                calls[name].add(node.func.id)
+
+    def reachable(name: str, seen: Set[str]) -> Set[str]:
+        out = set(uses[name])
+        for callee in calls[name] - seen:
+            out |= reachable(callee, seen | {callee})
+        return out
+
+    by_query: Dict[str, List[str]] = {}
+    for name, fn in funcs.items():
+        path = _route_path(fn)
+        if path:
+            for q in reachable(name, {name}):
+                by_query.setdefault(q, []).append(path)
+    return by_query
+
+
+# ---------- check ----------
+def collect(conn: sqlite3.Connection) -> Dict[str, Dict]:
+    out = {}
+    for name, sql in sorted(query_constants().items()):
+        plan = explain(conn, sql)
+        out[name] = {"plan": plan, "flags": flags_for(sql, plan)}
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN regression check for api/queries.py")
+    ap.add_argument("--db", default=None, help="database to plan against (default: empty db with the production schema)")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--update", action="store_true", help="write the current plans as the new baseline")
+    ap.add_argument("--verbose", action="store_true", help="print every plan")
+    args = ap.parse_args()
+
+    if args.db:
+        conn = sqlite3.connect(f"file:{os.path.abspath(args.db)}?mode=ro", uri=True)
+    else:
+        fixture = os.path.join(tempfile.mkdtemp(prefix="plan_check_"), "schema.db")
+        conn = connect(fixture)
+        init_db(conn)
+        seed_stats(conn)
+        conn.close()
+        conn = sqlite3.connect(fixture)  # stats are read when the schema loads
+    current = collect(conn)
+    conn.close()
+    endpoints = endpoints_by_query()
+
+    if args.update:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"sqlite_version": sqlite3.sqlite_version, "queries": current}, f, indent=2)
+            f.write("\n")
+        print(f"[PLAN] wrote {len(current)} plans to {args.baseline}")
+        return
+
+    baseline: Dict[str, Dict] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            data = json.load(f)
+        baseline = data["queries"]
+        if data.get("sqlite_version") != sqlite3.sqlite_version:
+            print(f"[PLAN] note: baseline from SQLite {data.get('sqlite_version')}, running {sqlite3.sqlite_version}")
+    else:
+        print(f"[PLAN] no baseline at {args.baseline}; run with --update to create one")
+
+    regressions = 0
+    for name, cur in current.items():
+        served = ", ".join(endpoints.get(name, [])) or "(no endpoint)"
+        base = baseline.get(name)
+        if base is None:
+            # a new query is held to the same bar: any flag fails until --update accepts it
+            new_flags = cur["flags"]
+            status = "NEW, FLAGGED" if new_flags else "NEW QUERY"
+        else:
+            new_flags = [f for f in cur["flags"] if f not in base["flags"]]
+            fixed = [f for f in base["flags"] if f not in cur["flags"]]
+            if new_flags:
+                status = "REGRESSION"
+            elif fixed:
+                status = "improved (" + ", ".join(fixed) + " gone)"
+            elif cur["plan"] != base["plan"]:
+                status = "plan changed"
+            else:
+                status = "ok"
+        if new_flags:
+            regressions += 1
+
+        print(f"{name:<26} {status:<14} {', '.join(cur['flags']) or '-'}")
+        if status != "ok" or args.verbose:
+            print(f"    endpoints: {served}")
+            if new_flags:
+                print(f"    new: {', '.join(new_flags)}")
+            for line in cur["plan"]:
+                print(f"    | {line}")
+
+    for name in sorted(set(baseline) - set(current)):
+        print(f"{name:<26} removed")
+
+    print(f"[PLAN] {len(current)} queries, {regressions} regression(s)")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
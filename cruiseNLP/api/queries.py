@@ -27,52 +27,25 @@ GROUP BY je.value
 ORDER BY mentions DESC
 LIMIT ?;
 """
+# comments without a line of their own carry the post's / subreddit's (line_source, NLP/thread_context.py)
 PORT_LINES = """
-WITH base AS (
-  SELECT
-    e.object_id,
-    TRIM(e.cruise_line) AS cruise_line_raw,
-    LOWER(TRIM(c.subreddit)) AS subreddit,
-    je.value AS port_id
-  FROM extraction e
-  JOIN nlp_scores s
-    ON s.object_type = e.object_type AND s.object_id = e.object_id
-  JOIN comments c
-    ON c.comment_id = e.object_id
-  JOIN json_each(e.port_ids) AS je
-  WHERE e.object_type = 'comment'
-    AND e.port_ids IS NOT NULL
-    AND e.port_ids != '[]'
-    AND je.value = ?
-),
-labeled AS (
-  SELECT
-    port_id,
-    COALESCE(
-      NULLIF(cruise_line_raw, ''),
-      CASE
-        WHEN subreddit IN ('royalcaribbean', 'rccl', 'rcl') THEN 'Royal Caribbean'
-        WHEN subreddit IN ('carnivalcruise', 'carnivalcruisefans') THEN 'Carnival'
-        WHEN subreddit IN ('ncl', 'norwegiancruise') THEN 'Norwegian'
-        WHEN subreddit IN ('msccruises') THEN 'MSC'
-        WHEN subreddit IN ('disneycruise', 'disneycruiseline') THEN 'Disney'
-        WHEN subreddit IN ('princesscruises') THEN 'Princess'
-        WHEN subreddit IN ('celebritycruises') THEN 'Celebrity'
-        WHEN subreddit IN ('hollandamerica') THEN 'Holland America'
-        WHEN subreddit IN ('virginvoyages') THEN 'Virgin Voyages'
-        WHEN subreddit IN ('cruise', 'cruises') THEN NULL
-        ELSE NULL
-      END
-    ) AS line_name
-  FROM base
-)
 SELECT
-  LOWER(REPLACE(TRIM(line_name), ' ', '-')) AS line_id,
-  TRIM(line_name) AS line_name,
+  LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) AS line_id,
+  TRIM(e.cruise_line) AS line_name,
   COUNT(*) AS mentions
-FROM labeled
-WHERE line_name IS NOT NULL
-GROUP BY TRIM(line_name)
+FROM extraction e
+JOIN nlp_scores s
+  ON s.object_type = e.object_type AND s.object_id = e.object_id
+JOIN comments c
+  ON c.comment_id = e.object_id
+JOIN json_each(e.port_ids) AS je
+WHERE e.object_type = 'comment'
+  AND e.port_ids IS NOT NULL
+  AND e.port_ids != '[]'
+  AND je.value = ?
+  AND e.cruise_line IS NOT NULL
+  AND TRIM(e.cruise_line) != ''
+GROUP BY TRIM(e.cruise_line)
 ORDER BY mentions DESC
 LIMIT ?;
 """
@@ -219,57 +192,96 @@ ORDER BY avg_sent ASC
 LIMIT ?;
 """
 
+# feeds show one comment per near-duplicate cluster (near_dups, NLP/near_dup.py): its best-ranked copy
 PORT_WORST_FEED = """
 SELECT
-  c.comment_id AS object_id,
-  'comment' AS object_type,
-  c.created_utc,
-  c.subreddit,
-  s.sentiment_label,
-  s.sentiment_score,
-  s.severity_score,
-  SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
-  c.permalink
-FROM extraction e
-JOIN nlp_scores s
-  ON s.object_type = e.object_type AND s.object_id = e.object_id
-JOIN comments c
-  ON c.comment_id = e.object_id
-JOIN json_each(e.port_ids) AS je
-WHERE e.object_type='comment'
-  AND e.port_ids IS NOT NULL
-  AND e.port_ids != '[]'
-  AND je.value = ?
-  AND COALESCE(c.author,'') NOT IN ('AutoModerator')
-ORDER BY s.severity_score DESC, s.sentiment_score ASC
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    s.sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_id, c.comment_id)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM extraction e
+  JOIN nlp_scores s
+    ON s.object_type = e.object_type AND s.object_id = e.object_id
+  JOIN comments c
+    ON c.comment_id = e.object_id
+  JOIN json_each(e.port_ids) AS je
+  LEFT JOIN near_dups d
+    ON d.comment_id = c.comment_id
+  WHERE e.object_type='comment'
+    AND e.port_ids IS NOT NULL
+    AND e.port_ids != '[]'
+    AND je.value = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
 LIMIT ?;
 """
 PORT_WORST_FEED_BY_THEME = """
 SELECT
-  c.comment_id AS object_id,
-  'comment' AS object_type,
-  c.created_utc,
-  c.subreddit,
-  s.sentiment_label,
-  s.sentiment_score,
-  s.severity_score,
-  SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
-  c.permalink
-FROM extraction e
-JOIN nlp_scores s
-  ON s.object_type = e.object_type AND s.object_id = e.object_id
-JOIN comments c
-  ON c.comment_id = e.object_id
-JOIN json_each(e.port_ids) AS je
-JOIN themes t
-  ON t.object_type = e.object_type AND t.object_id = e.object_id
-WHERE e.object_type='comment'
-  AND e.port_ids IS NOT NULL
-  AND e.port_ids != '[]'
-  AND je.value = ?
-  AND t.theme_label = ?
-  AND COALESCE(c.author,'') NOT IN ('AutoModerator')
-ORDER BY s.severity_score DESC, s.sentiment_score ASC
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    s.sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_id, c.comment_id)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM extraction e
+  JOIN nlp_scores s
+    ON s.object_type = e.object_type AND s.object_id = e.object_id
+  JOIN comments c
+    ON c.comment_id = e.object_id
+  JOIN json_each(e.port_ids) AS je
+  JOIN themes t
+    ON t.object_type = e.object_type AND t.object_id = e.object_id
+  LEFT JOIN near_dups d
+    ON d.comment_id = c.comment_id
+  WHERE e.object_type='comment'
+    AND e.port_ids IS NOT NULL
+    AND e.port_ids != '[]'
+    AND je.value = ?
+    AND t.theme_label = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
 LIMIT ?;
 """
 PORT_TREND = """
@@ -288,26 +300,45 @@ ORDER BY month;
 
 LINE_WORST_FEED = """
 SELECT
-  c.comment_id AS object_id,
-  'comment' AS object_type,
-  c.created_utc,
-  c.subreddit,
-  s.sentiment_label,
-  s.sentiment_score,
-  s.severity_score,
-  SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
-  c.permalink
-FROM extraction e
-JOIN nlp_scores s
-  ON s.object_type = e.object_type AND s.object_id = e.object_id
-JOIN comments c
-  ON c.comment_id = e.object_id
-WHERE e.object_type='comment'
-  AND e.cruise_line IS NOT NULL
-  AND TRIM(e.cruise_line) <> ''
-  AND LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) = ?
-  AND COALESCE(c.author,'') NOT IN ('AutoModerator')
-ORDER BY s.severity_score DESC, s.sentiment_score ASC
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    s.sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_id, c.comment_id)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM extraction e
+  JOIN nlp_scores s
+    ON s.object_type = e.object_type AND s.object_id = e.object_id
+  JOIN comments c
+    ON c.comment_id = e.object_id
+  LEFT JOIN near_dups d
+    ON d.comment_id = c.comment_id
+  WHERE e.object_type='comment'
+    AND e.cruise_line IS NOT NULL
+    AND TRIM(e.cruise_line) <> ''
+    AND LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
 LIMIT ?;
 """
 
@@ -334,54 +365,94 @@ LIMIT ?;
 
 LINE_TOP_COMMENTS = """
 SELECT
-  c.comment_id AS object_id,
-  'comment' AS object_type,
-  c.created_utc,
-  c.subreddit,
-  c.score,
-  s.sentiment_label,
-  s.sentiment_score,
-  s.severity_score,
-  SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
-  c.permalink
-FROM extraction e
-JOIN nlp_scores s
-  ON s.object_type = e.object_type AND s.object_id = e.object_id
-JOIN comments c
-  ON c.comment_id = e.object_id
-WHERE e.object_type='comment'
-  AND e.cruise_line IS NOT NULL
-  AND TRIM(e.cruise_line) <> ''
-  AND LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) = ?
-  AND COALESCE(c.author,'') NOT IN ('AutoModerator')
-ORDER BY c.score DESC, s.severity_score DESC
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  score,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    c.score,
+    s.sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_id, c.comment_id)
+      ORDER BY c.score DESC, s.severity_score DESC
+    ) AS dup_rank
+  FROM extraction e
+  JOIN nlp_scores s
+    ON s.object_type = e.object_type AND s.object_id = e.object_id
+  JOIN comments c
+    ON c.comment_id = e.object_id
+  LEFT JOIN near_dups d
+    ON d.comment_id = c.comment_id
+  WHERE e.object_type='comment'
+    AND e.cruise_line IS NOT NULL
+    AND TRIM(e.cruise_line) <> ''
+    AND LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY score DESC, severity_score DESC
 LIMIT ?;
 """
 
 
 LINE_WORST_COMMENTS = """
 SELECT
-  c.comment_id AS object_id,
-  'comment' AS object_type,
-  c.created_utc,
-  c.subreddit,
-  c.score,
-  s.sentiment_label,
-  s.sentiment_score,
-  s.severity_score,
-  SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
-  c.permalink
-FROM extraction e
-JOIN nlp_scores s
-  ON s.object_type = e.object_type AND s.object_id = e.object_id
-JOIN comments c
-  ON c.comment_id = e.object_id
-WHERE e.object_type='comment'
-  AND e.cruise_line IS NOT NULL
-  AND TRIM(e.cruise_line) <> ''
-  AND LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) = ?
-  AND COALESCE(c.author,'') NOT IN ('AutoModerator')
-ORDER BY s.severity_score DESC, s.sentiment_score ASC
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  score,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    c.score,
+    s.sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_id, c.comment_id)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM extraction e
+  JOIN nlp_scores s
+    ON s.object_type = e.object_type AND s.object_id = e.object_id
+  JOIN comments c
+    ON c.comment_id = e.object_id
+  LEFT JOIN near_dups d
+    ON d.comment_id = c.comment_id
+  WHERE e.object_type='comment'
+    AND e.cruise_line IS NOT NULL
+    AND TRIM(e.cruise_line) <> ''
+    AND LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
 LIMIT ?;
 """
 
@@ -462,54 +533,137 @@ ORDER BY month;
 """
 SHIP_TOP_COMMENTS = """
 SELECT
-  c.comment_id AS object_id,
-  'comment' AS object_type,
-  c.created_utc,
-  c.subreddit,
-  c.score,
-  s.sentiment_label,
-  s.sentiment_score,
-  s.severity_score,
-  SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
-  c.permalink
-FROM extraction e
-JOIN nlp_scores s
-  ON s.object_type = e.object_type AND s.object_id = e.object_id
-JOIN comments c
-  ON c.comment_id = e.object_id
-JOIN json_each(e.ship_ids) AS se
-WHERE e.object_type='comment'
-  AND e.ship_ids IS NOT NULL
-  AND e.ship_ids != '[]'
-  AND se.value = ?
-  AND COALESCE(c.author,'') NOT IN ('AutoModerator')
-ORDER BY c.score DESC, s.severity_score DESC
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  score,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    c.score,
+    s.sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_id, c.comment_id)
+      ORDER BY c.score DESC, s.severity_score DESC
+    ) AS dup_rank
+  FROM extraction e
+  JOIN nlp_scores s
+    ON s.object_type = e.object_type AND s.object_id = e.object_id
+  JOIN comments c
+    ON c.comment_id = e.object_id
+  JOIN json_each(e.ship_ids) AS se
+  LEFT JOIN near_dups d
+    ON d.comment_id = c.comment_id
+  WHERE e.object_type='comment'
+    AND e.ship_ids IS NOT NULL
+    AND e.ship_ids != '[]'
+    AND se.value = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY score DESC, severity_score DESC
 LIMIT ?;
 """
 SHIP_WORST_COMMENTS = """
 SELECT
-  c.comment_id AS object_id,
-  'comment' AS object_type,
-  c.created_utc,
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  score,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    c.score,
+    s.sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_id, c.comment_id)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM extraction e
+  JOIN nlp_scores s
+    ON s.object_type = e.object_type AND s.object_id = e.object_id
+  JOIN comments c
+    ON c.comment_id = e.object_id
+  JOIN json_each(e.ship_ids) AS se
+  LEFT JOIN near_dups d
+    ON d.comment_id = c.comment_id
+  WHERE e.object_type='comment'
+    AND e.ship_ids IS NOT NULL
+    AND e.ship_ids != '[]'
+    AND se.value = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
+LIMIT ?;
+"""
+
+
+# /export: every filter is optional, pass NULL to skip it.
+# Named params: port_id, line_id, ship_id, theme, sentiment, start_utc, end_utc
+# No ORDER BY on purpose: sorting would buffer the whole result before the first row.
+EXPORT_COMMENTS = """
+SELECT
+  c.comment_id,
+  c.post_id,
   c.subreddit,
+  c.created_utc,
+  c.author,
   c.score,
   s.sentiment_label,
   s.sentiment_score,
   s.severity_score,
-  SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+  e.cruise_line,
+  e.port_ids,
+  e.ship_ids,
+  (
+    SELECT json_group_array(t.theme_label)
+    FROM themes t
+    WHERE t.object_type = 'comment' AND t.object_id = c.comment_id
+  ) AS themes,
+  c.body,
   c.permalink
-FROM extraction e
+FROM comments c
 JOIN nlp_scores s
-  ON s.object_type = e.object_type AND s.object_id = e.object_id
-JOIN comments c
-  ON c.comment_id = e.object_id
-JOIN json_each(e.ship_ids) AS se
-WHERE e.object_type='comment'
-  AND e.ship_ids IS NOT NULL
-  AND e.ship_ids != '[]'
-  AND se.value = ?
-  AND COALESCE(c.author,'') NOT IN ('AutoModerator')
-ORDER BY s.severity_score DESC, s.sentiment_score ASC
-LIMIT ?;
+  ON s.object_type = 'comment' AND s.object_id = c.comment_id
+LEFT JOIN extraction e
+  ON e.object_type = 'comment' AND e.object_id = c.comment_id
+WHERE COALESCE(c.author,'') NOT IN ('AutoModerator')
+  AND (:start_utc IS NULL OR c.created_utc >= :start_utc)
+  AND (:end_utc IS NULL OR c.created_utc < :end_utc)
+  AND (:sentiment IS NULL OR s.sentiment_label = :sentiment)
+  AND (:line_id IS NULL OR LOWER(REPLACE(TRIM(e.cruise_line), ' ', '-')) = :line_id)
+  AND (:port_id IS NULL OR EXISTS (
+        SELECT 1 FROM json_each(e.port_ids) AS je WHERE je.value = :port_id))
+  AND (:ship_id IS NULL OR EXISTS (
+        SELECT 1 FROM json_each(e.ship_ids) AS se WHERE se.value = :ship_id))
+  AND (:theme IS NULL OR EXISTS (
+        SELECT 1 FROM themes t
+        WHERE t.object_type = 'comment' AND t.object_id = c.comment_id AND t.theme_label = :theme));
 """
-
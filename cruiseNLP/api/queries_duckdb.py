@@ -0,0 +1,254 @@
+# cruiseNLP/api/queries_duckdb.py
+from __future__ import annotations
+
+# DuckDB versions of the aggregate queries in queries.py, run against the mirror
+# built by duckdb_mirror.py. Constant names and parameter order match queries.py,
+# so api/db.py can route a query by name and fall back to SQLite for anything
+# not defined here (feeds, search, export).
+#
+# facts has one row per extraction row; has_score / has_comment stand in for
+# the inner joins the SQLite versions do against nlp_scores / comments.
+
+LIST_PORTS = """
+SELECT
+  pm.port_id,
+  COUNT(*) AS mentions
+FROM port_mentions pm
+JOIN facts f
+  ON f.object_type = pm.object_type AND f.object_id = pm.object_id
+WHERE pm.object_type = 'comment'
+  AND f.has_score
+GROUP BY pm.port_id
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+PORT_LINES = """
+SELECT
+  LOWER(REPLACE(TRIM(f.cruise_line), ' ', '-')) AS line_id,
+  TRIM(f.cruise_line) AS line_name,
+  COUNT(*) AS mentions
+FROM port_mentions pm
+JOIN facts f
+  ON f.object_type = pm.object_type AND f.object_id = pm.object_id
+WHERE pm.object_type = 'comment'
+  AND pm.port_id = ?
+  AND f.has_score
+  AND f.has_comment
+  AND f.cruise_line IS NOT NULL
+  AND TRIM(f.cruise_line) != ''
+GROUP BY TRIM(f.cruise_line)
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+PORT_SHIPS = """
+SELECT
+  sm.ship_id,
+  COUNT(*) AS mentions
+FROM port_mentions pm
+JOIN ship_mentions sm
+  ON sm.object_type = pm.object_type AND sm.object_id = pm.object_id
+JOIN facts f
+  ON f.object_type = pm.object_type AND f.object_id = pm.object_id
+WHERE pm.object_type = 'comment'
+  AND pm.port_id = ?
+  AND f.has_score
+GROUP BY sm.ship_id
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+# same as SQLite: every object type, no score required
+LIST_LINES = """
+SELECT
+  cruise_line AS line_name,
+  line_id,
+  COUNT(*) AS mentions
+FROM facts
+WHERE cruise_line IS NOT NULL
+  AND cruise_line <> ''
+GROUP BY cruise_line, line_id
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+PORT_SENTIMENT_SUMMARY = """
+SELECT
+  COUNT(*) AS mentions,
+  AVG(f.sentiment_score) AS avg_sentiment,
+  AVG(f.severity_score) AS avg_severity,
+  SUM(CASE WHEN f.sentiment_label = 'neg' THEN 1 ELSE 0 END) AS neg_count,
+  SUM(CASE WHEN f.sentiment_label = 'pos' THEN 1 ELSE 0 END) AS pos_count,
+  SUM(CASE WHEN f.sentiment_label = 'neu' THEN 1 ELSE 0 END) AS neu_count
+FROM port_mentions pm
+JOIN facts f
+  ON f.object_type = pm.object_type AND f.object_id = pm.object_id
+WHERE pm.object_type = 'comment'
+  AND pm.port_id = ?
+  AND f.has_score;
+"""
+
+LINE_SENTIMENT_SUMMARY = """
+SELECT
+  COUNT(*) AS mentions,
+  AVG(sentiment_score) AS avg_sentiment,
+  AVG(severity_score) AS avg_severity,
+  SUM(CASE WHEN sentiment_label = 'neg' THEN 1 ELSE 0 END) AS neg_count,
+  SUM(CASE WHEN sentiment_label = 'pos' THEN 1 ELSE 0 END) AS pos_count,
+  SUM(CASE WHEN sentiment_label = 'neu' THEN 1 ELSE 0 END) AS neu_count
+FROM facts
+WHERE object_type = 'comment'
+  AND cruise_line <> ''
+  AND line_id = ?
+  AND has_score;
+"""
+
+SHIP_SENTIMENT_SUMMARY = """
+SELECT
+  COUNT(*) AS mentions,
+  AVG(f.sentiment_score) AS avg_sentiment,
+  AVG(f.severity_score) AS avg_severity,
+  SUM(CASE WHEN f.sentiment_label = 'neg' THEN 1 ELSE 0 END) AS neg_count,
+  SUM(CASE WHEN f.sentiment_label = 'pos' THEN 1 ELSE 0 END) AS pos_count,
+  SUM(CASE WHEN f.sentiment_label = 'neu' THEN 1 ELSE 0 END) AS neu_count
+FROM ship_mentions sm
+JOIN facts f
+  ON f.object_type = sm.object_type AND f.object_id = sm.object_id
+WHERE sm.object_type = 'comment'
+  AND sm.ship_id = ?
+  AND f.has_score;
+"""
+
+PORT_THEMES = """
+SELECT
+  t.theme_label,
+  COUNT(*) AS n,
+  AVG(f.sentiment_score) AS avg_sent,
+  SUM(CASE WHEN f.sentiment_label = 'neg' THEN 1 ELSE 0 END) AS neg_count
+FROM themes t
+JOIN facts f
+  ON f.object_type = t.object_type AND f.object_id = t.object_id
+JOIN port_mentions pm
+  ON pm.object_type = t.object_type AND pm.object_id = t.object_id
+WHERE t.object_type = 'comment'
+  AND pm.port_id = ?
+  AND f.has_score
+GROUP BY t.theme_label
+HAVING COUNT(*) >= ?
+ORDER BY avg_sent ASC
+LIMIT ?;
+"""
+
+LINE_THEMES = """
+SELECT
+  t.theme_label,
+  COUNT(*) AS n,
+  AVG(f.sentiment_score) AS avg_sent,
+  SUM(CASE WHEN f.sentiment_label = 'neg' THEN 1 ELSE 0 END) AS neg_count
+FROM themes t
+JOIN facts f
+  ON f.object_type = t.object_type AND f.object_id = t.object_id
+WHERE t.object_type = 'comment'
+  AND f.cruise_line <> ''
+  AND f.line_id = ?
+  AND f.has_score
+GROUP BY t.theme_label
+HAVING COUNT(*) >= ?
+ORDER BY avg_sent ASC
+LIMIT ?;
+"""
+
+PORT_TREND = """
+SELECT
+  f.month,
+  AVG(f.severity_score) AS avg_sev,
+  AVG(f.sentiment_score) AS avg_sent
+FROM port_mentions pm
+JOIN facts f
+  ON f.object_type = pm.object_type AND f.object_id = pm.object_id
+WHERE pm.port_id = ?
+  AND f.has_score
+  AND f.has_comment
+GROUP BY f.month
+ORDER BY f.month;
+"""
+
+LINE_PORTS = """
+SELECT
+  pm.port_id,
+  COUNT(*) AS mentions,
+  AVG(f.severity_score) AS avg_sev,
+  AVG(f.sentiment_score) AS avg_sent
+FROM facts f
+JOIN port_mentions pm
+  ON pm.object_type = f.object_type AND pm.object_id = f.object_id
+WHERE f.object_type = 'comment'
+  AND f.cruise_line <> ''
+  AND f.line_id = ?
+  AND f.has_score
+GROUP BY pm.port_id
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+LINE_TREND = """
+SELECT
+  month,
+  AVG(severity_score) AS avg_sev,
+  AVG(sentiment_score) AS avg_sent,
+  COUNT(*) AS mentions
+FROM facts
+WHERE object_type = 'comment'
+  AND cruise_line <> ''
+  AND line_id = ?
+  AND has_score
+  AND has_comment
+GROUP BY month
+ORDER BY month;
+"""
+
+SHIP_PORTS = """
+SELECT
+  pm.port_id,
+  COUNT(*) AS mentions,
+  AVG(f.severity_score) AS avg_sev,
+  AVG(f.sentiment_score) AS avg_sent
+FROM ship_mentions sm
+JOIN port_mentions pm
+  ON pm.object_type = sm.object_type AND pm.object_id = sm.object_id
+JOIN facts f
+  ON f.object_type = sm.object_type AND f.object_id = sm.object_id
+WHERE sm.object_type = 'comment'
+  AND sm.ship_id = ?
+  AND f.has_score
+GROUP BY pm.port_id
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+SHIP_TREND = """
+SELECT
+  f.month,
+  AVG(f.severity_score) AS avg_sev,
+  AVG(f.sentiment_score) AS avg_sent,
+  COUNT(*) AS mentions
+FROM ship_mentions sm
+JOIN facts f
+  ON f.object_type = sm.object_type AND f.object_id = sm.object_id
+WHERE sm.object_type = 'comment'
+  AND sm.ship_id = ?
+  AND f.has_score
+  AND f.has_comment
+GROUP BY f.month
+ORDER BY f.month;
+"""
+
+# queries app.py routes through the analytics backend
+ROUTED = (
+    "LIST_PORTS", "LIST_LINES",
+    "PORT_SENTIMENT_SUMMARY", "LINE_SENTIMENT_SUMMARY", "SHIP_SENTIMENT_SUMMARY",
+    "PORT_THEMES", "LINE_THEMES",
+    "PORT_TREND", "LINE_TREND", "SHIP_TREND",
+    "PORT_LINES", "PORT_SHIPS", "LINE_PORTS", "SHIP_PORTS",
+)
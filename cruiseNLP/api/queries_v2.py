@@ -0,0 +1,347 @@
+# cruiseNLP/api/queries_v2.py
+from __future__ import annotations
+
+# The queries.py queries ported to schema v2 (scraping/schema_v2.py). Constant
+# names, parameters and result columns match queries.py; the API doesn't read
+# v2 yet, api/bench_schema_v2.py runs both versions side by side.
+#
+# Entities are looked up once in their dictionary (ports.port_id = ?) and the
+# rest of the join is on integer keys. "object_type = 'comment'" becomes a join
+# to objects (or comments, when the query needs comment columns anyway).
+
+LIST_PORTS = """
+SELECT
+  p.port_id,
+  COUNT(*) AS mentions
+FROM port_mentions pm
+JOIN ports p ON p.port_key = pm.port_key
+JOIN objects o ON o.object_key = pm.object_key AND o.object_type = 2
+JOIN nlp_scores s ON s.object_key = pm.object_key
+GROUP BY pm.port_key
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+PORT_SHIPS = """
+SELECT
+  sh.ship_id,
+  COUNT(*) AS mentions
+FROM ports p
+JOIN port_mentions pm ON pm.port_key = p.port_key
+JOIN objects o ON o.object_key = pm.object_key AND o.object_type = 2
+JOIN nlp_scores s ON s.object_key = pm.object_key
+JOIN ship_mentions sm ON sm.object_key = pm.object_key
+JOIN ships sh ON sh.ship_key = sm.ship_key
+WHERE p.port_id = ?
+GROUP BY sm.ship_key
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+LIST_LINES = """
+SELECT
+  l.line_name,
+  l.line_id,
+  COUNT(*) AS mentions
+FROM extraction e
+JOIN cruise_lines l ON l.line_key = e.line_key
+WHERE e.line_key IS NOT NULL
+GROUP BY e.line_key
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+PORT_SENTIMENT_SUMMARY = """
+SELECT
+  COUNT(*) AS mentions,
+  AVG(s.sentiment_score) AS avg_sentiment,
+  AVG(s.severity_score) AS avg_severity,
+  SUM(CASE WHEN s.sentiment = -1 THEN 1 ELSE 0 END) AS neg_count,
+  SUM(CASE WHEN s.sentiment = 1 THEN 1 ELSE 0 END) AS pos_count,
+  SUM(CASE WHEN s.sentiment = 0 THEN 1 ELSE 0 END) AS neu_count
+FROM ports p
+JOIN port_mentions pm ON pm.port_key = p.port_key
+JOIN objects o ON o.object_key = pm.object_key AND o.object_type = 2
+JOIN nlp_scores s ON s.object_key = pm.object_key
+WHERE p.port_id = ?;
+"""
+
+LINE_SENTIMENT_SUMMARY = """
+SELECT
+  COUNT(*) AS mentions,
+  AVG(s.sentiment_score) AS avg_sentiment,
+  AVG(s.severity_score) AS avg_severity,
+  SUM(CASE WHEN s.sentiment = -1 THEN 1 ELSE 0 END) AS neg_count,
+  SUM(CASE WHEN s.sentiment = 1 THEN 1 ELSE 0 END) AS pos_count,
+  SUM(CASE WHEN s.sentiment = 0 THEN 1 ELSE 0 END) AS neu_count
+FROM cruise_lines l
+JOIN extraction e ON e.line_key = l.line_key
+JOIN objects o ON o.object_key = e.object_key AND o.object_type = 2
+JOIN nlp_scores s ON s.object_key = e.object_key
+WHERE l.line_id = ?;
+"""
+
+SHIP_SENTIMENT_SUMMARY = """
+SELECT
+  COUNT(*) AS mentions,
+  AVG(s.sentiment_score) AS avg_sentiment,
+  AVG(s.severity_score) AS avg_severity,
+  SUM(CASE WHEN s.sentiment = -1 THEN 1 ELSE 0 END) AS neg_count,
+  SUM(CASE WHEN s.sentiment = 1 THEN 1 ELSE 0 END) AS pos_count,
+  SUM(CASE WHEN s.sentiment = 0 THEN 1 ELSE 0 END) AS neu_count
+FROM ships sh
+JOIN ship_mentions sm ON sm.ship_key = sh.ship_key
+JOIN objects o ON o.object_key = sm.object_key AND o.object_type = 2
+JOIN nlp_scores s ON s.object_key = sm.object_key
+WHERE sh.ship_id = ?;
+"""
+
+PORT_THEMES = """
+SELECT
+  tl.theme_label,
+  COUNT(*) AS n,
+  AVG(s.sentiment_score) AS avg_sent,
+  SUM(CASE WHEN s.sentiment = -1 THEN 1 ELSE 0 END) AS neg_count
+FROM ports p
+JOIN port_mentions pm ON pm.port_key = p.port_key
+JOIN objects o ON o.object_key = pm.object_key AND o.object_type = 2
+JOIN themes t ON t.object_key = pm.object_key
+JOIN nlp_scores s ON s.object_key = pm.object_key
+JOIN theme_labels tl ON tl.theme_key = t.theme_key
+WHERE p.port_id = ?
+GROUP BY t.theme_key
+HAVING n >= ?
+ORDER BY avg_sent ASC
+LIMIT ?;
+"""
+
+LINE_THEMES = """
+SELECT
+  tl.theme_label,
+  COUNT(*) AS n,
+  AVG(s.sentiment_score) AS avg_sent,
+  SUM(CASE WHEN s.sentiment = -1 THEN 1 ELSE 0 END) AS neg_count
+FROM cruise_lines l
+JOIN extraction e ON e.line_key = l.line_key
+JOIN objects o ON o.object_key = e.object_key AND o.object_type = 2
+JOIN themes t ON t.object_key = e.object_key
+JOIN nlp_scores s ON s.object_key = e.object_key
+JOIN theme_labels tl ON tl.theme_key = t.theme_key
+WHERE l.line_id = ?
+GROUP BY t.theme_key
+HAVING n >= ?
+ORDER BY avg_sent ASC
+LIMIT ?;
+"""
+
+# feeds show one comment per near-duplicate cluster (near_dups): its best-ranked copy, as in queries.py
+PORT_WORST_FEED = """
+SELECT
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    sl.label AS sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_key, c.comment_key)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM ports p
+  JOIN port_mentions pm ON pm.port_key = p.port_key
+  JOIN comments c ON c.comment_key = pm.object_key
+  JOIN nlp_scores s ON s.object_key = pm.object_key
+  LEFT JOIN sentiment_labels sl ON sl.sentiment = s.sentiment
+  LEFT JOIN near_dups d ON d.comment_key = c.comment_key
+  WHERE p.port_id = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
+LIMIT ?;
+"""
+
+PORT_TREND = """
+SELECT
+  strftime('%Y-%m', datetime(c.created_utc, 'unixepoch')) AS month,
+  AVG(s.severity_score) AS avg_sev,
+  AVG(s.sentiment_score) AS avg_sent
+FROM ports p
+JOIN port_mentions pm ON pm.port_key = p.port_key
+JOIN comments c ON c.comment_key = pm.object_key
+JOIN nlp_scores s ON s.object_key = pm.object_key
+WHERE p.port_id = ?
+GROUP BY month
+ORDER BY month;
+"""
+
+LINE_WORST_FEED = """
+SELECT
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    sl.label AS sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_key, c.comment_key)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM cruise_lines l
+  JOIN extraction e ON e.line_key = l.line_key
+  JOIN comments c ON c.comment_key = e.object_key
+  JOIN nlp_scores s ON s.object_key = e.object_key
+  LEFT JOIN sentiment_labels sl ON sl.sentiment = s.sentiment
+  LEFT JOIN near_dups d ON d.comment_key = c.comment_key
+  WHERE l.line_id = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
+LIMIT ?;
+"""
+
+LINE_PORTS = """
+SELECT
+  p.port_id,
+  COUNT(*) AS mentions,
+  AVG(s.severity_score) AS avg_sev,
+  AVG(s.sentiment_score) AS avg_sent
+FROM cruise_lines l
+JOIN extraction e ON e.line_key = l.line_key
+JOIN objects o ON o.object_key = e.object_key AND o.object_type = 2
+JOIN nlp_scores s ON s.object_key = e.object_key
+JOIN port_mentions pm ON pm.object_key = e.object_key
+JOIN ports p ON p.port_key = pm.port_key
+WHERE l.line_id = ?
+GROUP BY pm.port_key
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+LINE_TREND = """
+SELECT
+  strftime('%Y-%m', datetime(c.created_utc, 'unixepoch')) AS month,
+  AVG(s.severity_score) AS avg_sev,
+  AVG(s.sentiment_score) AS avg_sent,
+  COUNT(*) AS mentions
+FROM cruise_lines l
+JOIN extraction e ON e.line_key = l.line_key
+JOIN comments c ON c.comment_key = e.object_key
+JOIN nlp_scores s ON s.object_key = e.object_key
+WHERE l.line_id = ?
+GROUP BY month
+ORDER BY month;
+"""
+
+SHIP_PORTS = """
+SELECT
+  p.port_id,
+  COUNT(*) AS mentions,
+  AVG(s.severity_score) AS avg_sev,
+  AVG(s.sentiment_score) AS avg_sent
+FROM ships sh
+JOIN ship_mentions sm ON sm.ship_key = sh.ship_key
+JOIN objects o ON o.object_key = sm.object_key AND o.object_type = 2
+JOIN nlp_scores s ON s.object_key = sm.object_key
+JOIN port_mentions pm ON pm.object_key = sm.object_key
+JOIN ports p ON p.port_key = pm.port_key
+WHERE sh.ship_id = ?
+GROUP BY pm.port_key
+ORDER BY mentions DESC
+LIMIT ?;
+"""
+
+SHIP_TREND = """
+SELECT
+  strftime('%Y-%m', datetime(c.created_utc, 'unixepoch')) AS month,
+  AVG(s.severity_score) AS avg_sev,
+  AVG(s.sentiment_score) AS avg_sent,
+  COUNT(*) AS mentions
+FROM ships sh
+JOIN ship_mentions sm ON sm.ship_key = sh.ship_key
+JOIN comments c ON c.comment_key = sm.object_key
+JOIN nlp_scores s ON s.object_key = sm.object_key
+WHERE sh.ship_id = ?
+GROUP BY month
+ORDER BY month;
+"""
+
+SHIP_WORST_COMMENTS = """
+SELECT
+  object_id,
+  object_type,
+  created_utc,
+  subreddit,
+  score,
+  sentiment_label,
+  sentiment_score,
+  severity_score,
+  preview,
+  permalink
+FROM (
+  SELECT
+    c.comment_id AS object_id,
+    'comment' AS object_type,
+    c.created_utc,
+    c.subreddit,
+    c.score,
+    sl.label AS sentiment_label,
+    s.sentiment_score,
+    s.severity_score,
+    SUBSTR(COALESCE(c.body,''), 1, ?) AS preview,
+    c.permalink,
+    ROW_NUMBER() OVER (
+      PARTITION BY COALESCE(d.cluster_key, c.comment_key)
+      ORDER BY s.severity_score DESC, s.sentiment_score ASC
+    ) AS dup_rank
+  FROM ships sh
+  JOIN ship_mentions sm ON sm.ship_key = sh.ship_key
+  JOIN comments c ON c.comment_key = sm.object_key
+  JOIN nlp_scores s ON s.object_key = sm.object_key
+  LEFT JOIN sentiment_labels sl ON sl.sentiment = s.sentiment
+  LEFT JOIN near_dups d ON d.comment_key = c.comment_key
+  WHERE sh.ship_id = ?
+    AND COALESCE(c.author,'') NOT IN ('AutoModerator')
+)
+WHERE dup_rank = 1
+ORDER BY severity_score DESC, sentiment_score ASC
+LIMIT ?;
+"""
+
+PORTED = (
+    "LIST_PORTS", "LIST_LINES",
+    "PORT_SENTIMENT_SUMMARY", "LINE_SENTIMENT_SUMMARY", "SHIP_SENTIMENT_SUMMARY",
+    "PORT_THEMES", "LINE_THEMES",
+    "PORT_TREND", "LINE_TREND", "SHIP_TREND",
+    "PORT_SHIPS", "LINE_PORTS", "SHIP_PORTS",
+    "PORT_WORST_FEED", "LINE_WORST_FEED", "SHIP_WORST_COMMENTS",
+)
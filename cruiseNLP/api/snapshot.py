@@ -0,0 +1,141 @@
+# cruiseNLP/api/snapshot.py
+"""
+Immutable read snapshots of cruise_reddit.db for the API.
+
+The backfills write to the live database in long transactions and grow its
+WAL; an API reading the same file pays for that in latency. With
+SQLITE_SNAPSHOTS=1 the pipeline's publish stage copies the live database with
+the online backup API (one step, so the copy is a consistent point in time)
+into <snapshot dir>/snapshot-<generation>.db, switches it out of WAL mode, and
+then points CURRENT at it:
+
+  snapshot-000041.db   older generations, kept for readers still on them
+  snapshot-000042.db
+  CURRENT              {"generation": 42, "file": "snapshot-000042.db", ...}
+
+Both the snapshot file and CURRENT are written under a temp name and renamed,
+so a reader never sees half a file. api/db.py opens the file CURRENT names
+with immutable=1 (no locks, no WAL / journal lookups) and mmap, and re-reads
+CURRENT when it changes, so new generations are picked up without a restart.
+
+Run from cruiseNLP/:
+  python -m api.snapshot                       # publish SQLITE_PATH
+  python -m api.snapshot --db cruise_reddit.db --keep 3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+POINTER = "CURRENT"
+_SNAPSHOT_FILE = re.compile(r"^snapshot-(\d+)\.db$")
+
+
+def default_snapshot_dir(sqlite_path: str) -> str:
+    return os.path.splitext(sqlite_path)[0] + "_snapshots"
+
+
+def read_pointer(snapshot_dir: str) -> Optional[Dict]:
+    """CURRENT's contents, with "path" resolved; None if nothing was published yet."""
+    try:
+        with open(os.path.join(snapshot_dir, POINTER), encoding="utf-8") as f:
+            pointer = json.load(f)
+    except FileNotFoundError:
+        return None
+    pointer["path"] = os.path.join(snapshot_dir, pointer["file"])
+    return pointer
+
+
+def _write_atomic(path: str, data: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _generations(snapshot_dir: str) -> List[int]:
+    out = []
+    for name in os.listdir(snapshot_dir):
+        m = _SNAPSHOT_FILE.match(name)
+        if m:
+            out.append(int(m.group(1)))
+    return sorted(out)
+
+
+def prune(snapshot_dir: str, keep: int) -> List[str]:
+    """Deletes all but the newest `keep` snapshots. Open readers keep their file until they close it (POSIX)."""
+    removed = []
+    for gen in _generations(snapshot_dir)[:-keep] if keep > 0 else []:
+        path = os.path.join(snapshot_dir, f"snapshot-{gen:06d}.db")
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:  # e.g. still open on Windows; next publish tries again
+            print(f"[SNAPSHOT] could not remove {path}: {e}")
+    return removed
+
+
+def publish_snapshot(sqlite_path: str, snapshot_dir: Optional[str] = None, keep: int = 3) -> Dict:
+    """Copies sqlite_path into the next snapshot generation and points CURRENT at it."""
+    snapshot_dir = snapshot_dir or default_snapshot_dir(sqlite_path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    current = read_pointer(snapshot_dir)
+    generation = max([current["generation"] if current else 0] + _generations(snapshot_dir)) + 1
+    name = f"snapshot-{generation:06d}.db"
+    final = os.path.join(snapshot_dir, name)
+    building = final + ".building"
+    if os.path.exists(building):
+        os.remove(building)
+
+    t0 = time.perf_counter()
+    taken_utc = int(time.time())
+    src = sqlite3.connect(f"file:{os.path.abspath(sqlite_path)}?mode=ro", uri=True)
+    dst = sqlite3.connect(building)
+    try:
+        # pages=-1: the whole copy in one step inside one read transaction, so it's a
+        # consistent point in time and writers on the live db aren't blocked (WAL)
+        src.backup(dst, pages=-1)
+        # immutable readers never look at a WAL file: everything must be in the main file
+        dst.execute("PRAGMA journal_mode=DELETE;")
+        dst.execute("PRAGMA optimize;")
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+    with open(building, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(building, final)
+    copy_seconds = time.perf_counter() - t0
+
+    info = {
+        "generation": generation,
+        "file": name,
+        "source": os.path.abspath(sqlite_path),
+        "bytes": os.path.getsize(final),
+        "created_utc": taken_utc,
+        "copy_seconds": round(copy_seconds, 3),
+    }
+    _write_atomic(os.path.join(snapshot_dir, POINTER), json.dumps(info, indent=2) + "\n")
+    prune(snapshot_dir, keep)
+    print(f"[SNAPSHOT] generation {generation}: {final} ({info['bytes'] / 1e6:.1f}MB in {copy_seconds:.1f}s)")
+    return info
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Publish an immutable read snapshot for the API")
+    ap.add_argument("--db", default=os.getenv("SQLITE_PATH", "cruise_reddit.db"))
+    ap.add_argument("--dir", default=os.getenv("SNAPSHOT_DIR") or None, help="default: <db>_snapshots")
+    ap.add_argument("--keep", type=int, default=int(os.getenv("SNAPSHOT_KEEP", "3")), help="generations to keep")
+    args = ap.parse_args()
+    publish_snapshot(args.db, args.dir, max(1, args.keep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# cruiseNLP/bench/analytics.py
+"""
+Synthetic analytics database for the query-engine benchmarks (api/bench_backends.py,
+api/bench_schema_v2.py, api/bench_columnar.py) and their shared timing / parity helpers.
+
+Unlike corpus.py there is no text: posts and comments come with nlp_scores,
+extraction and themes rows already filled in, with skewed (Zipf-like) port /
+line / ship / theme distributions, so a database of millions of comments is
+built without running the backfills. Written through scraping/db.py, so it
+always matches the live schema.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import time
+from typing import Any, Callable, List, Sequence, Tuple
+
+from scraping.db import connect, init_db
+from NLP.entity_extract import CRUISE_LINE_PATTERNS
+from NLP.ports_loader import load_ports_txt
+from NLP.theme_classifier import THEME_KEYWORDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUBREDDITS = ["Cruise", "Cruises", "royalcaribbean", "carnivalcruise", "ncl", "CelebrityCruises", "PrincessCruises"]
+SHIPS = [
+    "wonder-of-the-seas", "icon-of-the-seas", "oasis-of-the-seas", "symphony-of-the-seas",
+    "harmony-of-the-seas", "carnival-celebration", "carnival-jubilee", "mardi-gras",
+    "norwegian-prima", "norwegian-viva", "celebrity-beyond", "celebrity-edge",
+    "sun-princess", "discovery-princess", "msc-world-europa", "disney-wish",
+]
+COMMENTS_PER_POST = 40
+START_UTC = 1_640_995_200  # 2022-01-01
+SPAN_SECONDS = 4 * 365 * 86400
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1.0 / math.pow(i + 1, s) for i in range(n)]
+
+
+# ---------- data ----------
+def generate(db_path: str, n_comments: int, seed: int = 7, chunk: int = 50_000) -> None:
+    rnd = random.Random(seed)
+    ports = sorted(load_ports_txt(os.path.join(ROOT, "NLP", "ports.txt")).canonical)
+    lines = [name for name, _ in CRUISE_LINE_PATTERNS]
+    themes = list(THEME_KEYWORDS)
+    port_w, line_w, ship_w, theme_w = (_zipf_weights(len(x)) for x in (ports, lines, SHIPS, themes))
+
+    conn = connect(db_path)
+    init_db(conn)
+    conn.execute("PRAGMA journal_mode=OFF;")
+    conn.execute("PRAGMA synchronous=OFF;")
+
+    n_posts = max(1, n_comments // COMMENTS_PER_POST)
+    t0 = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO posts (post_id, subreddit, created_utc, title, retrieved_at_utc) VALUES (?, ?, ?, ?, ?)",
+        ((f"p{i}", rnd.choice(SUBREDDITS), START_UTC + rnd.randrange(SPAN_SECONDS), "", START_UTC) for i in range(n_posts)),
+    )
+
+    labels = ("neg", "neu", "pos")
+    for lo in range(0, n_comments, chunk):
+        comments, scores, extractions, theme_rows = [], [], [], []
+        for i in range(lo, min(lo + chunk, n_comments)):
+            cid = f"c{i}"
+            sub = rnd.choice(SUBREDDITS)
+            comments.append((cid, f"p{i // COMMENTS_PER_POST}", sub, START_UTC + rnd.randrange(SPAN_SECONDS),
+                             "", f"u{rnd.randrange(200_000)}", rnd.randrange(-5, 500), START_UTC))
+
+            if rnd.random() < 0.97:
+                s = rnd.uniform(-1, 1)
+                label = labels[0] if s < -0.05 else labels[2] if s > 0.05 else labels[1]
+                scores.append(("comment", cid, label, round(s, 4), round(rnd.random() * (1.2 - s) / 2.2, 4)))
+
+            line = rnd.choices(lines, line_w)[0] if rnd.random() < 0.55 else None
+            port_ids = sorted(set(rnd.choices(ports, port_w, k=rnd.choice((0, 0, 1, 1, 1, 2)))))
+            ship_ids = [rnd.choices(SHIPS, ship_w)[0]] if rnd.random() < 0.2 else []
+            extractions.append(("comment", cid, line, json.dumps(ship_ids), json.dumps(port_ids)))
+
+            for label in set(rnd.choices(themes, theme_w, k=rnd.choice((0, 1, 1, 2, 3)))):
+                theme_rows.append(("comment", cid, label, round(rnd.random(), 3)))
+
+        conn.executemany(
+            "INSERT INTO comments (comment_id, post_id, subreddit, created_utc, body, author, score, retrieved_at_utc) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", comments)
+        conn.executemany(
+            "INSERT INTO nlp_scores (object_type, object_id, sentiment_label, sentiment_score, severity_score) "
+            "VALUES (?, ?, ?, ?, ?)", scores)
+        conn.executemany(
+            "INSERT INTO extraction (object_type, object_id, cruise_line, ship_ids, port_ids) VALUES (?, ?, ?, ?, ?)",
+            extractions)
+        conn.executemany(
+            "INSERT INTO themes (object_type, object_id, theme_label, theme_score) VALUES (?, ?, ?, ?)", theme_rows)
+        conn.commit()
+        done = min(lo + chunk, n_comments)
+        if done % (chunk * 20) == 0 or done == n_comments:
+            print(f"[BENCH] generated {done}/{n_comments} comments ({time.perf_counter() - t0:.0f}s)")
+
+    conn.execute("ANALYZE;")
+    conn.commit()
+    conn.close()
+
+
+# ---------- timing / parity ----------
+def query_params(query_name: str, port: str, line: str, ship: str) -> Tuple[Any, ...]:
+    """Parameters for an aggregate query in api/queries.py, keyed by its PORT_ / LINE_ / SHIP_ prefix."""
+    key = port if query_name.startswith("PORT") else line if query_name.startswith("LINE") else ship
+    if query_name in ("LIST_PORTS", "LIST_LINES"):
+        return (200,)
+    if query_name.endswith("_THEMES"):
+        return (key, 1, 100)
+    if query_name.endswith(("_SUMMARY", "_TREND")):
+        return (key,)
+    return (key, 200)
+
+
+def time_runs(fn: Callable[[], Any], repeat: int) -> Tuple[List[float], Any]:
+    """(milliseconds per run, last result)."""
+    out, ms = None, []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        ms.append((time.perf_counter() - t0) * 1000)
+    return ms, out
+
+
+def p95(ms: Sequence[float]) -> float:
+    return sorted(ms)[max(0, math.ceil(len(ms) * 0.95) - 1)]
+
+
+def same_rows(a: Sequence[tuple], b: Sequence[tuple]) -> bool:
+    # AVG over the same rows in a different order differs in the last bits
+    return len(a) == len(b) and all(
+        len(x) == len(y) and all(
+            math.isclose(u, v, rel_tol=1e-9, abs_tol=1e-12) if isinstance(u, float) and isinstance(v, float) else u == v
+            for u, v in zip(x, y))
+        for x, y in zip(a, b))
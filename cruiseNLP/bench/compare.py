@@ -0,0 +1,80 @@
+# cruiseNLP/bench/compare.py
+"""
+Diff two bench/run.py result files, e.g. before/after a change:
+
+  python -m bench.compare bench/results/5b4f79a.json bench/results/HEAD.json --threshold 10
+
+Latencies/durations (*_us, *_ms, seconds) are better when lower, throughputs
+(*_per_s) when higher. Exits 1 if anything regressed by more than --threshold %.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Optional, Tuple
+
+LOWER_IS_BETTER = ("_us", "_ms", "seconds")
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def metrics(results: dict) -> Iterator[Tuple[str, float]]:
+    """(section:name:metric, value) for every comparable number; meta is skipped."""
+    for section, entries in results.items():
+        if section == "meta" or not isinstance(entries, dict):
+            continue
+        for name, values in entries.items():
+            for metric, v in values.items():
+                if isinstance(v, (int, float)) and metric.endswith(LOWER_IS_BETTER + HIGHER_IS_BETTER):
+                    yield f"{section}:{name}:{metric}", float(v)
+
+
+def change_pct(metric: str, old: float, new: float) -> Optional[float]:
+    """Signed % change, positive = worse."""
+    if old == 0:
+        return None
+    pct = (new - old) / old * 100
+    return -pct if metric.endswith(HIGHER_IS_BETTER) else pct
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compare two benchmark result files")
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=10.0, help="%% worse that counts as a regression")
+    ap.add_argument("--all", action="store_true", help="also list metrics within the threshold")
+    args = ap.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"old: {old['meta'].get('git_commit')} ({old['meta'].get('comments')} comments)  "
+          f"new: {new['meta'].get('git_commit')} ({new['meta'].get('comments')} comments)")
+    if old["meta"].get("comments") != new["meta"].get("comments"):
+        print("warning: different corpus sizes, backfill/api numbers are not comparable")
+
+    old_m: Dict[str, float] = dict(metrics(old))
+    regressions = 0
+    for key, nv in metrics(new):
+        if key not in old_m:
+            continue
+        ov = old_m[key]
+        pct = change_pct(key, ov, nv)
+        flag = ""
+        if pct is not None and pct > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif pct is not None and pct < -args.threshold:
+            flag = "  improved"
+        if flag or args.all:
+            shown = "n/a" if pct is None else f"{pct:+.1f}%"
+            print(f"{key:<56} {ov:>12.3f} -> {nv:>12.3f}  {shown}{flag}")
+
+    print(f"{regressions} regression(s) over {args.threshold:.0f}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
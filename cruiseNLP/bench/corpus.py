@@ -0,0 +1,250 @@
+# cruiseNLP/bench/corpus.py
+"""
+Synthetic cruise_reddit.db for benchmarks: posts and comments only (the NLP
+tables are filled by the backfills the suite times), written through
+scraping/db.py so it always matches the live schema.
+
+Text is stitched from the same vocab the NLP stages look for, with skewed
+(Zipf-like) popularity so a few ports / lines dominate like the real data:
+  - ports and ships with their aliases from NLP/ports.txt / NLP/ships.txt
+  - cruise lines (names and short forms) from CRUISE_LINE_PATTERNS
+  - theme keywords, and positive / negative opinion phrases
+Around 1% of comments are AutoModerator and a few are [deleted]/empty.
+
+Run from cruiseNLP/:
+  python -m bench.corpus --comments 100000 --out /tmp/bench.db
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import re
+import time
+from itertools import accumulate
+from typing import List, Sequence, Tuple
+
+from scraping.db import connect, init_db, upsert_posts, upsert_comments
+from scraping.settings import load_settings
+from NLP.entity_extract import CRUISE_LINE_PATTERNS
+from NLP.theme_classifier import THEME_KEYWORDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORTS_FILE = os.path.join(ROOT, "NLP", "ports.txt")
+SHIPS_FILE = os.path.join(ROOT, "NLP", "ships.txt")
+
+START_UTC = 1_640_995_200            # 2022-01-01
+SPAN_SECONDS = 3 * 365 * 86400
+MEAN_COMMENTS_PER_POST = 25
+
+POSITIVE = (
+    "honestly the best day of the whole trip", "the crew was amazing", "would absolutely go back",
+    "loved every minute of it", "such a great experience", "the views were stunning",
+    "super smooth and easy", "worth every penny", "the kids had a blast", "really impressed",
+)
+NEGATIVE = (
+    "worst experience we've had on a cruise", "never again", "it was a total mess",
+    "really disappointed", "absolutely awful", "we got charged twice and still no refund",
+    "half the group got sick", "the room was dirty when we boarded", "terrible communication",
+    "the whole thing was delayed for hours",
+)
+NEUTRAL = (
+    "any tips", "not sure what to expect", "curious what others did", "planning for next spring",
+    "first time going", "thinking about booking", "does anyone know", "just got back",
+)
+OPENERS = (
+    "We stopped in {port} on {ship} and {opinion}.",
+    "{line} in {port}: {opinion}.",
+    "Just did {port} with {line}, {opinion}.",
+    "On {ship} last {month}, {theme} was the story of the trip, {opinion}.",
+    "{port} again this year. {theme} {opinion}.",
+    "Booked {line} out of {port}, {neutral}?",
+    "{neutral} for {port}? Going on {ship} in {month}.",
+    "Re {theme}: {opinion}.",
+    "{opinion}. {line} really needs to sort out {theme}.",
+    "{neutral}. First {line} cruise, stops in {port} and {port2}.",
+)
+FILLERS = (
+    "We were a family of four.", "Booked about a year out.", "It was our third cruise.",
+    "Weather was fine.", "We did a balcony cabin.", "Got there early.",
+    "Edit: thanks for all the replies!", "Long story short,", "lol", "TL;DR at the bottom.",
+)
+MONTHS = ("January", "March", "May", "July", "August", "October", "December")
+
+
+def _zipf(n: int, s: float = 1.05) -> List[float]:
+    return [1.0 / math.pow(i + 1, s) for i in range(n)]
+
+
+def _gazetteer_names(path: str) -> List[List[str]]:
+    """One list per ports.txt / ships.txt entry: canonical name first, then its aliases (as written, not normalized)."""
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            canon, _, rest = line.partition("|")
+            aliases = rest.partition("|")[0]
+            names = [canon.strip()] + [a.strip() for a in aliases.split(",") if a.strip()]
+            out.append(names)
+    return out
+
+
+def _line_names() -> List[List[str]]:
+    """Canonical line name, then the plain-text forms of its regex patterns ('rccl', 'ncl', ...)."""
+    out = []
+    for name, pats in CRUISE_LINE_PATTERNS:
+        forms = [re.sub(r"\(\?<?!\\w\)", "", p) for p in pats]
+        out.append([name] + [f.upper() if len(f) <= 4 else f for f in forms])
+    return out
+
+
+class TextMaker:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.ports = _gazetteer_names(PORTS_FILE)
+        self.lines = _line_names()
+        self.ships = _gazetteer_names(SHIPS_FILE)
+        self.themes = [kws for kws in THEME_KEYWORDS.values()]
+        self.port_cum = list(accumulate(_zipf(len(self.ports))))
+        self.line_cum = list(accumulate(_zipf(len(self.lines))))
+        self.ship_cum = list(accumulate(_zipf(len(self.ships))))
+        self.theme_cum = list(accumulate(_zipf(len(self.themes), 0.8)))
+
+    def _pick(self, choices: Sequence[List[str]], cum_weights: Sequence[float]) -> str:
+        names = self.rng.choices(choices, cum_weights=cum_weights)[0]
+        # mostly the canonical spelling, sometimes an alias
+        return names[0] if len(names) == 1 or self.rng.random() < 0.7 else self.rng.choice(names[1:])
+
+    def sentence(self, tone: float) -> str:
+        rng = self.rng
+        opinion_bank = NEGATIVE if tone < -0.2 else POSITIVE if tone > 0.2 else NEUTRAL
+        return rng.choice(OPENERS).format(
+            port=self._pick(self.ports, self.port_cum),
+            port2=self._pick(self.ports, self.port_cum),
+            line=self._pick(self.lines, self.line_cum),
+            ship=self._pick(self.ships, self.ship_cum),
+            theme=rng.choice(rng.choices(self.themes, cum_weights=self.theme_cum)[0]),
+            opinion=rng.choice(opinion_bank),
+            neutral=rng.choice(NEUTRAL),
+            month=rng.choice(MONTHS),
+        )
+
+    def body(self) -> str:
+        rng = self.rng
+        tone = rng.gauss(0.0, 0.6)
+        parts = [self.sentence(tone) for _ in range(rng.choice((1, 1, 1, 2, 2, 3, 4)))]
+        if rng.random() < 0.3:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(FILLERS))
+        return " ".join(parts)
+
+    def title(self) -> str:
+        t = self.sentence(self.rng.gauss(0.0, 0.6))
+        return t[:120].rstrip(" ,.")
+
+
+def _thread_sizes(rng: random.Random, n_posts: int, n_comments: int) -> List[int]:
+    """Comments per post: heavy-tailed (a few huge threads), summing to exactly n_comments."""
+    w = [rng.paretovariate(1.5) for _ in range(n_posts)]
+    total = sum(w)
+    sizes = [int(x / total * n_comments) for x in w]
+    for i in rng.sample(range(n_posts), n_comments - sum(sizes)):
+        sizes[i] += 1
+    return sizes
+
+
+def generate(db_path: str, n_comments: int, seed: int = 7, chunk: int = 20_000) -> Tuple[int, int]:
+    """Writes n_comments comments spread over about n_comments / 25 posts. Returns (posts, comments)."""
+    rng = random.Random(seed)
+    text = TextMaker(rng)
+    subreddits: List[Tuple[str, str]] = list(load_settings().subreddits.items())
+    sub_cum = list(accumulate(_zipf(len(subreddits), 0.7)))
+
+    conn = connect(db_path)
+    init_db(conn)
+    # throwaway database: skip durability
+    conn.execute("PRAGMA synchronous=OFF;")
+
+    n_posts = max(1, round(n_comments / MEAN_COMMENTS_PER_POST))
+    sizes = _thread_sizes(rng, n_posts, n_comments)
+    t0 = time.perf_counter()
+    posts: List[dict] = []
+    comments: List[dict] = []
+    j = 0
+    for i, size in enumerate(sizes):
+        sub, line = rng.choices(subreddits, cum_weights=sub_cum)[0]
+        post_id = f"bp{i:07d}"
+        created = START_UTC + rng.randrange(SPAN_SECONDS)
+        is_self = rng.random() < 0.85
+        posts.append({
+            "post_id": post_id,
+            "subreddit": sub,
+            "cruise_line_from_subreddit": line,
+            "created_utc": created,
+            "title": text.title(),
+            "selftext": text.body() if is_self else "",
+            "author": f"user{rng.randrange(n_posts * 4 + 10)}",
+            "score": int(rng.paretovariate(1.2)) - 1,
+            "num_comments": size,
+            "url": f"https://www.reddit.com/r/{sub}/comments/{post_id}/",
+            "permalink": f"/r/{sub}/comments/{post_id}/",
+            "over_18": 0,
+            "is_self": int(is_self),
+            "link_flair_text": rng.choice((None, None, "Question", "Trip Report", "Review")),
+            "retrieved_at_utc": created + 86400,
+            "comments_last_ingested_utc": created + 86400,
+            "comments_last_count": size,
+            "content_hash": None,  # only ingestion's change detection reads it
+        })
+
+        for _ in range(size):
+            roll = rng.random()
+            if roll < 0.01:
+                author, body = "AutoModerator", "Your post has been removed. Please read the rules before posting."
+            elif roll < 0.03:
+                author, body = "[deleted]", rng.choice(("[deleted]", "[removed]", ""))
+            else:
+                author, body = f"user{rng.randrange(n_comments // 3 + 10)}", text.body()
+            comment_id = f"bc{j:08d}"
+            comments.append({
+                "comment_id": comment_id,
+                "post_id": post_id,
+                "subreddit": sub,
+                "created_utc": created + int(rng.expovariate(1 / 7200)),
+                "body": body,
+                "author": author,
+                "score": int(rng.paretovariate(1.3)) - 1,
+                "permalink": f"/r/{sub}/comments/{post_id}/_/{comment_id}/",
+                "retrieved_at_utc": created + 86400,
+            })
+            j += 1
+
+        if len(comments) >= chunk or i == n_posts - 1:
+            upsert_posts(conn, posts)
+            upsert_comments(conn, comments)
+            conn.commit()
+            if j // 500_000 > (j - len(comments)) // 500_000:
+                print(f"[CORPUS] {j}/{n_comments} comments ({time.perf_counter() - t0:.0f}s)")
+            posts, comments = [], []
+
+    conn.close()
+    print(f"[CORPUS] {db_path}: {n_posts} posts, {n_comments} comments in {time.perf_counter() - t0:.1f}s")
+    return n_posts, n_comments
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Generate a synthetic cruise_reddit.db")
+    ap.add_argument("--comments", type=int, default=100_000, help="1k .. 10M")
+    ap.add_argument("--out", default="bench_cruise_reddit.db")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    if os.path.exists(args.out):
+        ap.error(f"{args.out} already exists")
+    generate(args.out, args.comments, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
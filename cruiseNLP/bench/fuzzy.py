@@ -0,0 +1,174 @@
+# cruiseNLP/bench/fuzzy.py
+"""
+Exact vs fuzzy entity matching (ENTITY_FUZZY, NLP/fuzzy_match.py): recall
+gained and throughput lost.
+
+Documents are generated with known ports / ships: names (canonical or an
+alias) from ports.txt / ships.txt, each misspelled with probability --typo-rate
+by one random edit (drop, double, swap or replace a letter, never the first).
+Every document is run through extract_entities with fuzzy off and on, and the
+report shows
+  - recall of the planted ports / ships, on the misspelled ones and overall
+  - false positives (ids found that weren't planted)
+  - docs/s of both, and the throughput lost
+
+--db also times both matchers on the comments of a real or bench/corpus.py
+database and counts the extra ids fuzzy finds there.
+
+Run from cruiseNLP/:
+  python -m bench.fuzzy --docs 20000
+  python -m bench.fuzzy --db /tmp/bench.db --json /tmp/fuzzy.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import string
+import time
+from typing import Dict, List, Optional, Tuple
+
+from NLP.entity_extract import extract_entities, fuzzy_config
+from NLP.ports_loader import load_ports_txt, load_ships_txt
+
+from .corpus import NEGATIVE, NEUTRAL, POSITIVE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEMPLATES = [
+    "We stopped in {port} on {ship} and {opinion}.",
+    "{neutral} Anyone been to {port} lately? Booked {ship} for the spring.",
+    "Took {ship} to {port} and {port2}, {opinion}.",
+    "{port} was the highlight, {opinion}.",
+    "Back from {ship}: {opinion}",
+]
+
+
+def misspell(rng: random.Random, name: str) -> str:
+    i = rng.randrange(1, len(name))
+    op = rng.choice(("drop", "double", "swap", "replace"))
+    if op == "drop":
+        return name[:i] + name[i + 1:]
+    if op == "double":
+        return name[:i] + name[i] + name[i:]
+    if op == "swap" and i < len(name) - 1:
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+
+
+def generate(n_docs: int, typo_rate: float, seed: int) -> List[Tuple[str, Dict[str, bool]]]:
+    """(text, {planted id: misspelled?}) per document."""
+    rng = random.Random(seed)
+    names: Dict[str, List[Tuple[str, str]]] = {}
+    for kind, gaz in (("port", load_ports_txt(os.path.join(ROOT, "NLP", "ports.txt"))),
+                      ("ship", load_ships_txt(os.path.join(ROOT, "NLP", "ships.txt")))):
+        # (name as written, id); aliases shorter than 5 letters are never fuzzy-matched
+        names[kind] = [(canon, eid) for eid, canon in gaz.canonical.items()]
+        names[kind] += [(alias, eid) for alias, eid in gaz.alias_to_id.items() if len(alias) >= 5]
+
+    docs = []
+    for _ in range(n_docs):
+        planted: Dict[str, bool] = {}
+
+        def pick(kind: str) -> str:
+            name, eid = rng.choice(names[kind])
+            typo = rng.random() < typo_rate and len(name) >= 5
+            planted[eid] = planted.get(eid, False) or typo
+            return misspell(rng, name) if typo else name
+
+        template = rng.choice(TEMPLATES)
+        opinion_bank = rng.choice((NEGATIVE, NEUTRAL, POSITIVE))
+        text = template.format(
+            port=pick("port") if "{port}" in template else "",
+            port2=pick("port") if "{port2}" in template else "",
+            ship=pick("ship") if "{ship}" in template else "",
+            opinion=rng.choice(opinion_bank),
+            neutral=rng.choice(NEUTRAL),
+        )
+        docs.append((text, planted))
+    return docs
+
+
+def _run(texts: List[str], fuzzy: bool) -> Tuple[List[set], float]:
+    t0 = time.perf_counter()
+    found = []
+    for t in texts:
+        r = extract_entities(t, fuzzy=fuzzy)
+        found.append(set(r.port_ids) | set(r.ship_ids))
+    return found, len(texts) / (time.perf_counter() - t0)
+
+
+def bench_synthetic(docs: List[Tuple[str, Dict[str, bool]]]) -> Dict[str, Dict]:
+    texts = [t for t, _ in docs]
+    out = {}
+    for mode, fuzzy in (("exact", False), ("fuzzy", True)):
+        extract_entities(texts[0], fuzzy=fuzzy)  # load gazetteers / build the index outside the timing
+        found, docs_per_s = _run(texts, fuzzy)
+        hit = typo_hit = typo_total = total = false_pos = 0
+        for (_, planted), ids in zip(docs, found):
+            for eid, typo in planted.items():
+                total += 1
+                hit += eid in ids
+                typo_total += typo
+                typo_hit += typo and eid in ids
+            false_pos += len(ids - set(planted))
+        out[mode] = {
+            "docs_per_s": round(docs_per_s, 1),
+            "recall": round(hit / max(1, total), 4),
+            "recall_misspelled": round(typo_hit / max(1, typo_total), 4),
+            "false_positives": false_pos,
+        }
+        print(f"  {mode:<6} recall {out[mode]['recall']:.1%}  misspelled {out[mode]['recall_misspelled']:.1%}  "
+              f"false positives {false_pos:<5} {docs_per_s:>9.0f} docs/s")
+    return out
+
+
+def bench_db(db_path: str, limit: int) -> Dict[str, Dict]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    texts = [r[0] for r in conn.execute("SELECT COALESCE(body,'') FROM comments LIMIT ?", (limit,))]
+    conn.close()
+    exact, exact_rate = _run(texts, False)
+    fuzzy, fuzzy_rate = _run(texts, True)
+    extra = sum(len(b - a) for a, b in zip(exact, fuzzy))
+    docs_gained = sum(1 for a, b in zip(exact, fuzzy) if b - a)
+    out = {
+        "docs": len(texts),
+        "exact_docs_per_s": round(exact_rate, 1),
+        "fuzzy_docs_per_s": round(fuzzy_rate, 1),
+        "extra_ids": extra,
+        "docs_gained": docs_gained,
+    }
+    print(f"  {len(texts)} comments: exact {exact_rate:.0f} docs/s, fuzzy {fuzzy_rate:.0f} docs/s "
+          f"({1 - fuzzy_rate / exact_rate:.0%} slower); fuzzy adds {extra} ids in {docs_gained} comments")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Recall and throughput of exact vs fuzzy entity matching")
+    ap.add_argument("--docs", type=int, default=20000)
+    ap.add_argument("--typo-rate", type=float, default=0.3, help="share of planted names that get a typo")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--db", default=None, help="also time both on this database's comments")
+    ap.add_argument("--db-limit", type=int, default=50000)
+    ap.add_argument("--json", dest="json_out", default=None, help="also write results here")
+    args = ap.parse_args()
+
+    _, min_sim = fuzzy_config()
+    print(f"[FUZZY] {args.docs} synthetic docs, typo rate {args.typo_rate:.0%}, min similarity {min_sim}")
+    results: Dict[str, Optional[Dict]] = {"synthetic": bench_synthetic(generate(args.docs, args.typo_rate, args.seed))}
+    exact, fuzzy = results["synthetic"]["exact"], results["synthetic"]["fuzzy"]
+    print(f"[FUZZY] recall +{(fuzzy['recall'] - exact['recall']) * 100:.1f} points, "
+          f"throughput -{1 - fuzzy['docs_per_s'] / exact['docs_per_s']:.0%}")
+    results["db"] = bench_db(args.db, args.db_limit) if args.db else None
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"docs": args.docs, "typo_rate": args.typo_rate, "min_similarity": min_sim,
+                       **results}, f, indent=2)
+        print(f"[FUZZY] wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# cruiseNLP/bench/import_budget.py
+"""
+Import-time budget for the entry points that are started cold over and over
+(autoscaled API workers, cron-launched backfills, the pipeline driver).
+
+Each entry is imported in a fresh interpreter with `python -X importtime`;
+the check fails if
+  - its cumulative import time (best of --runs) is over budget, or
+  - it imports something that must stay lazy (VADER, dotenv, duckdb, ...),
+    i.e. is only needed once real work starts, not at import
+
+Run from cruiseNLP/:
+  python -m bench.import_budget
+  python -m bench.import_budget --runs 5 --json /tmp/imports.json
+  python -m bench.import_budget --top 15      # also list the slowest imports per entry
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# never at import time: loaded on first use (see NLP/nlp_sentiment.py get_analyzer,
+# scraping/settings.py load_settings, api/db.py DuckDBBackend)
+LAZY = ("vaderSentiment", "dotenv", "duckdb", "pyarrow", "numpy", "pandas")
+
+# module -> (directory it's imported from, budget in ms, modules it must not pull in).
+# Budgets are ~2x what a laptop measures, so only real regressions trip them; the API's
+# is mostly fastapi + pydantic, which every worker needs anyway.
+BUDGETS: Dict[str, Tuple[str, float, Tuple[str, ...]]] = {
+    "api.app": (".", 1200.0, LAZY + ("scraping", "NLP")),
+    "pipeline": (".", 200.0, LAZY + ("fastapi",)),
+    "NLP.backfill_nlp": (".", 150.0, LAZY),
+    "NLP.backfill_themes": (".", 150.0, LAZY),
+    "NLP.stream_scorer": (".", 150.0, LAZY),
+    "maintenance": ("scraping", 100.0, LAZY),
+    "export_csv": ("scraping", 150.0, ("vaderSentiment", "dotenv", "duckdb")),
+}
+
+
+def import_profile(module: str, cwd: str) -> Tuple[float, Dict[str, float]]:
+    """(cumulative ms of `module`, {imported module: own ms}) from one cold interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.join(ROOT, cwd), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    total_ms = 0.0
+    own: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:   self |  cumulative | <2 spaces per nesting level>name"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        nested = name.startswith("   ")
+        name = name.strip()
+        own[name] = int(self_us) / 1000
+        if name == module and not nested:
+            total_ms = int(cumulative_us) / 1000
+    return total_ms, own
+
+
+def check(module: str, cwd: str, budget_ms: float, lazy: Tuple[str, ...], runs: int, top: int) -> Dict:
+    best: Optional[float] = None
+    own: Dict[str, float] = {}
+    for _ in range(runs):
+        total, own = import_profile(module, cwd)
+        best = total if best is None else min(best, total)
+    leaked = sorted({name for name in own for pkg in lazy if name == pkg or name.startswith(pkg + ".")})
+    leaked_roots = sorted({name.split(".")[0] for name in leaked})
+    r = {
+        "module": module,
+        "import_ms": round(best or 0.0, 1),
+        "budget_ms": budget_ms,
+        "modules": len(own),
+        "leaked": leaked_roots,
+        "ok": (best or 0.0) <= budget_ms and not leaked_roots,
+    }
+    status = "ok" if r["ok"] else "OVER BUDGET" if not leaked_roots else "EAGER IMPORT"
+    extra = f"  imports {', '.join(leaked_roots)}" if leaked_roots else ""
+    print(f"  {module:<22} {r['import_ms']:>7.1f}ms / {budget_ms:>6.0f}ms  {r['modules']:>4} modules  {status}{extra}")
+    if top:
+        for name, ms in sorted(own.items(), key=lambda kv: -kv[1])[:top]:
+            print(f"      {ms:>7.1f}ms  {name}")
+    return r
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Check cold-start import time of the entry points")
+    ap.add_argument("modules", nargs="*", help=f"default: all of {', '.join(BUDGETS)}")
+    ap.add_argument("--runs", type=int, default=3, help="cold imports per entry; the fastest counts")
+    ap.add_argument("--top", type=int, default=0, help="list the N slowest imports (own time) per entry")
+    ap.add_argument("--json", dest="json_out", default=None, help="also write results here")
+    args = ap.parse_args()
+
+    unknown = [m for m in args.modules if m not in BUDGETS]
+    if unknown:
+        ap.error(f"no budget for {', '.join(unknown)}")
+
+    print(f"[IMPORTS] python {sys.version.split()[0]}, best of {args.runs}")
+    results: List[Dict] = []
+    for module in args.modules or BUDGETS:
+        cwd, budget_ms, lazy = BUDGETS[module]
+        results.append(check(module, cwd, budget_ms, lazy, max(1, args.runs), args.top))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"runs": args.runs, "results": results}, f, indent=2)
+        print(f"[IMPORTS] wrote {args.json_out}")
+
+    failed = [r["module"] for r in results if not r["ok"]]
+    if failed:
+        print(f"[IMPORTS] failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# cruiseNLP/bench/run.py
+"""
+End-to-end performance suite on a synthetic corpus (bench/corpus.py):
+
+  nlp       per-document latency of each NLP stage (sentiment, entities, themes)
+  backfill  each backfill end to end over the whole corpus (rows/s)
+  api       every GET endpoint through the ASGI app, p50/p95/p99
+
+Results go to one JSON file per run (default bench/results/<git sha>.json);
+diff two of them with `python -m bench.compare old.json new.json`.
+
+Run from cruiseNLP/:
+  python -m bench.run --comments 20000
+  python -m bench.run --db /tmp/bench.db --reuse --stages api --api-runs 100
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("nlp", "backfill", "api")
+
+# used when the corpus has no extraction rows yet (e.g. --stages api on a fresh db)
+DEFAULT_IDS = {"port_id": "cozumel", "line_id": "carnival", "ship_id": "wonder-of-the-seas"}
+
+
+def percentiles(values: Sequence[float], unit: str) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 plus mean, keys suffixed with the unit (e.g. p95_ms)."""
+    xs = sorted(values)
+    if not xs:
+        return {}
+
+    def rank(p: float) -> float:
+        return xs[max(0, math.ceil(len(xs) * p) - 1)]
+
+    return {
+        f"p50_{unit}": round(rank(0.50), 3),
+        f"p95_{unit}": round(rank(0.95), 3),
+        f"p99_{unit}": round(rank(0.99), 3),
+        f"mean_{unit}": round(sum(xs) / len(xs), 3),
+    }
+
+
+def git_meta() -> Dict[str, object]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {"git_commit": git("rev-parse", "--short", "HEAD"), "git_dirty": bool(git("status", "--porcelain"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"git_commit": "unknown", "git_dirty": None}
+
+
+# ---------- nlp: per document ----------
+def bench_nlp(conn, docs: int) -> Dict[str, Dict]:
+    from NLP.backfill_nlp import PORT_KEYWORDS
+    from NLP.nlp_sentiment import score_text
+    from NLP.entity_extract import extract_entities
+    from NLP.theme_classifier import score_theme_hits
+
+    (n,) = conn.execute("SELECT COUNT(*) FROM comments").fetchone()
+    step = max(1, n // max(1, docs))
+    texts = [r[0] for r in conn.execute(
+        "SELECT COALESCE(body,'') FROM comments WHERE rowid % ? = 0 LIMIT ?", (step, docs)
+    )]
+
+    fns: Dict[str, Callable[[str], object]] = {
+        "sentiment": score_text,
+        "entities": lambda t: extract_entities(t, ports=PORT_KEYWORDS),
+        "themes": score_theme_hits,
+    }
+    out = {}
+    for name, fn in fns.items():
+        for t in texts[:20]:  # warm caches / lazy imports
+            fn(t)
+        us: List[float] = []
+        t_all = time.perf_counter()
+        for t in texts:
+            t0 = time.perf_counter_ns()
+            fn(t)
+            us.append((time.perf_counter_ns() - t0) / 1000)
+        total = time.perf_counter() - t_all
+        out[name] = {"docs": len(texts), "docs_per_s": round(len(texts) / total, 1), **percentiles(us, "us")}
+        print(f"[BENCH nlp] {name:<9} p50={out[name]['p50_us']:.0f}us p99={out[name]['p99_us']:.0f}us "
+              f"{out[name]['docs_per_s']:.0f} docs/s")
+    return out
+
+
+# ---------- backfill: end to end ----------
+def bench_backfill(conn) -> Dict[str, Dict]:
+    from NLP.backfill_nlp import score_sentiment, extract_mentions
+    from NLP.backfill_themes import label_themes
+
+    runs: Dict[str, Callable[[str], int]] = {
+        "sentiment": lambda ot: score_sentiment(conn, ot),
+        "entities": lambda ot: extract_mentions(conn, ot),
+        "themes": lambda ot: label_themes(conn, ot)[0],
+    }
+    out = {}
+    for name, fn in runs.items():
+        for object_type in ("post", "comment"):
+            t0 = time.perf_counter()
+            rows = fn(object_type)
+            seconds = time.perf_counter() - t0
+            key = f"{name}.{object_type}"
+            out[key] = {"rows": rows, "seconds": round(seconds, 3), "rows_per_s": round(rows / max(seconds, 1e-9), 1)}
+            print(f"[BENCH backfill] {key:<18} {rows} rows in {seconds:.1f}s")
+    return out
+
+
+# ---------- api: every GET endpoint ----------
+def _busiest_ids(conn) -> Dict[str, str]:
+    ids = dict(DEFAULT_IDS)
+    for key, sql in (
+        ("port_id", "SELECT je.value FROM extraction e JOIN json_each(e.port_ids) je GROUP BY je.value ORDER BY COUNT(*) DESC LIMIT 1"),
+        ("ship_id", "SELECT je.value FROM extraction e JOIN json_each(e.ship_ids) je GROUP BY je.value ORDER BY COUNT(*) DESC LIMIT 1"),
+        ("line_id", "SELECT LOWER(REPLACE(TRIM(cruise_line), ' ', '-')) FROM extraction WHERE cruise_line IS NOT NULL "
+                    "GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1"),
+    ):
+        row = conn.execute(sql).fetchone()
+        if row and row[0]:
+            ids[key] = row[0]
+    return ids
+
+
+# query strings for endpoints whose required / interesting params aren't in the path
+EXTRA_QUERY = {
+    "/search": "q=co",
+    "/export": "format=ndjson&port={port_id}",
+}
+
+
+def bench_api(conn, db_path: str, runs: int) -> Dict[str, Dict]:
+    # api.db reads SQLITE_PATH at import time
+    os.environ["SQLITE_PATH"] = db_path
+    from fastapi.routing import APIRoute
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    ids = _busiest_ids(conn)
+    print(f"[BENCH api] ids: {ids}")
+    # a broken endpoint is recorded with its status instead of aborting the suite
+    client = TestClient(app, raise_server_exceptions=False)
+
+    out = {}
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        url = route.path.format(**ids)
+        if route.path in EXTRA_QUERY:
+            url += "?" + EXTRA_QUERY[route.path].format(**ids)
+
+        status = client.get(url).status_code  # warm-up
+        if status != 200:
+            out[route.path] = {"url": url, "status": status}
+            print(f"[BENCH api] {route.path:<32} {status} (not timed)")
+            continue
+        ms: List[float] = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            resp = client.get(url)
+            _ = resp.content
+            ms.append((time.perf_counter() - t0) * 1000)
+        out[route.path] = {"url": url, "status": status, "runs": runs, **percentiles(ms, "ms")}
+        print(f"[BENCH api] {route.path:<32} {status} p50={out[route.path]['p50_ms']:.1f}ms "
+              f"p99={out[route.path]['p99_ms']:.1f}ms")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="NLP / backfill / API performance suite")
+    ap.add_argument("--comments", type=int, default=20_000, help="corpus size when generating (1k .. 10M)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--db", default=None, help="corpus location (default: a temp dir)")
+    ap.add_argument("--reuse", action="store_true", help="use an existing --db instead of regenerating it")
+    ap.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    ap.add_argument("--nlp-docs", type=int, default=2000, help="documents timed per NLP stage")
+    ap.add_argument("--api-runs", type=int, default=30, help="timed requests per endpoint")
+    ap.add_argument("--out", default=None, help="results JSON (default bench/results/<git sha>.json)")
+    args = ap.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    # NLP code resolves NLP/ports.txt relative to the working directory
+    os.chdir(ROOT)
+    from scraping.db import connect, init_db
+    from bench.corpus import generate
+
+    db_path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="bench_"), "cruise_reddit.db"))
+    if not (args.reuse and os.path.exists(db_path)):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        generate(db_path, args.comments, seed=args.seed)
+
+    conn = connect(db_path)
+    init_db(conn)
+    (posts,) = conn.execute("SELECT COUNT(*) FROM posts").fetchone()
+    (comments,) = conn.execute("SELECT COUNT(*) FROM comments").fetchone()
+
+    meta = git_meta()
+    results: Dict[str, object] = {
+        "meta": {
+            **meta,
+            "created_utc": datetime.now(tz=timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "db": db_path,
+            "posts": posts,
+            "comments": comments,
+            "seed": args.seed,
+            "analytics_backend": os.getenv("ANALYTICS_BACKEND", "sqlite"),
+        },
+    }
+    print(f"[BENCH] {db_path}: {posts} posts, {comments} comments; stages={','.join(stages)}")
+
+    if "nlp" in stages:
+        results["nlp"] = bench_nlp(conn, args.nlp_docs)
+    if "backfill" in stages:
+        results["backfill"] = bench_backfill(conn)
+    if "api" in stages:
+        results["api"] = bench_api(conn, db_path, args.api_runs)
+    conn.close()
+
+    out = args.out or os.path.join(ROOT, "bench", "results", f"{meta['git_commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"[BENCH] wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
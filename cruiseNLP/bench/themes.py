@@ -0,0 +1,92 @@
+# cruiseNLP/bench/themes.py
+"""
+Rules vs linear theme engine (THEME_ENGINE, NLP/theme_linear.py) on a fixture
+corpus: batch throughput and how closely the linear model follows the rules.
+
+Comment bodies come from bench/corpus.py's TextMaker. The linear model is
+trained on --train of them (rule labels, uncapped) and both engines then label
+--docs unseen ones in batches of --batch-size, as the themes stage does. The
+report shows docs/s of each engine, the speedup, and micro precision / recall /
+F1 of the linear themes against the rule themes.
+
+--model also saves the trained weights (usable with THEME_ENGINE=linear).
+
+Run from cruiseNLP/:
+  python -m bench.themes --train 20000 --docs 20000
+  python -m bench.themes --json /tmp/themes.json --model /tmp/theme_model.npz
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+from NLP.theme_classifier import score_theme_hits
+from NLP.theme_linear import agreement, rule_labels, save_model, train
+
+from .corpus import TextMaker
+
+
+def texts(n: int, seed: int) -> List[str]:
+    maker = TextMaker(random.Random(seed))
+    return [maker.body() for _ in range(n)]
+
+
+def docs_per_s(fn, docs: List[str], batch_size: int) -> float:
+    fn(docs[:batch_size])  # warm caches / lazy loads outside the timing
+    t0 = time.perf_counter()
+    for i in range(0, len(docs), batch_size):
+        fn(docs[i:i + batch_size])
+    return len(docs) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Throughput and agreement of the rules vs linear theme engines")
+    ap.add_argument("--train", type=int, default=20000, help="fixture texts to train the linear model on")
+    ap.add_argument("--docs", type=int, default=20000, help="fixture texts to label with both engines")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--epochs", type=int, default=40)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--model", default=None, help="also save the trained model here")
+    ap.add_argument("--json", dest="json_out", default=None, help="also write results here")
+    args = ap.parse_args()
+
+    train_texts = texts(args.train, args.seed)
+    test_texts = texts(args.docs, args.seed + 1)
+
+    t0 = time.perf_counter()
+    model = train(train_texts, rule_labels(train_texts), epochs=args.epochs)
+    train_s = time.perf_counter() - t0
+    print(f"[THEMES] trained on {len(train_texts)} fixture texts in {train_s:.1f}s")
+    if args.model:
+        save_model(model, args.model)
+        print(f"[THEMES] wrote {args.model}")
+
+    rules_rate = docs_per_s(lambda b: [score_theme_hits(t, max_themes=3) for t in b], test_texts, args.batch_size)
+    linear_rate = docs_per_s(lambda b: model.hits_batch(b, max_themes=3), test_texts, args.batch_size)
+    agree = agreement(model, test_texts, rule_labels(test_texts))
+
+    results: Dict[str, object] = {
+        "train_texts": len(train_texts),
+        "docs": len(test_texts),
+        "batch_size": args.batch_size,
+        "train_seconds": round(train_s, 2),
+        "rules_docs_per_s": round(rules_rate, 1),
+        "linear_docs_per_s": round(linear_rate, 1),
+        "speedup": round(linear_rate / rules_rate, 2),
+        "agreement": agree,
+    }
+    print(f"  rules  {rules_rate:>9.0f} docs/s")
+    print(f"  linear {linear_rate:>9.0f} docs/s  ({linear_rate / rules_rate:.1f}x)")
+    print(f"  linear vs rules: precision {agree['precision']:.1%}  recall {agree['recall']:.1%}  f1 {agree['f1']:.1%}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[THEMES] wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
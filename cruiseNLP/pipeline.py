@@ -0,0 +1,362 @@
+"""
+Runs the whole batch pipeline as a small DAG, each stage consuming only what
+changed upstream since its last run:
+
+  ingest ── dedup ──┬── sentiment ─────────────┐
+                    ├── entities ── inherit ──┼── export
+                    └── themes ───────────────┼── mirror
+                                              └── publish
+
+  - ingest:    scraping/run_ingest.py --no-export (resumable, see checkpoints.py)
+  - dedup:     near-duplicate clusters for new / edited comments (NLP/near_dup.py);
+               the NLP stages copy a cluster representative's results
+  - sentiment: nlp_scores for rows retrieved since the stage's watermark
+  - entities:  extraction for the same delta
+  - inherit:   thread context for comments the delta touched: post / subreddit
+               line and post entities where their own text had none
+               (NLP/thread_context.py)
+  - themes:    themes for the same delta
+  - export:    scraping/export_csv.py (incremental via its own manifest)
+  - mirror:    rebuilds the DuckDB analytics mirror (api/duckdb_mirror.py);
+               only when ANALYTICS_BACKEND=duckdb
+  - publish:   copies the database into a new immutable read snapshot for the
+               API (api/snapshot.py); only when SQLITE_SNAPSHOTS=1
+
+Per-stage watermarks (max retrieved_at_utc processed) and timings live in
+pipeline_watermarks. Independent stages run in parallel processes. After each
+stage the WAL is checkpointed (PASSIVE); after the run, statistics are
+refreshed and free pages reclaimed (scraping/maintenance.py).
+
+Run from cruiseNLP/:
+  python pipeline.py                      # everything
+  python pipeline.py --dry-run            # rows each stage would touch
+  python pipeline.py --skip ingest,export # only the NLP stages
+  python pipeline.py --stages themes --full
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scraping import maintenance
+from scraping.db import connect, init_db
+from scraping.settings import load_settings
+from NLP.delta import SOURCES, count_delta, delta_high, now_utc_int
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCRAPING_DIR = os.path.join(ROOT, "scraping")
+
+# stage -> upstream stages
+DAG: Dict[str, Tuple[str, ...]] = {
+    "ingest": (),
+    "dedup": ("ingest",),
+    "sentiment": ("ingest", "dedup"),
+    "entities": ("ingest", "dedup"),
+    "inherit": ("entities",),
+    "themes": ("ingest", "dedup"),
+    "export": ("sentiment", "entities", "inherit", "themes"),
+    "mirror": ("sentiment", "entities", "inherit", "themes"),
+    "publish": ("sentiment", "entities", "inherit", "themes"),
+}
+DELTA_STAGES = ("dedup", "sentiment", "entities", "inherit", "themes")
+OBJECT_TYPES = ("post", "comment")
+
+
+# ---- watermarks ----
+def get_watermark(conn, stage: str, object_type: str = "") -> Optional[int]:
+    row = conn.execute(
+        "SELECT watermark_utc FROM pipeline_watermarks WHERE stage = ? AND object_type = ?",
+        (stage, object_type),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def record_stage(conn, stage: str, object_type: str, watermark: Optional[int], rows: int, seconds: float) -> None:
+    conn.execute(
+        """
+        INSERT INTO pipeline_watermarks (stage, object_type, watermark_utc, last_rows, last_seconds, last_run_utc)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(stage, object_type) DO UPDATE SET
+          watermark_utc = COALESCE(excluded.watermark_utc, pipeline_watermarks.watermark_utc),
+          last_rows = excluded.last_rows,
+          last_seconds = excluded.last_seconds,
+          last_run_utc = excluded.last_run_utc
+        """,
+        (stage, object_type, watermark, rows, round(seconds, 3), now_utc_int()),
+    )
+    conn.commit()
+
+
+def _open(db_path: str):
+    conn = connect(db_path)
+    # stages write in parallel; each batch is short, so just wait for the lock
+    conn.execute("PRAGMA busy_timeout=60000;")
+    return conn
+
+
+# ---- stages (module-level so they can run in worker processes) ----
+def _run_script(script: str, args: Sequence[str], db_path: str, capture: bool = False) -> str:
+    env = dict(os.environ, SQLITE_PATH=db_path)
+    cmd = [sys.executable, script, *args]
+    if capture:
+        return subprocess.run(cmd, cwd=SCRAPING_DIR, env=env, check=True, capture_output=True, text=True).stdout
+    subprocess.run(cmd, cwd=SCRAPING_DIR, env=env, check=True)
+    return ""
+
+
+def _delta_fn(stage: str):
+    # imported lazily: VADER and the regex tables are only needed by the stage that uses them
+    if stage == "dedup":
+        from NLP.near_dup import index_near_dups
+        return index_near_dups
+    if stage == "sentiment":
+        from NLP.backfill_nlp import score_sentiment
+        return score_sentiment
+    if stage == "entities":
+        from NLP.backfill_nlp import extract_mentions
+        return extract_mentions
+    if stage == "inherit":
+        from NLP.thread_context import inherit_context
+        return inherit_context
+    from NLP.backfill_themes import label_themes
+    return lambda conn, ot, since, until: label_themes(conn, ot, since, until)[0]
+
+
+def run_delta_stage(stage: str, db_path: str, dry_run: bool, full: bool, highs: Dict[str, int]) -> Dict[str, int]:
+    conn = _open(db_path)
+    try:
+        out = {}
+        for object_type in OBJECT_TYPES:
+            since = None if full else get_watermark(conn, stage, object_type)
+            until = highs[object_type]
+            if dry_run:
+                out[object_type] = count_delta(conn, object_type, since, until)
+                continue
+            t0 = time.perf_counter()
+            n = _delta_fn(stage)(conn, object_type, since, until)
+            record_stage(conn, stage, object_type, until, n, time.perf_counter() - t0)
+            out[object_type] = n
+        return out
+    finally:
+        conn.close()
+
+
+def run_ingest_stage(db_path: str, dry_run: bool, fresh: bool) -> Dict[str, int]:
+    conn = _open(db_path)
+    try:
+        if dry_run:
+            # listings can't be sized without calling Reddit; report the comment backlog instead
+            (due,) = conn.execute(
+                "SELECT COUNT(*) FROM comment_refresh_queue WHERE next_due_utc <= ?", (now_utc_int(),)
+            ).fetchone()
+            return {"comment_threads_due": due}
+
+        before = {ot: delta_high(conn, ot) for ot in OBJECT_TYPES}
+        t0 = time.perf_counter()
+        _run_script("run_ingest.py", ["--no-export"] + (["--fresh"] if fresh else []), db_path)
+        seconds = time.perf_counter() - t0
+
+        out = {}
+        for ot in OBJECT_TYPES:
+            table = SOURCES[ot][0]
+            (n,) = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE retrieved_at_utc > ?", (before[ot],)).fetchone()
+            out[ot] = n
+        record_stage(conn, "ingest", "", None, sum(out.values()), seconds)
+        return out
+    finally:
+        conn.close()
+
+
+_EXPORT_LINE = re.compile(r"posts rows=(\d+), comments rows=(\d+)")
+
+
+def run_export_stage(db_path: str, dry_run: bool) -> Dict[str, int]:
+    t0 = time.perf_counter()
+    stdout = _run_script("export_csv.py", ["--dry-run"] if dry_run else [], db_path, capture=True)
+    seconds = time.perf_counter() - t0
+    print(stdout, end="")
+    m = _EXPORT_LINE.search(stdout)
+    out = {"post": int(m.group(1)), "comment": int(m.group(2))} if m else {}
+    if not dry_run:
+        conn = _open(db_path)
+        try:
+            record_stage(conn, "export", "", None, sum(out.values()), seconds)
+        finally:
+            conn.close()
+    return out
+
+
+def run_mirror_stage(db_path: str, dry_run: bool) -> Dict[str, int]:
+    if os.getenv("ANALYTICS_BACKEND", "sqlite").strip().lower() != "duckdb":
+        print("[PIPELINE] mirror: ANALYTICS_BACKEND is not duckdb, nothing to do")
+        return {}
+    from api.duckdb_mirror import build_mirror, default_duckdb_path
+
+    if dry_run:
+        conn = _open(db_path)
+        try:
+            (n,) = conn.execute("SELECT COUNT(*) FROM extraction").fetchone()
+        finally:
+            conn.close()
+        return {"extraction": n}
+
+    t0 = time.perf_counter()
+    counts = build_mirror(db_path, os.path.abspath(os.getenv("DUCKDB_PATH") or default_duckdb_path(db_path)))
+    conn = _open(db_path)
+    try:
+        record_stage(conn, "mirror", "", None, counts["facts"], time.perf_counter() - t0)
+    finally:
+        conn.close()
+    return counts
+
+
+def run_publish_stage(db_path: str, dry_run: bool) -> Dict[str, int]:
+    if os.getenv("SQLITE_SNAPSHOTS", "0").strip() in ("0", "false", "no", ""):
+        print("[PIPELINE] publish: SQLITE_SNAPSHOTS is off, nothing to do")
+        return {}
+    from api.snapshot import publish_snapshot
+
+    if dry_run:
+        return {"bytes": os.path.getsize(db_path)}
+
+    t0 = time.perf_counter()
+    info = publish_snapshot(db_path, os.getenv("SNAPSHOT_DIR") or None, max(1, int(os.getenv("SNAPSHOT_KEEP", "3"))))
+    conn = _open(db_path)
+    try:
+        # watermark = when the published copy was taken
+        record_stage(conn, "publish", "", info["created_utc"], 0, time.perf_counter() - t0)
+    finally:
+        conn.close()
+    return {"generation": info["generation"], "bytes": info["bytes"]}
+
+
+def run_stage(
+    stage: str, db_path: str, dry_run: bool, full: bool, fresh: bool, highs: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict[str, int], float]:
+    t0 = time.perf_counter()
+    if stage == "ingest":
+        out = run_ingest_stage(db_path, dry_run, fresh)
+    elif stage == "export":
+        out = run_export_stage(db_path, dry_run)
+    elif stage == "mirror":
+        out = run_mirror_stage(db_path, dry_run)
+    elif stage == "publish":
+        out = run_publish_stage(db_path, dry_run)
+    else:
+        out = run_delta_stage(stage, db_path, dry_run, full, highs)
+    return out, time.perf_counter() - t0
+
+
+# ---- scheduler ----
+def run_dag(stages: List[str], db_path: str, jobs: int, dry_run: bool, full: bool, fresh: bool) -> bool:
+    """
+    Starts every stage whose selected upstream stages finished, up to `jobs` at a time.
+    A failed stage skips everything downstream of it. Returns True if all selected stages ran.
+    """
+    done: Dict[str, Tuple[Dict[str, int], float]] = {}
+    failed: Dict[str, str] = {}
+    pending = list(stages)
+    running = {}
+    highs: Dict[str, int] = {}  # one upper bound shared by all delta stages of this run
+
+    def deps(stage: str) -> List[str]:
+        return [d for d in DAG[stage] if d in stages]
+
+    maint_policy = maintenance.policy_from_settings(load_settings())
+
+    def maintain(label: str, end_of_run: bool = False) -> None:
+        # stages run in other processes; checkpointing from here keeps the WAL bounded between them
+        conn = _open(db_path)
+        try:
+            if end_of_run:
+                maintenance.full(conn, label, maint_policy)
+            else:
+                maintenance.at_stage_boundary(conn, label, maint_policy)
+        except sqlite3.OperationalError as e:
+            print(f"[PIPELINE] maintenance after {label} skipped: {e}")
+        finally:
+            conn.close()
+
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for stage in list(pending):
+                ds = deps(stage)
+                if any(d in failed for d in ds):
+                    pending.remove(stage)
+                    failed[stage] = "upstream failed"
+                elif all(d in done for d in ds):
+                    pending.remove(stage)
+                    if stage in DELTA_STAGES and not highs:
+                        conn = _open(db_path)
+                        highs.update({ot: delta_high(conn, ot) for ot in OBJECT_TYPES})
+                        conn.close()
+                    print(f"[PIPELINE] start {stage}")
+                    running[pool.submit(run_stage, stage, db_path, dry_run, full, fresh, dict(highs))] = stage
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                stage = running.pop(fut)
+                try:
+                    done[stage] = fut.result()
+                    counts, seconds = done[stage]
+                    print(f"[PIPELINE] {stage} finished in {seconds:.1f}s: {counts}")
+                except Exception as e:
+                    failed[stage] = str(e)
+                    print(f"[PIPELINE] {stage} FAILED: {e}")
+                if not dry_run:
+                    maintain(stage)
+
+    if done and not dry_run:
+        maintain("end of run", end_of_run=True)
+
+    verb = "would touch" if dry_run else "touched"
+    print(f"\n[PIPELINE] summary (rows {verb})")
+    for stage in stages:
+        if stage in done:
+            counts, seconds = done[stage]
+            detail = ", ".join(f"{k}={v}" for k, v in counts.items()) or "-"
+            print(f"  {stage:<10} {seconds:7.1f}s  {detail}")
+        else:
+            print(f"  {stage:<10} {'':>8}  not run ({failed.get(stage, 'skipped')})")
+    return not failed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Run ingest -> NLP -> export as an incremental DAG")
+    ap.add_argument("--stages", default=",".join(DAG), help=f"comma-separated subset of {','.join(DAG)}")
+    ap.add_argument("--skip", default="", help="comma-separated stages to leave out")
+    ap.add_argument("--jobs", type=int, default=3, help="stages allowed to run at once")
+    ap.add_argument("--dry-run", action="store_true", help="report rows per stage without running anything")
+    ap.add_argument("--full", action="store_true", help="ignore watermarks and reprocess every row")
+    ap.add_argument("--fresh", action="store_true", help="pass --fresh to run_ingest (don't resume)")
+    args = ap.parse_args()
+
+    wanted = [s.strip() for s in args.stages.split(",") if s.strip()]
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    unknown = [s for s in list(wanted) + list(skip) if s not in DAG]
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(unknown)}")
+    stages = [s for s in DAG if s in wanted and s not in skip]
+
+    # One database for every stage, whatever directory each script runs from
+    db_path = os.path.abspath(load_settings().sqlite_path)
+    conn = connect(db_path)
+    init_db(conn)
+    conn.close()
+    print(f"[PIPELINE] db={db_path} stages={','.join(stages)}{' (dry run)' if args.dry_run else ''}")
+
+    ok = run_dag(stages, db_path, args.jobs, args.dry_run, args.full, args.fresh)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Ingestion throughput benchmark against a local fake Reddit (no network, no credentials).
+
+For each concurrency level it starts from an empty database and measures:
+  - posts phase:    ingest_subreddit_posts for every subreddit, `c` subreddits at a time
+  - comments phase: ingest_comments_for_post for every stored post on `c` workers
+and reports posts/s, comments/s and the DB writer's time inside flush transactions.
+
+  python bench_ingest.py --concurrency 1,2,4,8 --latency-ms 50
+  python bench_ingest.py --fixture fixtures/cruise.jsonl.gz --latency-ms 80 --json bench.json
+
+--fixture replays a recording made with REDDIT_RECORD_PATH (see recording.py);
+without it the synthetic corpus from fake_reddit.py is used.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from settings import Settings, load_settings
+from reddit_client import ThreadLocalReddit
+from rate_limit import TokenBucket
+from db import connect, init_db
+from db_writer import DBWriter
+from ingest_posts import SeenIds, StoredHashes, ingest_subreddit_posts
+from ingest_comments import ingest_comments_concurrently
+from recording import load_fixture
+import fake_reddit
+
+
+def bench_level(base: Settings, subreddits: Dict[str, str], concurrency: int, work_dir: str) -> Dict:
+    db_path = os.path.join(work_dir, f"bench_c{concurrency}.db")
+    settings = dataclasses.replace(
+        base,
+        sqlite_path=db_path,
+        subreddits=subreddits,
+        ingest_workers=concurrency,
+        comment_workers=concurrency,
+        sleep_seconds_between_posts=0.0,
+        progress_every_seconds=3600.0,
+    )
+    conn = connect(db_path)
+    init_db(conn)
+
+    limiter = TokenBucket(settings.requests_per_minute)
+    clients = ThreadLocalReddit(settings, limiter)
+    writer = DBWriter(db_path, flush_rows=settings.write_flush_rows,
+                      flush_seconds=settings.write_flush_seconds, log_flushes=False)
+    writer.start()
+
+    # posts
+    seen = SeenIds()
+    stored = StoredHashes(db_path)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        posts = sum(pool.map(
+            lambda item: ingest_subreddit_posts(writer, clients.get(), item[0], item[1], settings, seen, stored),
+            subreddits.items(),
+        ))
+    writer.sync()
+    posts_seconds = time.perf_counter() - t0
+    posts_write = writer.flush_seconds_total
+
+    # comments
+    post_ids = [r[0] for r in conn.execute("SELECT post_id FROM posts ORDER BY post_id")]
+    t0 = time.perf_counter()
+    processed, comments = ingest_comments_concurrently(writer, clients.get, post_ids, settings)
+    writer.close()
+    comments_seconds = time.perf_counter() - t0
+    conn.close()
+
+    return {
+        "concurrency": concurrency,
+        "posts": posts,
+        "posts_seconds": round(posts_seconds, 3),
+        "posts_per_sec": round(posts / max(posts_seconds, 1e-9), 1),
+        "posts_write_seconds": round(posts_write, 3),
+        "comment_posts": processed,
+        "comments": comments,
+        "comments_seconds": round(comments_seconds, 3),
+        "comments_per_sec": round(comments / max(comments_seconds, 1e-9), 1),
+        "comments_write_seconds": round(writer.flush_seconds_total - posts_write, 3),
+        "writer_flushes": writer.flushes,
+        "rate_limit_wait_seconds": round(limiter.waited_seconds, 3),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark post/comment ingestion against a local fake Reddit")
+    ap.add_argument("--concurrency", default="1,2,4,8", help="comma-separated worker counts")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="added to every fake API response")
+    ap.add_argument("--fixture", default=None, help="recorded .jsonl.gz to replay (default: synthetic corpus)")
+    ap.add_argument("--subreddits", type=int, default=4, help="first N configured subreddits")
+    ap.add_argument("--posts", type=int, default=200, help="synthetic posts per subreddit")
+    ap.add_argument("--comments", type=int, default=20, help="synthetic comments per post")
+    ap.add_argument("--json", dest="json_out", default=None, help="also write results here")
+    args = ap.parse_args()
+
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    base = load_settings()
+    subreddits = dict(list(base.subreddits.items())[: args.subreddits])
+
+    fixture: Optional[Dict] = load_fixture(args.fixture) if args.fixture else None
+    state = fake_reddit.FakeRedditState(
+        args.posts, args.comments, budget=10**9, window=600.0, latency_ms=args.latency_ms, fixture=fixture
+    )
+    server = fake_reddit.serve("127.0.0.1", 0, state, list(subreddits))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    base = dataclasses.replace(
+        base,
+        reddit_client_id="bench",
+        reddit_client_secret="bench",
+        reddit_oauth_url=url,
+        reddit_url=url,
+        reddit_record_path="",
+        requests_per_minute=float(10**9),  # measure the pipeline, not the API budget
+    )
+
+    source = f"fixture {args.fixture}" if fixture is not None else f"synthetic {args.posts}x{args.comments}"
+    print(f"[BENCH] {len(subreddits)} subreddits, {source}, latency={args.latency_ms:.0f}ms")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+    results: List[Dict] = []
+    try:
+        for c in levels:
+            r = bench_level(base, subreddits, c, work_dir)
+            results.append(r)
+            print(
+                f"[BENCH] c={c:<3} posts {r['posts']} in {r['posts_seconds']:.2f}s ({r['posts_per_sec']:.0f}/s, "
+                f"write {r['posts_write_seconds']:.2f}s) | comments {r['comments']} in {r['comments_seconds']:.2f}s "
+                f"({r['comments_per_sec']:.0f}/s, write {r['comments_write_seconds']:.2f}s)"
+            )
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if state.fixture_misses:
+        print(f"[BENCH] WARN: {state.fixture_misses} requests were not in the fixture")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"latency_ms": args.latency_ms, "source": source, "results": results}, f, indent=2)
+        print(f"[BENCH] wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence, Tuple
+
+# Crash-safe progress for run_ingest:
+#   - ingest_runs: one row per invocation (stage + counters), left "running"/"failed" if it died
+#   - ingest_checkpoints: Reddit `after` cursor per (subreddit, listing) for the run that wrote it
+# Cursor rows are written through the DBWriter, in the same transaction as the
+# posts that precede them, so a checkpoint never points past uncommitted rows.
+
+# Table DDL lives in db.SCHEMA (ingest_runs, ingest_checkpoints).
+
+
+def now_utc_int() -> int:
+    return int(datetime.now(tz=timezone.utc).timestamp())
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    after_fullname: Optional[str]
+    items_seen: int
+    posts_written: int
+    done: bool
+
+
+# ---- runs ----
+def find_unfinished_run(conn: sqlite3.Connection) -> Optional[Tuple[int, Optional[str], Optional[str]]]:
+    """Latest run that never reached "done": (run_id, stage, worker), or None."""
+    row = conn.execute(
+        """
+        SELECT run_id, stage, worker FROM ingest_runs
+        WHERE status != 'done'
+        ORDER BY run_id DESC LIMIT 1
+        """
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def start_run(conn: sqlite3.Connection, worker: str) -> int:
+    now = now_utc_int()
+    cur = conn.execute(
+        "INSERT INTO ingest_runs (started_utc, updated_utc, status, stage, worker) VALUES (?, ?, 'running', 'posts', ?)",
+        (now, now, worker),
+    )
+    conn.commit()
+    return int(cur.lastrowid)
+
+
+def resume_run(conn: sqlite3.Connection, run_id: int, worker: str) -> None:
+    conn.execute(
+        "UPDATE ingest_runs SET status = 'running', worker = ?, updated_utc = ? WHERE run_id = ?",
+        (worker, now_utc_int(), run_id),
+    )
+    conn.commit()
+
+
+def abandon_unfinished_runs(conn: sqlite3.Connection) -> int:
+    """--fresh: unfinished runs stay in the journal but are never resumed."""
+    cur = conn.execute(
+        "UPDATE ingest_runs SET status = 'done', stage = 'abandoned', finished_utc = ? WHERE status != 'done'",
+        (now_utc_int(),),
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def update_run(conn: sqlite3.Connection, run_id: int, **fields) -> None:
+    """
+    Sets stage/status and adds to counters:
+      update_run(conn, 3, stage="comments", posts_written=120)
+    """
+    sets = ["updated_utc = ?"]
+    params = [now_utc_int()]
+    for key in ("stage", "status"):
+        if key in fields:
+            sets.append(f"{key} = ?")
+            params.append(fields[key])
+    for key in ("posts_written", "comment_posts", "comments_written"):
+        if key in fields:
+            sets.append(f"{key} = {key} + ?")
+            params.append(int(fields[key]))
+    if fields.get("status") == "done":
+        sets.append("finished_utc = ?")
+        params.append(now_utc_int())
+    params.append(run_id)
+    conn.execute(f"UPDATE ingest_runs SET {', '.join(sets)} WHERE run_id = ?", params)
+    conn.commit()
+
+
+# ---- listing cursors ----
+def load_checkpoints(conn: sqlite3.Connection, run_id: int) -> Dict[Tuple[str, str], Checkpoint]:
+    """Cursors written by `run_id`; anything left by older runs is ignored."""
+    cur = conn.execute(
+        """
+        SELECT subreddit, listing, after_fullname, items_seen, posts_written, done
+        FROM ingest_checkpoints WHERE run_id = ?
+        """,
+        (run_id,),
+    )
+    return {
+        (sub, listing): Checkpoint(after, int(seen), int(written), bool(done))
+        for sub, listing, after, seen, written, done in cur
+    }
+
+
+def save_checkpoints_many(conn: sqlite3.Connection, rows: Sequence[Tuple]) -> None:
+    """rows: (run_id, subreddit, listing, after_fullname, items_seen, posts_written, done, updated_utc)."""
+    conn.executemany(
+        """
+        INSERT INTO ingest_checkpoints (run_id, subreddit, listing, after_fullname, items_seen, posts_written, done, updated_utc)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(subreddit, listing) DO UPDATE SET
+          run_id = excluded.run_id,
+          after_fullname = excluded.after_fullname,
+          items_seen = excluded.items_seen,
+          posts_written = excluded.posts_written,
+          done = excluded.done,
+          updated_utc = excluded.updated_utc
+        """,
+        rows,
+    )
@@ -1,7 +1,9 @@
 import sqlite3
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Optional, Sequence, Tuple
 
 SCHEMA = """
+-- only takes effect on a new (empty) file; older ones switch via `maintenance.py --vacuum`
+PRAGMA auto_vacuum=INCREMENTAL;
 PRAGMA journal_mode=WAL;
 PRAGMA foreign_keys=ON;
 
@@ -24,7 +26,10 @@ CREATE TABLE IF NOT EXISTS posts (
 
   -- comment ingestion bookkeeping
   comments_last_ingested_utc INTEGER,
-  comments_last_count INTEGER
+  comments_last_count INTEGER,
+
+  -- hash of the mutable fields (score, num_comments, selftext, flair) for change detection
+  content_hash TEXT
 );
 
 CREATE TABLE IF NOT EXISTS comments (
@@ -67,6 +72,8 @@ CREATE TABLE IF NOT EXISTS extraction (
   port_ids    TEXT,                   -- JSON array string
   confidence  REAL,
   extracted_at_utc INTEGER,
+  line_source   TEXT,                 -- text | ship | post | subreddit (NLP/thread_context.py); NULL = no line
+  entity_source TEXT,                 -- text | post; NULL = no ports / ships
   PRIMARY KEY (object_type, object_id)
 );
 
@@ -87,188 +94,351 @@ CREATE TABLE IF NOT EXISTS themes (
 CREATE INDEX IF NOT EXISTS idx_themes_object ON themes(object_type, object_id);
 CREATE INDEX IF NOT EXISTS idx_themes_label  ON themes(theme_label);
 
+
+-- near-duplicate comments (NLP/near_dup.py): MinHash signature and cluster per comment
+CREATE TABLE IF NOT EXISTS near_dups (
+  comment_id TEXT PRIMARY KEY,
+  cluster_id TEXT NOT NULL,             -- comment_id of the cluster's first-seen member (its representative)
+  signature  BLOB NOT NULL,
+  indexed_at_utc INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_near_dups_cluster ON near_dups(cluster_id);
+
+-- LSH buckets of cluster representatives: one row per band
+CREATE TABLE IF NOT EXISTS near_dup_bands (
+  band INTEGER NOT NULL,
+  bucket INTEGER NOT NULL,
+  comment_id TEXT NOT NULL,
+  PRIMARY KEY (band, bucket, comment_id)
+) WITHOUT ROWID;
+
+
+-- prioritized comment (re)fetch schedule, see refresh_queue.py
+CREATE TABLE IF NOT EXISTS comment_refresh_queue (
+  post_id TEXT PRIMARY KEY,
+  priority REAL NOT NULL DEFAULT 0,
+  next_due_utc INTEGER,                 -- NULL = nothing to do until the post changes again
+  last_seen_num_comments INTEGER,
+  failures INTEGER NOT NULL DEFAULT 0,
+  last_error TEXT,
+  lease_owner TEXT,
+  lease_expires_utc INTEGER,
+  FOREIGN KEY(post_id) REFERENCES posts(post_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_refresh_due ON comment_refresh_queue(next_due_utc, priority);
+
+-- delta scans for the pipeline stages / incremental exports
+CREATE INDEX IF NOT EXISTS idx_posts_retrieved ON posts(retrieved_at_utc);
+CREATE INDEX IF NOT EXISTS idx_comments_retrieved ON comments(retrieved_at_utc);
+
+-- streaming mode: posts/comments waiting for NLP (filled by the triggers in STREAM_TRIGGERS,
+-- drained by NLP/stream_scorer.py). seq changes on every re-enqueue, so a consumer only
+-- deletes the exact entries it scored.
+CREATE TABLE IF NOT EXISTS scoring_queue (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  object_type TEXT NOT NULL,
+  object_id TEXT NOT NULL,
+  enqueued_utc INTEGER NOT NULL,
+  UNIQUE (object_type, object_id)
+);
+
+-- per-stage progress for pipeline.py: rows with retrieved_at_utc <= watermark_utc are done
+CREATE TABLE IF NOT EXISTS pipeline_watermarks (
+  stage TEXT NOT NULL,                  -- ingest | dedup | sentiment | entities | inherit | themes | export | mirror | publish
+  object_type TEXT NOT NULL,            -- 'post' / 'comment' ('' for stages without a delta)
+  watermark_utc INTEGER,
+  last_rows INTEGER,
+  last_seconds REAL,
+  last_run_utc INTEGER,
+  PRIMARY KEY (stage, object_type)
+);
+
+-- one row per run_ingest invocation, see checkpoints.py
+CREATE TABLE IF NOT EXISTS ingest_runs (
+  run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  started_utc INTEGER NOT NULL,
+  updated_utc INTEGER NOT NULL,
+  finished_utc INTEGER,
+  status TEXT NOT NULL,                 -- running | done (a run that crashed stays "running")
+  stage TEXT,                           -- posts | comments | export
+  worker TEXT,                          -- refresh-queue lease owner of this run
+  posts_written INTEGER NOT NULL DEFAULT 0,
+  comment_posts INTEGER NOT NULL DEFAULT 0,
+  comments_written INTEGER NOT NULL DEFAULT 0
+);
+
+-- listing cursor per (subreddit, listing); only meaningful for run_id's run
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+  subreddit TEXT NOT NULL,
+  listing TEXT NOT NULL,                -- e.g. "new", "top(all)"
+  run_id INTEGER NOT NULL,
+  after_fullname TEXT,                  -- Reddit "after" cursor (t3_xxx) of the last item handled
+  items_seen INTEGER NOT NULL DEFAULT 0,
+  posts_written INTEGER NOT NULL DEFAULT 0,
+  done INTEGER NOT NULL DEFAULT 0,
+  updated_utc INTEGER NOT NULL,
+  PRIMARY KEY (subreddit, listing),
+  FOREIGN KEY(run_id) REFERENCES ingest_runs(run_id)
+);
+
 """
 
 
+# Created only while streaming scoring is on (STREAM_SCORING=1), so the queue
+# doesn't grow when nothing consumes it. Only new rows and changed text enqueue:
+# re-fetching an unchanged comment tree costs nothing downstream.
+_NOW = "CAST(strftime('%s','now') AS INTEGER)"
+STREAM_TRIGGERS = {
+    "trg_stream_comment_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stream_comment_insert AFTER INSERT ON comments
+        BEGIN
+          INSERT OR REPLACE INTO scoring_queue (object_type, object_id, enqueued_utc)
+          VALUES ('comment', NEW.comment_id, {_NOW});
+        END""",
+    "trg_stream_comment_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stream_comment_update AFTER UPDATE OF body ON comments
+        WHEN OLD.body IS NOT NEW.body
+        BEGIN
+          INSERT OR REPLACE INTO scoring_queue (object_type, object_id, enqueued_utc)
+          VALUES ('comment', NEW.comment_id, {_NOW});
+        END""",
+    "trg_stream_post_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stream_post_insert AFTER INSERT ON posts
+        BEGIN
+          INSERT OR REPLACE INTO scoring_queue (object_type, object_id, enqueued_utc)
+          VALUES ('post', NEW.post_id, {_NOW});
+        END""",
+    "trg_stream_post_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stream_post_update AFTER UPDATE OF title, selftext ON posts
+        WHEN OLD.title IS NOT NEW.title OR OLD.selftext IS NOT NEW.selftext
+        BEGIN
+          INSERT OR REPLACE INTO scoring_queue (object_type, object_id, enqueued_utc)
+          VALUES ('post', NEW.post_id, {_NOW});
+        END""",
+}
+
+
+def set_stream_scoring(conn: sqlite3.Connection, enabled: bool) -> None:
+    for name, ddl in STREAM_TRIGGERS.items():
+        conn.execute(ddl if enabled else f"DROP TRIGGER IF EXISTS {name}")
+    conn.commit()
+
+
 def connect(db_path: str) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
     conn.execute("PRAGMA foreign_keys=ON;")
     return conn
 
 
+# Columns added after the first release: CREATE TABLE IF NOT EXISTS won't add
+# them to an existing database, so init_db adds whatever is missing.
+ADDED_COLUMNS = {
+    "posts": [("content_hash", "TEXT")],
+    "extraction": [("line_source", "TEXT"), ("entity_source", "TEXT")],
+}
+
+# Run once, right after the column is added: rows extracted before it existed
+# got every value from their own text, and the comments that got none still need
+# their thread's (dropping the watermark makes the pipeline's next inherit stage a full one).
+ADDED_COLUMN_BACKFILL = {
+    ("extraction", "line_source"): (
+        "UPDATE extraction SET line_source = 'text' WHERE cruise_line IS NOT NULL AND TRIM(cruise_line) != ''",
+        "DELETE FROM pipeline_watermarks WHERE stage = 'inherit'",
+    ),
+    ("extraction", "entity_source"): (
+        "UPDATE extraction SET entity_source = 'text' "
+        "WHERE COALESCE(port_ids, '[]') != '[]' OR COALESCE(ship_ids, '[]') != '[]'",
+    ),
+}
+
+
+def _ensure_columns(conn: sqlite3.Connection) -> None:
+    for table, cols in ADDED_COLUMNS.items():
+        have = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in cols:
+            if name not in have:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+                for sql in ADDED_COLUMN_BACKFILL.get((table, name), ()):
+                    conn.execute(sql)
+
+
 def init_db(conn: sqlite3.Connection) -> None:
     conn.executescript(SCHEMA)
+    _ensure_columns(conn)
     conn.commit()
 
 
+UPSERT_POST_SQL = """
+INSERT INTO posts (
+  post_id, subreddit, cruise_line_from_subreddit, created_utc, title, selftext,
+  author, score, num_comments, url, permalink, over_18, is_self, link_flair_text,
+  retrieved_at_utc,
+  comments_last_ingested_utc, comments_last_count, content_hash
+) VALUES (
+  :post_id, :subreddit, :cruise_line_from_subreddit, :created_utc, :title, :selftext,
+  :author, :score, :num_comments, :url, :permalink, :over_18, :is_self, :link_flair_text,
+  :retrieved_at_utc,
+  COALESCE(:comments_last_ingested_utc, NULL),
+  COALESCE(:comments_last_count, NULL),
+  :content_hash
+)
+ON CONFLICT(post_id) DO UPDATE SET
+  subreddit=excluded.subreddit,
+  cruise_line_from_subreddit=excluded.cruise_line_from_subreddit,
+  created_utc=excluded.created_utc,
+  title=excluded.title,
+  selftext=excluded.selftext,
+  author=excluded.author,
+  score=excluded.score,
+  num_comments=excluded.num_comments,
+  url=excluded.url,
+  permalink=excluded.permalink,
+  over_18=excluded.over_18,
+  is_self=excluded.is_self,
+  link_flair_text=excluded.link_flair_text,
+  retrieved_at_utc=excluded.retrieved_at_utc,
+  content_hash=excluded.content_hash
+"""
+
+
 def upsert_post(conn: sqlite3.Connection, row: Dict[str, Any]) -> None:
-    conn.execute(
-        """
-        INSERT INTO posts (
-          post_id, subreddit, cruise_line_from_subreddit, created_utc, title, selftext,
-          author, score, num_comments, url, permalink, over_18, is_self, link_flair_text,
-          retrieved_at_utc,
-          comments_last_ingested_utc, comments_last_count
-        ) VALUES (
-          :post_id, :subreddit, :cruise_line_from_subreddit, :created_utc, :title, :selftext,
-          :author, :score, :num_comments, :url, :permalink, :over_18, :is_self, :link_flair_text,
-          :retrieved_at_utc,
-          COALESCE(:comments_last_ingested_utc, NULL),
-          COALESCE(:comments_last_count, NULL)
-        )
-        ON CONFLICT(post_id) DO UPDATE SET
-          subreddit=excluded.subreddit,
-          cruise_line_from_subreddit=excluded.cruise_line_from_subreddit,
-          created_utc=excluded.created_utc,
-          title=excluded.title,
-          selftext=excluded.selftext,
-          author=excluded.author,
-          score=excluded.score,
-          num_comments=excluded.num_comments,
-          url=excluded.url,
-          permalink=excluded.permalink,
-          over_18=excluded.over_18,
-          is_self=excluded.is_self,
-          link_flair_text=excluded.link_flair_text,
-          retrieved_at_utc=excluded.retrieved_at_utc
-        """,
-        row,
-    )
+    conn.execute(UPSERT_POST_SQL, row)
+
+
+def upsert_posts(conn: sqlite3.Connection, rows: Sequence[Dict[str, Any]]) -> None:
+    conn.executemany(UPSERT_POST_SQL, rows)
+
+
+UPSERT_COMMENT_SQL = """
+INSERT INTO comments (
+  comment_id, post_id, subreddit, created_utc, body, author, score,
+  permalink, retrieved_at_utc
+) VALUES (
+  :comment_id, :post_id, :subreddit, :created_utc, :body, :author, :score,
+  :permalink, :retrieved_at_utc
+)
+ON CONFLICT(comment_id) DO UPDATE SET
+  post_id=excluded.post_id,
+  subreddit=excluded.subreddit,
+  created_utc=excluded.created_utc,
+  body=excluded.body,
+  author=excluded.author,
+  score=excluded.score,
+  permalink=excluded.permalink,
+  retrieved_at_utc=excluded.retrieved_at_utc
+"""
 
 
 def upsert_comment(conn: sqlite3.Connection, row: Dict[str, Any]) -> None:
-    conn.execute(
-        """
-        INSERT INTO comments (
-          comment_id, post_id, subreddit, created_utc, body, author, score,
-          permalink, retrieved_at_utc
-        ) VALUES (
-          :comment_id, :post_id, :subreddit, :created_utc, :body, :author, :score,
-          :permalink, :retrieved_at_utc
-        )
-        ON CONFLICT(comment_id) DO UPDATE SET
-          post_id=excluded.post_id,
-          subreddit=excluded.subreddit,
-          created_utc=excluded.created_utc,
-          body=excluded.body,
-          author=excluded.author,
-          score=excluded.score,
-          permalink=excluded.permalink,
-          retrieved_at_utc=excluded.retrieved_at_utc
-        """,
-        row,
-    )
+    conn.execute(UPSERT_COMMENT_SQL, row)
 
 
-def mark_comments_ingested(conn: sqlite3.Connection, post_id: str, ingested_at_utc: int, comment_count: int) -> None:
-    conn.execute(
-        """
-        UPDATE posts
-        SET comments_last_ingested_utc = ?,
-            comments_last_count = ?
-        WHERE post_id = ?
-        """,
-        (ingested_at_utc, comment_count, post_id),
-    )
+def upsert_comments(conn: sqlite3.Connection, rows: Sequence[Dict[str, Any]]) -> None:
+    conn.executemany(UPSERT_COMMENT_SQL, rows)
 
 
-def iter_post_ids_needing_comments(
-    conn: sqlite3.Connection,
-    only_recent_days: Optional[int] = 14
-) -> Iterable[str]:
-    """
-    Strategy:
-      - Always ingest comments for posts missing comment ingestion metadata
-      - For recent posts (default 14 days), re-ingest if num_comments changed
-    """
-    cur = conn.cursor()
-
-    # Posts never ingested for comments
-    cur.execute(
-        """
-        SELECT post_id FROM posts
-        WHERE comments_last_ingested_utc IS NULL
-        ORDER BY created_utc DESC
-        """
-    )
-    for (pid,) in cur.fetchall():
-        yield pid
-
-    if only_recent_days is None:
-        return
-
-    # Recent posts where comment count changed since last ingestion
-    seconds = int(only_recent_days * 86400)
-    cur.execute(
-        """
-        SELECT post_id
-        FROM posts
-        WHERE created_utc IS NOT NULL
-          AND (strftime('%s','now') - created_utc) <= ?
-          AND comments_last_ingested_utc IS NOT NULL
-          AND (comments_last_count IS NULL OR num_comments IS NULL OR num_comments > comments_last_count)
-        ORDER BY created_utc DESC
-        """,
-        (seconds,),
-    )
-    for (pid,) in cur.fetchall():
-        yield pid
+def load_post_hashes(conn: sqlite3.Connection, subreddit: str) -> Dict[str, Optional[str]]:
+    cur = conn.execute("SELECT post_id, content_hash FROM posts WHERE subreddit = ?", (subreddit,))
+    return dict(cur.fetchall())
+
+
+MARK_COMMENTS_SQL = """
+UPDATE posts
+SET comments_last_ingested_utc = ?,
+    comments_last_count = ?
+WHERE post_id = ?
+"""
+
+
+def mark_comments_ingested(conn: sqlite3.Connection, post_id: str, ingested_at_utc: int, comment_count: int) -> None:
+    conn.execute(MARK_COMMENTS_SQL, (ingested_at_utc, comment_count, post_id))
+
+
+def mark_comments_ingested_many(conn: sqlite3.Connection, rows: Sequence[Tuple[str, int, int]]) -> None:
+    """rows: (post_id, ingested_at_utc, comment_count)"""
+    conn.executemany(MARK_COMMENTS_SQL, [(ts, n, pid) for pid, ts, n in rows])
+
+
+UPSERT_NLP_SCORE_SQL = """
+INSERT INTO nlp_scores (
+  object_type, object_id, sentiment_label, sentiment_score,
+  severity_score, model_version, scored_at_utc
+) VALUES (
+  :object_type, :object_id, :sentiment_label, :sentiment_score,
+  :severity_score, :model_version, :scored_at_utc
+)
+ON CONFLICT(object_type, object_id) DO UPDATE SET
+  sentiment_label=excluded.sentiment_label,
+  sentiment_score=excluded.sentiment_score,
+  severity_score=excluded.severity_score,
+  model_version=excluded.model_version,
+  scored_at_utc=excluded.scored_at_utc
+"""
 
 
 def upsert_nlp_score(conn, row: dict) -> None:
-    conn.execute(
-        """
-        INSERT INTO nlp_scores (
-          object_type, object_id, sentiment_label, sentiment_score,
-          severity_score, model_version, scored_at_utc
-        ) VALUES (
-          :object_type, :object_id, :sentiment_label, :sentiment_score,
-          :severity_score, :model_version, :scored_at_utc
-        )
-        ON CONFLICT(object_type, object_id) DO UPDATE SET
-          sentiment_label=excluded.sentiment_label,
-          sentiment_score=excluded.sentiment_score,
-          severity_score=excluded.severity_score,
-          model_version=excluded.model_version,
-          scored_at_utc=excluded.scored_at_utc
-        """,
-        row,
-    )
+    conn.execute(UPSERT_NLP_SCORE_SQL, row)
+
+
+def upsert_nlp_scores(conn, rows: Sequence[dict]) -> None:
+    conn.executemany(UPSERT_NLP_SCORE_SQL, rows)
+
+
+UPSERT_EXTRACTION_SQL = """
+INSERT INTO extraction (
+  object_type, object_id, cruise_line, ship_ids, port_ids,
+  confidence, extracted_at_utc, line_source, entity_source
+) VALUES (
+  :object_type, :object_id, :cruise_line, :ship_ids, :port_ids,
+  :confidence, :extracted_at_utc, :line_source, :entity_source
+)
+ON CONFLICT(object_type, object_id) DO UPDATE SET
+  cruise_line=excluded.cruise_line,
+  ship_ids=excluded.ship_ids,
+  port_ids=excluded.port_ids,
+  confidence=excluded.confidence,
+  extracted_at_utc=excluded.extracted_at_utc,
+  line_source=excluded.line_source,
+  entity_source=excluded.entity_source
+"""
+
 
 def upsert_extraction(conn, row: dict) -> None:
-    conn.execute(
-        """
-        INSERT INTO extraction (
-          object_type, object_id, cruise_line, ship_ids, port_ids,
-          confidence, extracted_at_utc
-        ) VALUES (
-          :object_type, :object_id, :cruise_line, :ship_ids, :port_ids,
-          :confidence, :extracted_at_utc
-        )
-        ON CONFLICT(object_type, object_id) DO UPDATE SET
-          cruise_line=excluded.cruise_line,
-          ship_ids=excluded.ship_ids,
-          port_ids=excluded.port_ids,
-          confidence=excluded.confidence,
-          extracted_at_utc=excluded.extracted_at_utc
-        """,
-        row,
-    )
+    conn.execute(UPSERT_EXTRACTION_SQL, row)
+
+
+def upsert_extractions(conn, rows: Sequence[dict]) -> None:
+    conn.executemany(UPSERT_EXTRACTION_SQL, rows)
+
+
+UPSERT_THEME_SQL = """
+INSERT INTO themes (
+  object_type, object_id, theme_label, theme_score,
+  model_version, labeled_at_utc
+) VALUES (
+  :object_type, :object_id, :theme_label, :theme_score,
+  :model_version, :labeled_at_utc
+)
+ON CONFLICT(object_type, object_id, theme_label) DO UPDATE SET
+  theme_score=excluded.theme_score,
+  model_version=excluded.model_version,
+  labeled_at_utc=excluded.labeled_at_utc
+"""
+
+
 def upsert_theme(conn, row: dict) -> None:
-    conn.execute(
-        """
-        INSERT INTO themes (
-          object_type, object_id, theme_label, theme_score,
-          model_version, labeled_at_utc
-        ) VALUES (
-          :object_type, :object_id, :theme_label, :theme_score,
-          :model_version, :labeled_at_utc
-        )
-        ON CONFLICT(object_type, object_id, theme_label) DO UPDATE SET
-          theme_score=excluded.theme_score,
-          model_version=excluded.model_version,
-          labeled_at_utc=excluded.labeled_at_utc
-        """,
-        row,
-    )
+    conn.execute(UPSERT_THEME_SQL, row)
+
 
+def upsert_themes(conn, rows: Sequence[dict]) -> None:
+    conn.executemany(UPSERT_THEME_SQL, rows)
+
+
+def delete_themes(conn, object_type: str, object_ids: Sequence[str]) -> None:
+    """Relabelled objects drop their old themes first, so a theme that no longer matches doesn't linger."""
+    conn.executemany(
+        "DELETE FROM themes WHERE object_type = ? AND object_id = ?",
+        [(object_type, oid) for oid in object_ids],
+    )
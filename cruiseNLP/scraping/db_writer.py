@@ -0,0 +1,214 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db import connect, init_db, upsert_posts, upsert_comments, mark_comments_ingested_many
+from checkpoints import save_checkpoints_many
+import refresh_queue
+from refresh_queue import RefreshPolicy
+
+_STOP = object()
+
+# flush order inside one transaction: posts before comments (FK), comments before their marker,
+# listing cursors last so they never point past rows that aren't committed yet
+_FLUSH_ORDER = ("post", "comment", "comments_done", "refresh_failed", "checkpoint")
+
+
+def now_utc_int() -> int:
+    return int(datetime.now(tz=timezone.utc).timestamp())
+
+
+class DBWriter(threading.Thread):
+    """
+    The only thread that touches the SQLite connection during ingestion.
+
+    Fetch workers hand it row dicts through a bounded queue (which also gives
+    back-pressure if the network side outruns the disk). Rows are buffered and
+    flushed with executemany() in one transaction once `flush_rows` are
+    pending or `flush_seconds` have passed, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        flush_rows: int = 2000,
+        flush_seconds: float = 2.0,
+        max_queue: int = 10000,
+        log_flushes: bool = True,
+        refresh_policy: Optional[RefreshPolicy] = None,
+    ):
+        super().__init__(name="db-writer", daemon=True)
+        self.db_path = db_path
+        self.flush_rows = max(1, flush_rows)
+        self.flush_seconds = flush_seconds
+        self.log_flushes = log_flushes
+        self.refresh_policy = refresh_policy or RefreshPolicy()
+        self.queue: "queue.Queue[Tuple[Any, Any]]" = queue.Queue(maxsize=max_queue)
+        self.error: Optional[BaseException] = None
+        self.counts: Dict[str, int] = {op: 0 for op in _FLUSH_ORDER}
+        self.flushes = 0
+        self.flush_seconds_total = 0.0
+        self._buffers: Dict[str, List] = {op: [] for op in _FLUSH_ORDER}
+
+    # ---- producer side ----
+    def put(self, op: str, payload: Any) -> None:
+        if self.error is not None:
+            raise RuntimeError(f"db writer failed: {self.error}") from self.error
+        self.queue.put((op, payload))
+
+    def put_post(self, row: Dict) -> None:
+        self.put("post", row)
+
+    def put_comment(self, row: Dict) -> None:
+        self.put("comment", row)
+
+    def put_comments_done(self, post_id: str, ingested_at_utc: int, comment_count: int) -> None:
+        self.put("comments_done", (post_id, ingested_at_utc, comment_count))
+
+    def put_refresh_failed(self, post_id: str, error: str) -> None:
+        self.put("refresh_failed", (post_id, error))
+
+    def put_checkpoint(
+        self, run_id: int, subreddit: str, listing: str, after_fullname: Optional[str],
+        items_seen: int, posts_written: int, done: bool,
+    ) -> None:
+        self.put("checkpoint", (run_id, subreddit, listing, after_fullname, items_seen, posts_written, int(done), now_utc_int()))
+
+    def call(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs fn(conn, *args, **kwargs) on the writer thread after flushing, and returns its
+        result. Used for small writes that need an answer (e.g. leasing queue rows)
+        without opening a second write connection.
+        """
+        fut: Future = Future()
+        self.put("call", (fn, args, kwargs, fut))
+        while True:
+            try:
+                return fut.result(timeout=0.5)
+            except FutureTimeout:
+                # before 3.11 this isn't the builtin TimeoutError; fn raising one is done, not pending
+                if fut.done():
+                    raise
+                if self.error is not None or not self.is_alive():
+                    raise RuntimeError(f"db writer failed: {self.error}") from self.error
+
+    def sync(self, timeout: Optional[float] = None) -> None:
+        """Blocks until everything queued so far is committed."""
+        done = threading.Event()
+        self.put("sync", done)
+        while not done.wait(0.5 if timeout is None else timeout):
+            if self.error is not None or not self.is_alive():
+                raise RuntimeError(f"db writer failed: {self.error}") from self.error
+            if timeout is not None:
+                raise TimeoutError("db writer sync timed out")
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def close(self) -> None:
+        self.queue.put((_STOP, None))
+        self.join()
+        if self.error is not None:
+            raise RuntimeError(f"db writer failed: {self.error}") from self.error
+
+    # ---- writer thread ----
+    def _pending(self) -> int:
+        return sum(len(b) for b in self._buffers.values())
+
+    def _flush(self, conn) -> None:
+        pending = self._pending()
+        if not pending:
+            return
+
+        b = self._buffers
+        now = now_utc_int()
+        t0 = time.perf_counter()
+        with conn:  # one bounded transaction per flush
+            if b["post"]:
+                upsert_posts(conn, b["post"])
+                refresh_queue.enqueue_posts(conn, b["post"], self.refresh_policy, now)
+            if b["comment"]:
+                upsert_comments(conn, b["comment"])
+            if b["comments_done"]:
+                mark_comments_ingested_many(conn, b["comments_done"])
+                refresh_queue.complete_many(conn, b["comments_done"])
+            if b["refresh_failed"]:
+                refresh_queue.fail_many(conn, b["refresh_failed"], self.refresh_policy, now)
+            if b["checkpoint"]:
+                save_checkpoints_many(conn, b["checkpoint"])
+        elapsed = time.perf_counter() - t0
+
+        self.flushes += 1
+        self.flush_seconds_total += elapsed
+        if self.log_flushes:
+            print(
+                f"[WRITER] flush #{self.flushes}: posts={len(b['post'])} comments={len(b['comment'])} "
+                f"marks={len(b['comments_done'])} failed={len(b['refresh_failed'])} in {elapsed * 1000:.1f}ms "
+                f"({pending / max(elapsed, 1e-9):.0f} rows/s), queue={self.queue_depth}"
+            )
+        for op in _FLUSH_ORDER:
+            self.counts[op] += len(b[op])
+            b[op].clear()
+
+    def run(self) -> None:
+        conn = connect(self.db_path)
+        init_db(conn)
+        oldest: Optional[float] = None  # when the oldest buffered row arrived
+        try:
+            while True:
+                timeout = None
+                if oldest is not None:
+                    timeout = max(0.0, self.flush_seconds - (time.monotonic() - oldest))
+                try:
+                    op, payload = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    op, payload = None, None
+
+                if op is _STOP:
+                    break
+
+                if op == "sync":
+                    self._flush(conn)
+                    oldest = None
+                    payload.set()
+                    continue
+
+                if op == "call":
+                    fn, args, kwargs, fut = payload
+                    self._flush(conn)
+                    oldest = None
+                    try:
+                        fut.set_result(fn(conn, *args, **kwargs))
+                    except Exception as e:
+                        conn.rollback()
+                        fut.set_exception(e)
+                    continue
+
+                if op is not None:
+                    if op not in self._buffers:
+                        raise ValueError(f"unknown writer op {op!r}")
+                    self._buffers[op].append(payload)
+                    if oldest is None:
+                        oldest = time.monotonic()
+
+                if oldest is not None and (
+                    self._pending() >= self.flush_rows or time.monotonic() - oldest >= self.flush_seconds
+                ):
+                    self._flush(conn)
+                    oldest = None
+
+            self._flush(conn)
+        except BaseException as e:  # surfaced to producers via put()/close()
+            self.error = e
+            # drain so blocked producers don't hang on a full queue
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            conn.close()
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+from settings import Settings, load_settings
+from db import connect
+from export_csv import iter_chunks, now_utc_int
+
+DATASET_DIR = "comment_facts"
+
+# One row per comment, joined with everything the API would otherwise compute
+# with json_each() at request time. Sorted by (subreddit, created_utc) so every
+# (month, subreddit) partition arrives as one contiguous run and we only ever
+# hold a single open Parquet writer.
+COMMENT_FACTS_SQL = """
+SELECT
+  c.comment_id,
+  c.post_id,
+  c.subreddit,
+  strftime('%Y-%m', c.created_utc, 'unixepoch') AS month,
+  c.created_utc,
+  c.author,
+  c.score,
+  c.body,
+  c.permalink,
+  s.sentiment_label,
+  s.sentiment_score,
+  s.severity_score,
+  s.model_version AS sentiment_model_version,
+  e.cruise_line,
+  e.port_ids,
+  e.ship_ids,
+  e.confidence AS extraction_confidence,
+  (
+    SELECT json_group_array(json_array(t.theme_label, t.theme_score))
+    FROM (
+      SELECT theme_label, theme_score
+      FROM themes
+      WHERE object_type = 'comment' AND object_id = c.comment_id
+      ORDER BY theme_label
+    ) t
+  ) AS themes
+FROM comments c
+LEFT JOIN nlp_scores s
+  ON s.object_type = 'comment' AND s.object_id = c.comment_id
+LEFT JOIN extraction e
+  ON e.object_type = 'comment' AND e.object_id = c.comment_id
+ORDER BY c.subreddit, c.created_utc
+"""
+
+# JSON array columns that are decoded into native list<...> columns
+LIST_COLUMNS = ("port_ids", "ship_ids", "themes")
+
+
+def _schema():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("the analytics export needs the 'pyarrow' package (pip install pyarrow)") from e
+
+    return pa.schema([
+        ("comment_id", pa.string()),
+        ("post_id", pa.string()),
+        ("subreddit", pa.string()),
+        ("month", pa.string()),
+        ("created_utc", pa.int64()),
+        ("author", pa.string()),
+        ("score", pa.int64()),
+        ("body", pa.string()),
+        ("permalink", pa.string()),
+        ("sentiment_label", pa.string()),
+        ("sentiment_score", pa.float64()),
+        ("severity_score", pa.float64()),
+        ("sentiment_model_version", pa.string()),
+        ("cruise_line", pa.string()),
+        ("port_ids", pa.list_(pa.string())),
+        ("ship_ids", pa.list_(pa.string())),
+        ("extraction_confidence", pa.float64()),
+        ("themes", pa.list_(pa.string())),
+        ("theme_scores", pa.list_(pa.float64())),
+    ])
+
+
+def _decode_lists(row: Dict) -> Dict:
+    for col in LIST_COLUMNS:
+        raw = row[col]
+        row[col] = json.loads(raw) if raw else []
+    # themes come as [label, score] pairs so the two lists can't disagree on order
+    pairs = row.pop("themes")
+    row["themes"] = [label for label, _ in pairs]
+    row["theme_scores"] = [score for _, score in pairs]
+    return row
+
+
+def _partition_dir(root: str, month: Optional[str], subreddit: str) -> str:
+    # hive-style layout, readable by pyarrow.dataset / duckdb / spark as-is
+    return os.path.join(root, f"month={month or 'unknown'}", f"subreddit={subreddit}")
+
+
+def export_comment_facts(
+    conn,
+    settings: Settings,
+    out_dir: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    compression: str = "zstd",
+) -> Tuple[int, int]:
+    """
+    Writes the denormalized comment fact dataset as Parquet partitioned by
+    month and subreddit. The dataset is built next to the live one and swapped
+    in with a rename, so readers never see a half-written export.
+
+    Returns (rows, partitions).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema()
+    chunk_size = chunk_size or settings.export_chunk_size
+    root = out_dir or os.path.join(settings.export_dir, DATASET_DIR)
+    staging = f"{root}.tmp-{now_utc_int()}"
+    os.makedirs(staging, exist_ok=True)
+
+    cur = conn.cursor()
+    cur.execute(COMMENT_FACTS_SQL)
+    names = [d[0] for d in cur.description]
+
+    writer = None
+    current: Optional[Tuple[Optional[str], str]] = None
+    buffered: List[Dict] = []
+    rows = 0
+    partitions = 0
+
+    def flush() -> None:
+        if buffered:
+            writer.write_table(pa.Table.from_pylist(buffered, schema=schema))
+            buffered.clear()
+
+    try:
+        for chunk in iter_chunks(cur, chunk_size):
+            for raw in chunk:
+                row = _decode_lists(dict(zip(names, raw)))
+                key = (row["month"], row["subreddit"])
+
+                if key != current:
+                    if writer is not None:
+                        flush()
+                        writer.close()
+                    part_dir = _partition_dir(staging, *key)
+                    os.makedirs(part_dir, exist_ok=True)
+                    writer = pq.ParquetWriter(os.path.join(part_dir, "part-0.parquet"), schema, compression=compression)
+                    current = key
+                    partitions += 1
+
+                buffered.append(row)
+                rows += 1
+                if len(buffered) >= chunk_size:
+                    flush()
+        if writer is not None:
+            flush()
+            writer.close()
+            writer = None
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # atomic-ish swap: move the old dataset aside, rename staging into place
+    old = None
+    if os.path.exists(root):
+        old = f"{root}.old-{now_utc_int()}"
+        os.replace(root, old)
+    os.replace(staging, root)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+    return rows, partitions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Export the comment fact dataset (Parquet, partitioned by month/subreddit)")
+    ap.add_argument("--out", default=None, help="dataset root (default: $EXPORT_DIR/comment_facts)")
+    ap.add_argument("--compression", default="zstd", choices=["zstd", "snappy", "gzip", "none"])
+    args = ap.parse_args()
+
+    settings = load_settings()
+    conn = connect(settings.sqlite_path)
+
+    t0 = time.perf_counter()
+    rows, partitions = export_comment_facts(conn, settings, out_dir=args.out, compression=args.compression)
+    print(f"[EXPORT FACTS] rows={rows} partitions={partitions} in {time.perf_counter() - t0:.1f}s")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
+import argparse
 import csv
+import gzip
+import io
+import json
 import os
-from typing import Optional
-from settings import Settings
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from settings import Settings, load_settings
+from db import connect
 
 POST_FIELDS = [
     "post_id","subreddit","cruise_line_from_subreddit","created_utc","title","selftext",
@@ -12,49 +19,268 @@ COMMENT_FIELDS = [
     "comment_id","post_id","subreddit","created_utc","body","author","score","permalink","retrieved_at_utc"
 ]
 
+FORMATS = ("csv", "parquet", "arrow")
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+MANIFEST_FILE = "export_manifest.json"
+
+_EXT = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+_CSV_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def now_utc_int() -> int:
+    return int(datetime.now(tz=timezone.utc).timestamp())
+
+
+# ---------- manifest (incremental mode) ----------
+def load_manifest(export_dir: str) -> Dict[str, Dict]:
+    path = os.path.join(export_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(export_dir: str, manifest: Dict[str, Dict]) -> None:
+    # write-then-rename so a crash never leaves a half-written manifest
+    path = os.path.join(export_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ---------- helpers ----------
+def iter_chunks(cur, chunk_size: int) -> Iterable[List[Tuple]]:
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def output_path(export_dir: str, outfile: str, fmt: str, compression: str, part: Optional[int] = None) -> str:
+    """
+    posts.csv -> posts.csv / posts.csv.gz / posts.csv.zst / posts.parquet / posts.arrow
+    Columnar formats can't be appended to, so incremental runs write numbered parts:
+    posts.<watermark>.parquet
+    """
+    stem = os.path.splitext(outfile)[0]
+    if fmt == "csv":
+        return os.path.join(export_dir, stem + _EXT[fmt] + _CSV_SUFFIX[compression])
+    if part is not None:
+        return os.path.join(export_dir, f"{stem}.{part}{_EXT[fmt]}")
+    return os.path.join(export_dir, stem + _EXT[fmt])
+
+
+def _open_csv(path: str, compression: str, append: bool):
+    mode = "ab" if append else "wb"
+    if compression == "gzip":
+        # appending adds a new gzip member; readers treat the file as one stream
+        return gzip.open(path, mode[0] + "t", encoding="utf-8", newline="")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("zstd exports need the 'zstandard' package (pip install zstandard)") from e
+        raw = open(path, mode)
+        # each run is its own zstd frame; concatenated frames decode as one stream
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8", newline="")
+    return open(path, mode[0], newline="", encoding="utf-8")
+
+
+def _arrow_schema(conn, table: str, fields: Sequence[str]):
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("parquet/arrow exports need the 'pyarrow' package (pip install pyarrow)") from e
+
+    declared = {r[1]: (r[2] or "").upper() for r in conn.execute(f"PRAGMA table_info({table})")}
+    types = []
+    for f in fields:
+        t = declared.get(f, "")
+        if "INT" in t:
+            types.append(pa.field(f, pa.int64()))
+        elif "REAL" in t:
+            types.append(pa.field(f, pa.float64()))
+        else:
+            types.append(pa.field(f, pa.string()))
+    return pa.schema(types)
+
+
+def _write_csv(cur, path: str, fields: Sequence[str], compression: str, append: bool, chunk_size: int) -> int:
+    write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+    n = 0
+    with _open_csv(path, compression, append) as f:
+        w = csv.writer(f)
+        if write_header:
+            w.writerow(fields)
+        for rows in iter_chunks(cur, chunk_size):
+            w.writerows(rows)
+            n += len(rows)
+    return n
+
+
+def _write_columnar(cur, conn, table: str, path: str, fields: Sequence[str], fmt: str, compression: str, chunk_size: int) -> int:
+    import pyarrow as pa
+
+    schema = _arrow_schema(conn, table, fields)
+    codec = None if compression == "none" else compression
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema, compression=codec)
+    else:
+        if codec == "gzip":
+            raise ValueError("Arrow IPC supports zstd or none, not gzip")
+        options = pa.ipc.IpcWriteOptions(compression=codec)
+        writer = pa.ipc.new_file(path, schema, options=options)
+
+    n = 0
+    try:
+        for rows in iter_chunks(cur, chunk_size):
+            cols = list(zip(*rows))
+            batch = pa.record_batch([pa.array(c, type=schema.field(i).type) for i, c in enumerate(cols)], schema=schema)
+            if fmt == "parquet":
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            n += len(rows)
+    finally:
+        writer.close()
+    return n
+
+
+# ---------- exports ----------
+def export_table(
+    conn,
+    settings: Settings,
+    table: str,
+    fields: Sequence[str],
+    outfile: str,
+    subreddit: Optional[str] = None,
+    fmt: Optional[str] = None,
+    compression: Optional[str] = None,
+    incremental: Optional[bool] = None,
+    chunk_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> int:
+    """
+    Streams `table` to disk in fetchmany chunks.
+    With dry_run, only counts the rows that would be written.
+
+    The default is a full snapshot that replaces the file. Incremental mode (opt-in:
+    --incremental or EXPORT_INCREMENTAL=1) only writes rows whose retrieved_at_utc is
+    newer than the watermark stored in the export manifest. Re-ingested rows get a fresh
+    retrieved_at_utc, so the same id can appear more than once across runs:
+    downstream readers should keep the row with the highest retrieved_at_utc.
+    """
+    fmt = fmt or settings.export_format
+    compression = compression or settings.export_compression
+    incremental = settings.export_incremental if incremental is None else incremental
+    chunk_size = chunk_size or settings.export_chunk_size
+
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}, expected one of {FORMATS}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression {compression!r}, expected one of {COMPRESSIONS}")
 
-def export_posts(conn, settings: Settings, outfile: str, subreddit: Optional[str] = None) -> int:
     os.makedirs(settings.export_dir, exist_ok=True)
-    path = os.path.join(settings.export_dir, outfile)
-    cur = conn.cursor()
+    manifest = load_manifest(settings.export_dir)
+    # one watermark per output target, so csv and parquet exports don't reset each other
+    key = f"{outfile}:{fmt}:{compression}" + (f":{subreddit}" if subreddit else "")
+    prev = manifest.get(key)
+
+    # Capture the upper bound first so rows written while we export land in the next run.
+    # Rows stamped in the current second are left for the next run too (same bound as
+    # NLP/delta.py delta_high): ingestion may still write more with that stamp.
+    (high,) = conn.execute(f"SELECT MAX(retrieved_at_utc) FROM {table}").fetchone()
+    high = min(high or 0, now_utc_int() - 1)
+
+    low = None
+    if incremental and prev and os.path.exists(prev["path"]):
+        low = prev["retrieved_at_utc"]
 
+    where = []
+    params: List = []
     if subreddit:
-        cur.execute(
-            f"SELECT {','.join(POST_FIELDS)} FROM posts WHERE subreddit=? ORDER BY created_utc DESC",
-            (subreddit,),
-        )
+        where.append("subreddit=?")
+        params.append(subreddit)
+    if low is not None:
+        where.append("retrieved_at_utc > ? AND retrieved_at_utc <= ?")
+        params += [low, high]
     else:
-        cur.execute(f"SELECT {','.join(POST_FIELDS)} FROM posts ORDER BY created_utc DESC")
+        where.append("(retrieved_at_utc <= ? OR retrieved_at_utc IS NULL)")
+        params.append(high)
 
-    rows = cur.fetchall()
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(POST_FIELDS)
-        w.writerows(rows)
-    return len(rows)
+    sql = f"SELECT {','.join(fields)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
 
+    if dry_run:
+        (n,) = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()
+        return n
+
+    sql += " ORDER BY created_utc DESC"
 
-def export_comments(conn, settings: Settings, outfile: str, subreddit: Optional[str] = None) -> int:
-    os.makedirs(settings.export_dir, exist_ok=True)
-    path = os.path.join(settings.export_dir, outfile)
     cur = conn.cursor()
+    cur.execute(sql, params)
 
-    if subreddit:
-        cur.execute(
-            f"""
-            SELECT {','.join(COMMENT_FIELDS)}
-            FROM comments
-            WHERE subreddit=?
-            ORDER BY created_utc DESC
-            """,
-            (subreddit,),
-        )
+    if fmt == "csv":
+        path = output_path(settings.export_dir, outfile, fmt, compression)
+        n = _write_csv(cur, path, fields, compression, append=low is not None, chunk_size=chunk_size)
+        base_path = path
     else:
-        cur.execute(f"SELECT {','.join(COMMENT_FIELDS)} FROM comments ORDER BY created_utc DESC")
+        part = high if low is not None else None
+        path = output_path(settings.export_dir, outfile, fmt, compression, part=part)
+        n = _write_columnar(cur, conn, table, path, fields, fmt, compression, chunk_size)
+        if low is not None and n == 0:
+            os.remove(path)
+        base_path = prev["path"] if low is not None else path
 
-    rows = cur.fetchall()
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(COMMENT_FIELDS)
-        w.writerows(rows)
-    return len(rows)
+    manifest[key] = {
+        "path": base_path,
+        "format": fmt,
+        "compression": compression,
+        "retrieved_at_utc": high,
+        "rows_last_run": n,
+        "incremental": low is not None,
+        "exported_at_utc": now_utc_int(),
+    }
+    save_manifest(settings.export_dir, manifest)
+    return n
+
+
+def export_posts(conn, settings: Settings, outfile: str, subreddit: Optional[str] = None, **kwargs) -> int:
+    return export_table(conn, settings, "posts", POST_FIELDS, outfile, subreddit=subreddit, **kwargs)
+
+
+def export_comments(conn, settings: Settings, outfile: str, subreddit: Optional[str] = None, **kwargs) -> int:
+    return export_table(conn, settings, "comments", COMMENT_FIELDS, outfile, subreddit=subreddit, **kwargs)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Export posts/comments from the SQLite database")
+    ap.add_argument("--format", choices=FORMATS, default=None)
+    ap.add_argument("--compression", choices=COMPRESSIONS, default=None)
+    ap.add_argument("--subreddit", default=None)
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--incremental", dest="incremental", action="store_true", default=None)
+    mode.add_argument("--full", dest="incremental", action="store_false")
+    ap.add_argument("--dry-run", action="store_true", help="only count the rows that would be exported")
+    args = ap.parse_args()
+
+    settings = load_settings()
+    conn = connect(settings.sqlite_path)
+    kwargs = dict(subreddit=args.subreddit, fmt=args.format, compression=args.compression,
+                  incremental=args.incremental, dry_run=args.dry_run)
+
+    pcount = export_posts(conn, settings, "posts.csv", **kwargs)
+    ccount = export_comments(conn, settings, "comments.csv", **kwargs)
+    note = " (dry run)" if args.dry_run else ""
+    print(f"[EXPORT] {settings.export_dir}: posts rows={pcount}, comments rows={ccount}{note}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
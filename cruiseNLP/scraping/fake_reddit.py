@@ -0,0 +1,256 @@
+"""
+Local stand-in for the parts of the Reddit API that ingestion uses:
+OAuth token, subreddit listings (new/hot/rising/top) and comment trees.
+
+Run it, then point the ingester at it:
+
+  python fake_reddit.py --port 8765 --posts 500 --comments 30
+  REDDIT_OAUTH_URL=http://127.0.0.1:8765 REDDIT_URL=http://127.0.0.1:8765 \
+  REDDIT_CLIENT_ID=fake REDDIT_CLIENT_SECRET=fake SQLITE_PATH=/tmp/fake.db \
+  python run_ingest.py
+
+Responses carry X-Ratelimit-* headers from a simulated 600s window so the
+shared TokenBucket can be exercised without touching reddit.com.
+
+With --fixture, GETs are answered from a recording made with
+REDDIT_RECORD_PATH (see recording.py) instead of the synthetic corpus;
+requests that weren't recorded get a 404.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from recording import fixture_key, load_fixture
+
+BASE_UTC = 1735689600  # 2025-01-01
+
+WORDS = (
+    "cozumel nassau roatan labadee cabo ship cabin buffet food crew embarkation line "
+    "excursion beach pool balcony sea day port tender weather itinerary great awful "
+    "loved terrible service refund drinks package wifi crowded"
+).split()
+
+
+class FakeRedditState:
+    """Deterministic synthetic corpus plus a simulated rate-limit window."""
+
+    def __init__(self, posts_per_sub: int, comments_per_post: int, budget: int, window: float,
+                 latency_ms: float = 0.0, seed: int = 7, fixture: Optional[Dict[str, Dict]] = None):
+        self.posts_per_sub = posts_per_sub
+        self.comments_per_post = comments_per_post
+        self.budget = budget
+        self.window = window
+        self.latency_ms = latency_ms
+        self.seed = seed
+        self.fixture = fixture
+        self.requests = 0
+        self.fixture_misses = 0
+        self._window_start = time.monotonic()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    # ---- rate limit ----
+    def charge(self) -> Dict[str, str]:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._used = 0
+            self._used += 1
+            self.requests += 1
+            remaining = max(0, self.budget - self._used)
+            reset = max(0, int(self.window - (now - self._window_start)))
+            return {
+                "x-ratelimit-used": str(self._used),
+                "x-ratelimit-remaining": str(remaining),
+                "x-ratelimit-reset": str(reset),
+            }
+
+    # ---- data ----
+    def _text(self, rng: random.Random, n: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    @staticmethod
+    def prefix(subreddit: str) -> str:
+        return format(zlib.crc32(subreddit.lower().encode("utf-8")), "08x")[:6]
+
+    def post_ids(self, subreddit: str) -> List[str]:
+        return [f"{self.prefix(subreddit)}{i:05d}" for i in range(self.posts_per_sub)]
+
+    def post(self, post_id: str, subreddit: str) -> Dict:
+        rng = random.Random(f"{self.seed}:{post_id}")
+        created = BASE_UTC + rng.randint(0, 365 * 86400)
+        return {
+            "id": post_id,
+            "name": f"t3_{post_id}",
+            "subreddit": subreddit,
+            "subreddit_name_prefixed": f"r/{subreddit}",
+            "title": self._text(rng, 8),
+            "selftext": self._text(rng, 40),
+            "author": f"user{rng.randint(1, 5000)}",
+            "score": rng.randint(0, 500),
+            "num_comments": self.comments_per_post,
+            "created_utc": float(created),
+            "url": f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/",
+            "permalink": f"/r/{subreddit}/comments/{post_id}/",
+            "over_18": False,
+            "is_self": True,
+            "link_flair_text": rng.choice([None, "Trip Report", "Question"]),
+        }
+
+    def comments(self, post_id: str, subreddit: str) -> List[Dict]:
+        rng = random.Random(f"{self.seed}:{post_id}:c")
+        out = []
+        for i in range(self.comments_per_post):
+            cid = f"{post_id}c{i:04d}"
+            out.append({
+                "kind": "t1",
+                "data": {
+                    "id": cid,
+                    "name": f"t1_{cid}",
+                    "parent_id": f"t3_{post_id}",
+                    "link_id": f"t3_{post_id}",
+                    "subreddit": subreddit,
+                    "body": self._text(rng, 25),
+                    "author": f"user{rng.randint(1, 5000)}",
+                    "score": rng.randint(-5, 200),
+                    "created_utc": float(BASE_UTC + rng.randint(0, 365 * 86400)),
+                    "permalink": f"/r/{subreddit}/comments/{post_id}/_/{cid}/",
+                    "replies": "",
+                    "depth": 0,
+                },
+            })
+        return out
+
+    # subreddit lookup for /comments/<id>: ids are prefixed with a hash of the subreddit
+    def subreddit_for(self, post_id: str, known: List[str]) -> str:
+        for s in known:
+            if post_id.startswith(self.prefix(s)):
+                return s
+        return known[0] if known else "Cruise"
+
+
+def listing(children: List[Dict], after: Optional[str]) -> Dict:
+    return {"kind": "Listing", "data": {"after": after, "before": None, "dist": len(children), "children": children}}
+
+
+def make_handler(state: FakeRedditState, subreddits: List[str]):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # keep benchmark output clean
+            pass
+
+        def _send(self, status: int, body: object) -> None:
+            self._send_raw(status, json.dumps(body).encode("utf-8"))
+
+        def _send_raw(self, status: int, payload: bytes) -> None:
+            if state.latency_ms:
+                time.sleep(state.latency_ms / 1000.0)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for k, v in state.charge().items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            if urlparse(self.path).path.rstrip("/") == "/api/v1/access_token":
+                self._send(200, {"access_token": "fake-token", "token_type": "bearer",
+                                 "expires_in": 86400, "scope": "*"})
+            else:
+                self._send(404, {"error": 404})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            parts = [p for p in url.path.replace(".json", "").split("/") if p]
+
+            if state.fixture is not None:
+                hit = state.fixture.get(fixture_key("GET", url.path, q))
+                if hit is None:
+                    state.fixture_misses += 1
+                    self._send(404, {"error": 404, "message": "not in fixture"})
+                else:
+                    self._send_raw(hit["status"], hit["body"].encode("utf-8"))
+                return
+
+            # /r/<sub>/<listing>
+            if len(parts) >= 3 and parts[0] == "r" and parts[2] in ("new", "hot", "rising", "top"):
+                self._send(200, self._listing(parts[1], parts[2], q))
+                return
+            # /comments/<id>
+            if len(parts) >= 2 and parts[0] == "comments":
+                post_id = parts[1]
+                sub = state.subreddit_for(post_id, subreddits)
+                post = {"kind": "t3", "data": state.post(post_id, sub)}
+                self._send(200, [listing([post], None), listing(state.comments(post_id, sub), None)])
+                return
+            self._send(404, {"error": 404})
+
+        def _listing(self, sub: str, kind: str, q: Dict[str, str]) -> Dict:
+            ids = state.post_ids(sub)
+            if kind == "rising":
+                ids = ids[: max(1, len(ids) // 10)]
+            elif kind == "top":
+                window = {"day": 0.05, "week": 0.2, "month": 0.5, "year": 0.9}.get(q.get("t", "all"), 1.0)
+                ids = ids[: max(1, int(len(ids) * window))]
+
+            limit = min(100, int(q.get("limit", 25)))
+            start = 0
+            after = q.get("after")
+            if after:
+                pid = after.split("_", 1)[-1]
+                start = ids.index(pid) + 1 if pid in ids else len(ids)
+            page = ids[start:start + limit]
+            next_after = f"t3_{page[-1]}" if page and start + limit < len(ids) else None
+            return listing([{"kind": "t3", "data": state.post(pid, sub)} for pid in page], next_after)
+
+    return Handler
+
+
+def serve(host: str, port: int, state: FakeRedditState, subreddits: List[str]) -> ThreadingHTTPServer:
+    """Starts the server on a background thread; port=0 picks a free one (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), make_handler(state, subreddits))
+    threading.Thread(target=server.serve_forever, name="fake-reddit", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    from settings import load_settings
+
+    ap = argparse.ArgumentParser(description="Local fake Reddit API for ingestion tests")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--posts", type=int, default=300, help="posts per subreddit")
+    ap.add_argument("--comments", type=int, default=20, help="comments per post")
+    ap.add_argument("--budget", type=int, default=600, help="requests per rate-limit window")
+    ap.add_argument("--window", type=float, default=600.0, help="rate-limit window in seconds")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--fixture", default=None, help="replay a recorded .jsonl.gz instead of synthetic data")
+    args = ap.parse_args()
+
+    fixture = load_fixture(args.fixture) if args.fixture else None
+    if fixture is not None:
+        print(f"[FAKE REDDIT] replaying {len(fixture)} recorded responses from {args.fixture}")
+    state = FakeRedditState(args.posts, args.comments, args.budget, args.window, args.latency_ms, fixture=fixture)
+    server = serve(args.host, args.port, state, list(load_settings().subreddits))
+    print(f"[FAKE REDDIT] listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterable, List, Tuple
 
 import praw
 from praw.models import Submission, Comment
 
 from settings import Settings
-from db import upsert_comment, mark_comments_ingested
+from db_writer import DBWriter
 
 
 def now_utc_int() -> int:
@@ -31,24 +34,123 @@ def comment_to_row(c: Comment, post_id: str, subreddit_name: str) -> Dict:
     }
 
 
-def ingest_comments_for_post(conn, reddit: praw.Reddit, post_id: str, settings: Settings) -> Tuple[int, int]:
+def fetch_comment_rows(reddit: praw.Reddit, post_id: str, settings: Settings) -> List[Dict]:
+    """Network half of comment ingestion: fetch + flatten the tree, no DB access."""
     submission: Submission = reddit.submission(id=post_id)
     subreddit_name = str(submission.subreddit.display_name)
 
     # Expand "MoreComments" safely
     submission.comments.replace_more(limit=settings.replace_more_limit)
 
-    count = 0
+    rows: List[Dict] = []
     for c in submission.comments.list():
         if not hasattr(c, "id"):
             continue
-        upsert_comment(conn, comment_to_row(c, post_id, subreddit_name))
-        count += 1
-        if count >= settings.max_comments_per_post:
+        rows.append(comment_to_row(c, post_id, subreddit_name))
+        if len(rows) >= settings.max_comments_per_post:
             break
+    return rows
+
+
+def ingest_comments_for_post(writer: DBWriter, reddit: praw.Reddit, post_id: str, settings: Settings) -> Tuple[int, int]:
+    rows = fetch_comment_rows(reddit, post_id, settings)
+    for row in rows:
+        writer.put_comment(row)
 
     ingested_at = now_utc_int()
-    mark_comments_ingested(conn, post_id, ingested_at, count)
-    conn.commit()
+    writer.put_comments_done(post_id, ingested_at, len(rows))
+
+    return len(rows), ingested_at
+
+
+class ThroughputReporter(threading.Thread):
+    """Prints posts/min, comments/min and queue depths every `every` seconds."""
+
+    def __init__(self, writer: DBWriter, in_flight: Callable[[], int], every: float):
+        super().__init__(name="comments-progress", daemon=True)
+        self.writer = writer
+        self.in_flight = in_flight
+        self.every = every
+        self.posts = 0
+        self.comments = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def record(self, comments: int) -> None:
+        with self._lock:
+            self.posts += 1
+            self.comments += comments
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def report(self) -> None:
+        minutes = max(time.monotonic() - self.started, 1e-6) / 60.0
+        print(
+            f"[COMMENTS] posts={self.posts} ({self.posts / minutes:.0f}/min) "
+            f"comments={self.comments} ({self.comments / minutes:.0f}/min) "
+            f"failed={self.failed} in_flight={self.in_flight()} writer_queue={self.writer.queue_depth}"
+        )
+
+    def run(self) -> None:
+        while not self._done.wait(self.every):
+            self.report()
+
+    def stop(self) -> None:
+        self._done.set()
+
+
+def ingest_comments_concurrently(
+    writer: DBWriter,
+    get_reddit: Callable[[], praw.Reddit],
+    post_ids: Iterable[str],
+    settings: Settings,
+) -> Tuple[int, int]:
+    """
+    Fetches comment trees on a bounded pool of `settings.comment_workers` threads.
+    At most 2x workers posts are in flight, so a huge backlog iterator is never
+    materialized. Rows go to the writer thread as each tree completes; the
+    shared rate limiter (inside each client) keeps the pool within budget.
+
+    Returns (posts_processed, comments_upserted).
+    """
+    workers = max(1, settings.comment_workers)
+    max_in_flight = workers * 2
+    in_flight: Dict = {}
+
+    reporter = ThroughputReporter(writer, lambda: len(in_flight), settings.progress_every_seconds)
+    reporter.start()
+
+    def work(post_id: str) -> int:
+        count, _ = ingest_comments_for_post(writer, get_reddit(), post_id, settings)
+        if settings.sleep_seconds_between_posts:
+            time.sleep(settings.sleep_seconds_between_posts)
+        return count
+
+    def reap(done) -> None:
+        for fut in done:
+            post_id = in_flight.pop(fut)
+            try:
+                reporter.record(fut.result())
+            except Exception as e:
+                reporter.record_failure()
+                writer.put_refresh_failed(post_id, str(e))  # backs off in the refresh queue
+                print(f"[WARN] comments failed for post {post_id}: {e}")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="comments") as pool:
+        for post_id in post_ids:
+            while len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                reap(done)
+            in_flight[pool.submit(work, post_id)] = post_id
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            reap(done)
 
-    return count, ingested_at
+    reporter.stop()
+    reporter.report()
+    return reporter.posts, reporter.comments
@@ -1,11 +1,29 @@
+import hashlib
+import threading
 from datetime import datetime, timezone
-from typing import Dict, Iterable
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import praw
 from praw.models import Submission
 
 from settings import Settings
-from db import upsert_post
+from db import connect, load_post_hashes
+from db_writer import DBWriter
+from checkpoints import Checkpoint
+
+# (listing, time_filter) pairs pulled for every subreddit:
+#   - new/hot/rising (recency + discovery)
+#   - top() across time windows (historical sampling)
+LISTINGS: List[Tuple[str, Optional[str]]] = [
+    ("new", None),
+    ("hot", None),
+    ("rising", None),
+    ("top", "day"),
+    ("top", "week"),
+    ("top", "month"),
+    ("top", "year"),
+    ("top", "all"),
+]
 
 
 def now_utc_int() -> int:
@@ -38,41 +56,191 @@ def submission_to_row(sub: Submission, subreddit_name: str, line_label: str) ->
     }
 
 
+HASHED_FIELDS = ("score", "num_comments", "selftext", "link_flair_text")
+
+
+def post_content_hash(row: Dict) -> str:
+    """Fingerprint of the fields that change after a post is created."""
+    raw = "\x1f".join("" if row[f] is None else str(row[f]) for f in HASHED_FIELDS)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def listing_name(listing: str, time_filter: Optional[str]) -> str:
+    return f"{listing}({time_filter})" if time_filter else listing
+
+
+# Reddit listing page size; checkpoints are written once per page
+PAGE_SIZE = 100
+
+
+def iter_listing(
+    sr: praw.models.Subreddit,
+    listing: str,
+    time_filter: Optional[str],
+    per_limit: int,
+    after: Optional[str] = None,
+) -> Iterable[Submission]:
+    """`after` (a t3_ fullname) starts the listing right after that post."""
+    kwargs = {"limit": per_limit}
+    if after:
+        kwargs["params"] = {"after": after}
+    if listing == "top":
+        return sr.top(time_filter=time_filter, **kwargs)
+    return getattr(sr, listing)(**kwargs)
+
+
 def iter_listings(sr: praw.models.Subreddit, per_limit: int) -> Iterable[Submission]:
     """
-    Max accessible coverage without pretending you can infinite-page:
-      - new/hot/rising (recency + discovery)
-      - top() across time windows (historical sampling)
+    Max accessible coverage without pretending you can infinite-page.
     """
-    yield from sr.new(limit=per_limit)
-    yield from sr.hot(limit=per_limit)
-    yield from sr.rising(limit=per_limit)
+    for listing, time_filter in LISTINGS:
+        yield from iter_listing(sr, listing, time_filter, per_limit)
 
-    for t in ["day", "week", "month", "year", "all"]:
-        yield from sr.top(time_filter=t, limit=per_limit)
 
+class StoredHashes:
+    """
+    content_hash of every stored post, loaded once per subreddit per run and
+    shared by all listing workers. Updated as we write so later listings in
+    the same run see this run's versions.
+    """
 
-def ingest_subreddit_posts(conn, reddit: praw.Reddit, subreddit_name: str, line_label: str, settings: Settings) -> int:
-    sr = reddit.subreddit(subreddit_name)
-    seen_ids = set()
-    kept = 0
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._by_sub: Dict[str, Dict[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _for(self, subreddit: str) -> Dict[str, Optional[str]]:
+        with self._lock:
+            hashes = self._by_sub.get(subreddit)
+            if hashes is None:
+                conn = connect(self.db_path)
+                try:
+                    hashes = load_post_hashes(conn, subreddit)
+                finally:
+                    conn.close()
+                self._by_sub[subreddit] = hashes
+            return hashes
+
+    def unchanged(self, subreddit: str, post_id: str, content_hash: str) -> bool:
+        return self._for(subreddit).get(post_id) == content_hash
+
+    def update(self, subreddit: str, post_id: str, content_hash: str) -> None:
+        hashes = self._for(subreddit)
+        with self._lock:
+            hashes[post_id] = content_hash
+
+
+class SeenIds:
+    """Run-wide, thread-safe dedup of post ids across listings (and subreddits)."""
+
+    def __init__(self):
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def add(self, post_id: str) -> bool:
+        """True if the id was new."""
+        with self._lock:
+            if post_id in self._ids:
+                return False
+            self._ids.add(post_id)
+            return True
+
+
+def ingest_listing(
+    writer: DBWriter,
+    reddit: praw.Reddit,
+    subreddit_name: str,
+    line_label: str,
+    listing: str,
+    time_filter: Optional[str],
+    settings: Settings,
+    seen: SeenIds,
+    stored: StoredHashes,
+    run_id: Optional[int] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> int:
+    """
+    Pulls one listing of one subreddit and queues new or changed posts on the writer.
 
-    print(f"\n[POSTS] r/{subreddit_name}: collecting (limit per listing={settings.per_listing_limit})")
+    Posts whose content_hash matches the stored row are not rewritten. After
+    `listing_stop_after_unchanged` of those in a row we stop paging: the rest
+    of the listing is almost certainly already stored and unchanged, and since
+    PRAW fetches pages lazily this also saves the API calls.
 
-    for idx, sub in enumerate(iter_listings(sr, settings.per_listing_limit), start=1):
+    With a `run_id`, the listing cursor is checkpointed through the writer once
+    per page, and a `checkpoint` from an interrupted run resumes after its cursor.
+    """
+    name = listing_name(listing, time_filter)
+    if checkpoint is not None and checkpoint.done:
+        print(f"[POSTS] r/{subreddit_name} {name}: already finished by this run, skipping")
+        return 0
+
+    sr = reddit.subreddit(subreddit_name)
+    after = checkpoint.after_fullname if checkpoint else None
+    items = checkpoint.items_seen if checkpoint else 0
+    kept = checkpoint.posts_written if checkpoint else 0
+    resumed_at = items
+    unchanged = 0
+    streak = 0
+    stop_after = settings.listing_stop_after_unchanged
+    stopped_early = False
+
+    def save(done: bool) -> None:
+        if run_id is not None:
+            writer.put_checkpoint(run_id, subreddit_name, name, after, items, kept, done)
+
+    limit = max(0, settings.per_listing_limit - items)
+    for sub in iter_listing(sr, listing, time_filter, limit, after=after):
         if not getattr(sub, "id", None):
             continue
-        if sub.id in seen_ids:
+        if items and items % PAGE_SIZE == 0:
+            save(done=False)  # cursor of the previous item: queued after its post, so it commits with it
+        items += 1
+        after = getattr(sub, "name", None) or f"t3_{sub.id}"
+        if not seen.add(sub.id):
             continue
-        seen_ids.add(sub.id)
 
-        upsert_post(conn, submission_to_row(sub, subreddit_name, line_label))
+        row = submission_to_row(sub, subreddit_name, line_label)
+        row["content_hash"] = post_content_hash(row)
+
+        if stored.unchanged(subreddit_name, sub.id, row["content_hash"]):
+            unchanged += 1
+            streak += 1
+            if stop_after and streak >= stop_after:
+                stopped_early = True
+                break
+            continue
+
+        streak = 0
+        writer.put_post(row)
+        stored.update(subreddit_name, sub.id, row["content_hash"])
         kept += 1
 
-        if idx % 200 == 0:
-            conn.commit()
-            print(f"  collected {kept} unique posts so far...")
+    save(done=True)
+    note = " (stopped early: unchanged run)" if stopped_early else ""
+    if resumed_at:
+        note += f" (resumed after {resumed_at} items)"
+    print(f"[POSTS] r/{subreddit_name} {name}: {kept} written, {unchanged} unchanged{note}")
+    return kept - (checkpoint.posts_written if checkpoint else 0)
+
+
+def ingest_subreddit_posts(
+    writer: DBWriter,
+    reddit: praw.Reddit,
+    subreddit_name: str,
+    line_label: str,
+    settings: Settings,
+    seen: Optional[SeenIds] = None,
+    stored: Optional[StoredHashes] = None,
+) -> int:
+    """All listings of one subreddit, one after another (run_ingest fans them out instead)."""
+    seen = seen or SeenIds()
+    stored = stored or StoredHashes(settings.sqlite_path)
+    kept = 0
+
+    print(f"\n[POSTS] r/{subreddit_name}: collecting (limit per listing={settings.per_listing_limit})")
+    for listing, time_filter in LISTINGS:
+        kept += ingest_listing(writer, reddit, subreddit_name, line_label, listing, time_filter, settings, seen, stored)
 
-    conn.commit()
     print(f"[POSTS] r/{subreddit_name}: done. unique posts this run: {kept}")
     return kept
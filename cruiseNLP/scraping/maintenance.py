@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Database upkeep for the WAL-mode cruise_reddit.db:
+#   - checkpoint: copy the WAL back into the main file and cap the -wal file
+#     (journal_size_limit), so long ingest / backfill runs don't grow it forever
+#   - stats:      ANALYZE (sampled via analysis_limit) + PRAGMA optimize, so the
+#     planner has sqlite_stat1 to pick between e.g. idx_themes_label and idx_themes_object
+#   - reclaim:    incremental_vacuum on databases created with auto_vacuum=INCREMENTAL
+#     (db.SCHEMA sets it; older files switch over with a one-off --vacuum)
+#
+# Writers call at_stage_boundary() between stages (cheap: PASSIVE checkpoint,
+# bounded reclaim); full() adds a TRUNCATE checkpoint and a stats refresh and
+# runs at the end of pipeline.py or standalone:
+#   python maintenance.py [--full] [--vacuum] [--json]      (from scraping/)
+#
+# Only stdlib imports here: this module is imported both as `maintenance`
+# (scripts in scraping/) and as `scraping.maintenance` (NLP/, pipeline.py).
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+@dataclass(frozen=True)
+class MaintenancePolicy:
+    wal_size_limit_bytes: int = 64 * 1024 * 1024  # the -wal file is truncated back to this after a checkpoint
+    checkpoint_timeout_seconds: float = 5.0       # longest a FULL/RESTART/TRUNCATE checkpoint waits on others
+    analysis_limit: int = 2000                    # rows ANALYZE samples per index (0 = read everything)
+    vacuum_pages: int = 10000                     # free pages released per at_stage_boundary (0 = none)
+
+
+def policy_from_settings(settings) -> MaintenancePolicy:
+    return MaintenancePolicy(
+        wal_size_limit_bytes=settings.maint_wal_limit_mb * 1024 * 1024,
+        checkpoint_timeout_seconds=settings.maint_checkpoint_timeout_seconds,
+        analysis_limit=settings.maint_analysis_limit,
+        vacuum_pages=settings.maint_vacuum_pages,
+    )
+
+
+def db_sizes(conn: sqlite3.Connection) -> Dict[str, int]:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    path = next((r[2] for r in conn.execute("PRAGMA database_list") if r[1] == "main"), "")
+    wal = path + "-wal"
+    return {
+        "db_bytes": page_size * page_count,
+        "free_bytes": page_size * free_pages,
+        "wal_bytes": os.path.getsize(wal) if path and os.path.exists(wal) else 0,
+    }
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1e6:.1f}MB"
+
+
+def checkpoint(conn: sqlite3.Connection, mode: str, policy: MaintenancePolicy) -> Dict[str, Any]:
+    """
+    PASSIVE never waits: it copies whatever frames no reader still needs. The
+    other modes wait for readers / writers, but no longer than
+    checkpoint_timeout_seconds (busy_timeout), then report busy=1.
+    """
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"checkpoint mode must be one of {CHECKPOINT_MODES}, got {mode!r}")
+    conn.commit()  # a checkpoint can't run inside our own open transaction
+    prev_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    conn.execute(f"PRAGMA journal_size_limit={int(policy.wal_size_limit_bytes)}")
+    conn.execute(f"PRAGMA busy_timeout={int(policy.checkpoint_timeout_seconds * 1000)}")
+    try:
+        busy, wal_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        conn.execute(f"PRAGMA busy_timeout={prev_timeout}")
+    return {"mode": mode, "busy": busy, "wal_frames": wal_frames, "checkpointed_frames": checkpointed}
+
+
+def refresh_stats(conn: sqlite3.Connection, policy: MaintenancePolicy) -> Dict[str, Any]:
+    conn.execute(f"PRAGMA analysis_limit={int(policy.analysis_limit)}")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+    (stat_rows,) = conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()
+    return {"analysis_limit": policy.analysis_limit, "stat_rows": stat_rows}
+
+
+def reclaim(conn: sqlite3.Connection, max_pages: int, convert: bool = False) -> Dict[str, Any]:
+    """
+    Releases up to max_pages free pages (0 = all) with incremental_vacuum. A
+    database without auto_vacuum=INCREMENTAL can't do that; with convert=True it
+    is switched over by a full VACUUM (rewrites the file, needs exclusive access).
+    """
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]  # 0 none, 1 full, 2 incremental
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    out: Dict[str, Any] = {"auto_vacuum": ("none", "full", "incremental")[auto_vacuum], "free_pages_before": free_before}
+    if auto_vacuum != 2 and convert:
+        conn.commit()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        out["converted"] = True
+    elif auto_vacuum == 2 and free_before:
+        # execute() steps the pragma once (one page); executescript runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+    out["free_pages_after"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return out
+
+
+def run(
+    conn: sqlite3.Connection,
+    label: str,
+    policy: MaintenancePolicy,
+    checkpoint_mode: Optional[str] = "PASSIVE",
+    analyze: bool = False,
+    vacuum_pages: Optional[int] = None,
+    convert: bool = False,
+) -> Dict[str, Any]:
+    """Runs the requested operations in order, timing each one. Returns sizes and per-operation results."""
+    before = db_sizes(conn)
+    ops: Dict[str, Dict[str, Any]] = {}
+
+    def timed(name: str, fn) -> None:
+        t0 = time.perf_counter()
+        result = fn()
+        result["seconds"] = round(time.perf_counter() - t0, 3)
+        ops[name] = result
+
+    if vacuum_pages is not None or convert:
+        timed("reclaim", lambda: reclaim(conn, vacuum_pages or 0, convert))
+    if analyze:
+        timed("stats", lambda: refresh_stats(conn, policy))
+    if checkpoint_mode:
+        # last, so it also moves the pages written by the steps above out of the WAL
+        timed("checkpoint", lambda: checkpoint(conn, checkpoint_mode, policy))
+    after = db_sizes(conn)
+
+    for name, r in ops.items():
+        if name == "checkpoint":
+            detail = (f"{r['mode']} {r['checkpointed_frames']}/{r['wal_frames']} frames"
+                      f"{' (busy)' if r['busy'] else ''}, wal {_mb(before['wal_bytes'])} -> {_mb(after['wal_bytes'])}")
+        elif name == "stats":
+            detail = f"{r['stat_rows']} sqlite_stat1 rows (analysis_limit={r['analysis_limit']})"
+        else:
+            detail = (f"auto_vacuum={r['auto_vacuum']}{' -> incremental' if r.get('converted') else ''}, "
+                      f"free pages {r['free_pages_before']} -> {r['free_pages_after']}")
+        print(f"[MAINT] {label}: {name} {r['seconds']:.2f}s  {detail}")
+    print(f"[MAINT] {label}: db {_mb(before['db_bytes'])} -> {_mb(after['db_bytes'])}, "
+          f"free {_mb(after['free_bytes'])}, wal {_mb(after['wal_bytes'])}")
+    return {"label": label, "before": before, "after": after, "ops": ops}
+
+
+def at_stage_boundary(conn: sqlite3.Connection, label: str, policy: MaintenancePolicy) -> Dict[str, Any]:
+    """Cheap enough for between stages: a PASSIVE checkpoint and a bounded reclaim."""
+    return run(conn, label, policy, "PASSIVE", analyze=False,
+               vacuum_pages=policy.vacuum_pages if policy.vacuum_pages > 0 else None)
+
+
+def full(conn: sqlite3.Connection, label: str, policy: MaintenancePolicy) -> Dict[str, Any]:
+    """End of a run: reclaim every free page, refresh stats, TRUNCATE checkpoint (bounded wait)."""
+    return run(conn, label, policy, "TRUNCATE", analyze=True, vacuum_pages=0)
+
+
+def main() -> None:
+    import argparse
+
+    # run as a script from scraping/, like the other entry points here
+    from settings import load_settings
+    from db import connect
+
+    settings = load_settings()
+    ap = argparse.ArgumentParser(description="Checkpoint, analyze and vacuum cruise_reddit.db")
+    ap.add_argument("--db", default=settings.sqlite_path)
+    ap.add_argument("--full", action="store_true", help="TRUNCATE checkpoint + stats refresh + reclaim all free pages")
+    ap.add_argument("--checkpoint", default=None, choices=[m.lower() for m in CHECKPOINT_MODES],
+                    help="checkpoint mode (default passive, truncate with --full)")
+    ap.add_argument("--vacuum", action="store_true",
+                    help="switch a database without incremental auto_vacuum over (full VACUUM, needs exclusive access)")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+
+    policy = policy_from_settings(settings)
+    conn = connect(args.db)
+    try:
+        if args.full:
+            report = run(conn, "standalone", policy, args.checkpoint or "TRUNCATE", analyze=True,
+                         vacuum_pages=0, convert=args.vacuum)
+        else:
+            report = run(conn, "standalone", policy, args.checkpoint or "PASSIVE",
+                         vacuum_pages=policy.vacuum_pages, convert=args.vacuum)
+    finally:
+        conn.close()
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
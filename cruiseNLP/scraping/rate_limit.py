@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Any, Mapping, Optional
+
+import prawcore
+
+
+class TokenBucket:
+    """
+    One request budget shared by every Reddit client in the process.
+
+    Tokens refill at `rate_per_minute`. Reddit's X-Ratelimit-* response headers
+    can only lower that: when few requests remain in the current window we slow
+    down to spread them over the time left, and when none remain we pause until
+    the window resets.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        self.base_rate = max(rate_per_minute, 1e-6) / 60.0   # tokens per second
+        self.rate = self.base_rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_minute // 6)))
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self.waited_seconds = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        """Blocks until a token is available. Returns seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.waited_seconds += waited
+                    return waited
+                else:
+                    delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def observe_headers(self, headers: Mapping[str, Any]) -> None:
+        try:
+            remaining = float(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining < 1.0:
+                self.paused_until = max(self.paused_until, now + reset)
+                self.tokens = 0.0
+                return
+            # never spend faster than the server-side window allows
+            self.rate = min(self.base_rate, remaining / max(reset, 1.0))
+            self.tokens = min(self.tokens, remaining)
+
+
+class RateLimitedRequestor(prawcore.Requestor):
+    """prawcore requestor that charges every HTTP call (token fetches included) to a shared TokenBucket."""
+
+    def __init__(self, *args: Any, limiter: Optional[TokenBucket] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def request(self, *args: Any, **kwargs: Any):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        response = super().request(*args, **kwargs)
+        if self.limiter is not None:
+            self.limiter.observe_headers(response.headers)
+        return response
@@ -0,0 +1,107 @@
+import atexit
+import gzip
+import json
+import threading
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+from rate_limit import RateLimitedRequestor
+
+# Record/replay of Reddit API responses.
+#
+# Set REDDIT_RECORD_PATH=fixtures/cruise.jsonl.gz and every response PRAW gets
+# (listings, comment trees, morechildren) is appended to that file as one JSON
+# line: {"key": ..., "status": ..., "body": ...}. fake_reddit.py --fixture
+# serves the same file back, so ingestion can be re-run and benchmarked offline.
+
+# Query params that don't change what Reddit returns
+_IGNORED_PARAMS = ("raw_json", "count")
+
+
+def fixture_key(method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """
+    "GET /r/cruise/top?limit=100&t=all". Host and ".json" are dropped so a
+    recording from oauth.reddit.com matches requests sent to a local server.
+    """
+    path = urlparse(url).path
+    if path.endswith(".json"):
+        path = path[: -len(".json")]
+    path = path.rstrip("/").lower() or "/"
+    query = "&".join(
+        f"{k}={params[k]}" for k in sorted(params or {}) if k not in _IGNORED_PARAMS and params[k] is not None
+    )
+    return f"{method.upper()} {path}" + (f"?{query}" if query else "")
+
+
+class FixtureRecorder:
+    """Thread-safe gzip JSONL appender shared by every client in the process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.recorded = 0
+        self._fh = gzip.open(path, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, key: str, status: int, body: str) -> None:
+        line = json.dumps({"key": key, "status": status, "body": body}, ensure_ascii=False)
+        with self._lock:
+            self._fh.write(line + "\n")
+            self.recorded += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+_recorders: Dict[str, FixtureRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(path: str) -> FixtureRecorder:
+    """One recorder per file, however many praw.Reddit instances write to it."""
+    with _recorders_lock:
+        rec = _recorders.get(path)
+        if rec is None:
+            rec = _recorders[path] = FixtureRecorder(path)
+        return rec
+
+
+def close_recorders() -> None:
+    with _recorders_lock:
+        for rec in _recorders.values():
+            rec.close()
+        _recorders.clear()
+
+
+atexit.register(close_recorders)  # gzip needs its trailer written
+
+
+def load_fixture(path: str) -> Dict[str, Dict[str, Any]]:
+    """key -> {"status", "body"}; the last recording of a key wins."""
+    out: Dict[str, Dict[str, Any]] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            out[entry["key"]] = {"status": entry["status"], "body": entry["body"]}
+    return out
+
+
+class RecordingRequestor(RateLimitedRequestor):
+    """
+    Rate-limited requestor that also records API responses. Token requests are
+    not recorded (they carry credentials and the fake server answers them itself).
+    """
+
+    def __init__(self, *args: Any, recorder: FixtureRecorder, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.recorder = recorder
+
+    def request(self, *args: Any, **kwargs: Any):
+        response = super().request(*args, **kwargs)
+        method, url = args[0], args[1]
+        if "access_token" not in url:
+            self.recorder.write(fixture_key(method, url, kwargs.get("params")), response.status_code, response.text)
+        return response
@@ -1,18 +1,57 @@
+import threading
+from typing import Optional
+
 import praw
 from settings import Settings
+from rate_limit import RateLimitedRequestor, TokenBucket
+from recording import RecordingRequestor, get_recorder
 
 
-def create_reddit(settings: Settings) -> praw.Reddit:
+def create_reddit(settings: Settings, limiter: Optional[TokenBucket] = None) -> praw.Reddit:
     if not settings.reddit_client_id or not settings.reddit_client_secret:
         raise RuntimeError(
             "Missing Reddit credentials.\n"
             "Set REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT in your environment (.env)."
         )
 
+    kwargs = {}
+    if settings.reddit_record_path:
+        # Capture responses for fake_reddit.py --fixture (see recording.py)
+        kwargs["requestor_class"] = RecordingRequestor
+        kwargs["requestor_kwargs"] = {"limiter": limiter, "recorder": get_recorder(settings.reddit_record_path)}
+    elif limiter is not None:
+        kwargs["requestor_class"] = RateLimitedRequestor
+        kwargs["requestor_kwargs"] = {"limiter": limiter}
+    # Point at a local fake server (see fake_reddit.py) instead of reddit.com
+    if settings.reddit_oauth_url:
+        kwargs["oauth_url"] = settings.reddit_oauth_url
+    if settings.reddit_url:
+        kwargs["reddit_url"] = settings.reddit_url
+
     reddit = praw.Reddit(
         client_id=settings.reddit_client_id,
         client_secret=settings.reddit_client_secret,
         user_agent=settings.reddit_user_agent,
+        **kwargs,
     )
     reddit.read_only = True
     return reddit
+
+
+class ThreadLocalReddit:
+    """
+    praw.Reddit is not thread-safe, so each worker thread lazily gets its own
+    client. All of them share one TokenBucket, i.e. one request budget.
+    """
+
+    def __init__(self, settings: Settings, limiter: TokenBucket):
+        self.settings = settings
+        self.limiter = limiter
+        self._local = threading.local()
+
+    def get(self) -> praw.Reddit:
+        reddit = getattr(self._local, "reddit", None)
+        if reddit is None:
+            reddit = create_reddit(self.settings, self.limiter)
+            self._local.reddit = reddit
+        return reddit
@@ -0,0 +1,220 @@
+import math
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Persistent, prioritized schedule of posts whose comment trees need (re)fetching.
+# Replaces the old iter_post_ids_needing_comments() full scans:
+#   - rows are (re)queued by the writer whenever a post is new or its num_comments grew
+#   - workers lease the highest-priority due rows, so a huge backlog can't starve fresh threads
+#   - failures back off exponentially instead of being retried every run
+
+# Table DDL lives in db.SCHEMA (comment_refresh_queue).
+
+
+@dataclass(frozen=True)
+class RefreshPolicy:
+    subreddit_weights: Dict[str, float] = field(default_factory=dict)
+    recent_days: int = 14                 # only re-fetch grown threads this young
+    min_interval_seconds: int = 1800      # don't re-fetch the same thread more often than this
+    backoff_base_seconds: int = 300
+    backoff_max_seconds: int = 86400
+    never_ingested_bonus: float = 2.0
+
+    def weight(self, subreddit: Optional[str]) -> float:
+        return float(self.subreddit_weights.get(subreddit or "", 1.0))
+
+
+def policy_from_settings(settings) -> RefreshPolicy:
+    return RefreshPolicy(
+        subreddit_weights=dict(settings.subreddit_weights),
+        recent_days=settings.refresh_recent_days,
+        min_interval_seconds=settings.refresh_min_interval_seconds,
+        backoff_base_seconds=settings.refresh_backoff_base_seconds,
+        backoff_max_seconds=settings.refresh_backoff_max_seconds,
+    )
+
+
+def refresh_priority(
+    policy: RefreshPolicy,
+    subreddit: Optional[str],
+    created_utc: Optional[int],
+    num_comments: Optional[int],
+    last_count: Optional[int],
+    now: int,
+) -> float:
+    """
+    weight * (comment growth, log-damped) / (post age decay).
+    A 2-day-old thread that gained 50 comments outranks a 2-year-old one that gained 500.
+    """
+    n = num_comments or 0
+    if last_count is None:
+        growth = 1.0 + math.log1p(n) + policy.never_ingested_bonus
+    else:
+        growth = 1.0 + math.log1p(max(0, n - last_count))
+    age_days = max(0.0, (now - (created_utc or now)) / 86400.0)
+    return round(policy.weight(subreddit) * growth / (1.0 + age_days / 7.0), 6)
+
+
+_ENQUEUE_SQL = """
+INSERT INTO comment_refresh_queue (post_id, priority, next_due_utc, last_seen_num_comments, failures)
+VALUES (:post_id, :priority, :next_due_utc, :num_comments, 0)
+ON CONFLICT(post_id) DO UPDATE SET
+  priority = excluded.priority,
+  last_seen_num_comments = excluded.last_seen_num_comments,
+  -- never pull a pending failure backoff forward
+  next_due_utc = CASE
+    WHEN comment_refresh_queue.next_due_utc IS NULL THEN excluded.next_due_utc
+    WHEN excluded.next_due_utc IS NULL THEN comment_refresh_queue.next_due_utc
+    ELSE MAX(comment_refresh_queue.next_due_utc, excluded.next_due_utc)
+  END
+"""
+
+
+def _chunks(xs: Sequence, n: int) -> Iterable[Sequence]:
+    for i in range(0, len(xs), n):
+        yield xs[i:i + n]
+
+
+def enqueue_posts(conn: sqlite3.Connection, rows: Sequence[Dict], policy: RefreshPolicy, now: int) -> int:
+    """
+    Called by the writer right after upserting `rows` (post row dicts).
+    Queues posts that were never ingested, or whose num_comments grew since the
+    last ingestion and are younger than policy.recent_days.
+    """
+    if not rows:
+        return 0
+
+    state: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+    ids = [r["post_id"] for r in rows]
+    for chunk in _chunks(ids, 500):
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            f"SELECT post_id, comments_last_count, comments_last_ingested_utc FROM posts WHERE post_id IN ({marks})",
+            list(chunk),
+        )
+        for pid, last_count, last_ingested in cur:
+            state[pid] = (last_count, last_ingested)
+
+    recent_cutoff = now - policy.recent_days * 86400
+    params = []
+    for r in rows:
+        last_count, last_ingested = state.get(r["post_id"], (None, None))
+        n = r.get("num_comments")
+
+        if last_ingested is None:
+            due = now
+        elif (r.get("created_utc") or 0) >= recent_cutoff and (last_count is None or n is None or n > last_count):
+            due = max(now, last_ingested + policy.min_interval_seconds)
+        else:
+            due = None
+
+        params.append({
+            "post_id": r["post_id"],
+            "priority": refresh_priority(policy, r.get("subreddit"), r.get("created_utc"), n, last_count if last_ingested else None, now),
+            "next_due_utc": due,
+            "num_comments": n,
+        })
+
+    conn.executemany(_ENQUEUE_SQL, params)
+    return sum(1 for p in params if p["next_due_utc"] is not None)
+
+
+def seed_from_posts(conn: sqlite3.Connection, policy: RefreshPolicy, now: int, batch: int = 5000) -> int:
+    """
+    One-time backfill for databases created before the queue existed.
+    No-op once the queue has any rows.
+    """
+    if conn.execute("SELECT 1 FROM comment_refresh_queue LIMIT 1").fetchone():
+        return 0
+
+    cur = conn.execute(
+        "SELECT post_id, subreddit, created_utc, num_comments FROM posts"
+    )
+    cols = [d[0] for d in cur.description]
+    queued = 0
+    while True:
+        rows = cur.fetchmany(batch)
+        if not rows:
+            break
+        queued += enqueue_posts(conn, [dict(zip(cols, r)) for r in rows], policy, now)
+    conn.commit()
+    return queued
+
+
+def lease_batch(conn: sqlite3.Connection, owner: str, limit: int, lease_seconds: int, now: int) -> List[str]:
+    """
+    Claims up to `limit` due posts, highest priority first. A lease that expires
+    (worker crashed) makes the row leasable again.
+    """
+    cur = conn.execute(
+        """
+        UPDATE comment_refresh_queue
+        SET lease_owner = ?, lease_expires_utc = ?
+        WHERE post_id IN (
+          SELECT post_id FROM comment_refresh_queue
+          WHERE next_due_utc <= ?
+            AND (lease_expires_utc IS NULL OR lease_expires_utc < ?)
+          ORDER BY priority DESC
+          LIMIT ?
+        )
+        RETURNING post_id, priority
+        """,
+        (owner, now + lease_seconds, now, now, limit),
+    )
+    rows = cur.fetchall()
+    conn.commit()
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return [pid for pid, _ in rows]
+
+
+def release_leases(conn: sqlite3.Connection, owner: str) -> int:
+    """Frees rows leased by a run that died, instead of waiting out lease_seconds."""
+    cur = conn.execute(
+        "UPDATE comment_refresh_queue SET lease_owner = NULL, lease_expires_utc = NULL WHERE lease_owner = ?",
+        (owner,),
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def complete_many(conn: sqlite3.Connection, rows: Sequence[Tuple[str, int, int]]) -> None:
+    """rows: (post_id, ingested_at_utc, comment_count), same shape as the comments-ingested marker."""
+    conn.executemany(
+        """
+        UPDATE comment_refresh_queue
+        SET next_due_utc = NULL, failures = 0, last_error = NULL,
+            lease_owner = NULL, lease_expires_utc = NULL
+        WHERE post_id = ?
+        """,
+        [(pid,) for pid, _, _ in rows],
+    )
+
+
+def fail_many(conn: sqlite3.Connection, rows: Sequence[Tuple[str, str]], policy: RefreshPolicy, now: int) -> None:
+    """rows: (post_id, error). Next attempt after base * 2^failures seconds, capped."""
+    conn.executemany(
+        """
+        UPDATE comment_refresh_queue
+        SET failures = failures + 1,
+            last_error = ?,
+            next_due_utc = ? + MIN(?, ? * (1 << MIN(failures, 20))),
+            lease_owner = NULL, lease_expires_utc = NULL
+        WHERE post_id = ?
+        """,
+        [(err[:500], now, policy.backoff_max_seconds, policy.backoff_base_seconds, pid) for pid, err in rows],
+    )
+
+
+def queue_stats(conn: sqlite3.Connection, now: int) -> Dict[str, int]:
+    row = conn.execute(
+        """
+        SELECT
+          SUM(CASE WHEN next_due_utc <= ? THEN 1 ELSE 0 END),
+          SUM(CASE WHEN next_due_utc > ? THEN 1 ELSE 0 END),
+          SUM(CASE WHEN failures > 0 THEN 1 ELSE 0 END)
+        FROM comment_refresh_queue
+        """,
+        (now, now),
+    ).fetchone()
+    return {"due": row[0] or 0, "scheduled": row[1] or 0, "failing": row[2] or 0}
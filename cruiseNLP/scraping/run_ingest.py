@@ -1,58 +1,137 @@
+import argparse
 import os
-import time
+import socket
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from settings import load_settings
-from reddit_client import create_reddit
-from db import connect, init_db, iter_post_ids_needing_comments
-from ingest_posts import ingest_subreddit_posts
-from ingest_comments import ingest_comments_for_post
+from reddit_client import ThreadLocalReddit
+from rate_limit import TokenBucket
+from db import connect, init_db, set_stream_scoring
+from db_writer import DBWriter, now_utc_int
+import maintenance
+from refresh_queue import lease_batch, policy_from_settings, queue_stats, release_leases, seed_from_posts
+from checkpoints import abandon_unfinished_runs, find_unfinished_run, load_checkpoints, resume_run, start_run, update_run
+from ingest_posts import LISTINGS, SeenIds, StoredHashes, ingest_listing, listing_name
+from ingest_comments import ingest_comments_concurrently
 from export_csv import export_posts, export_comments
 
 
 def main() -> None:
+    ap = argparse.ArgumentParser(description="Ingest subreddit posts and comments into SQLite, then export")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--resume", dest="resume", action="store_true", default=True,
+                      help="continue the last unfinished run from its listing checkpoints (default)")
+    mode.add_argument("--fresh", dest="resume", action="store_false",
+                      help="ignore unfinished runs and page every listing from the start")
+    ap.add_argument("--no-export", dest="export", action="store_false",
+                    help="skip the CSV export step (pipeline.py runs it as its own stage)")
+    args = ap.parse_args()
+
     settings = load_settings()
-    reddit = create_reddit(settings)
+
+    # One request budget for every thread, one thread that owns the write connection
+    limiter = TokenBucket(settings.requests_per_minute)
+    clients = ThreadLocalReddit(settings, limiter)
 
     conn = connect(settings.sqlite_path)
     init_db(conn)
+    # Streaming mode: triggers queue every new/changed post and comment for NLP/stream_scorer.py
+    set_stream_scoring(conn, settings.stream_scoring)
+    if settings.stream_scoring:
+        print("[RUN] streaming scoring on: new and changed rows are queued for stream_scorer")
+
+    policy = policy_from_settings(settings)
+    maint_policy = maintenance.policy_from_settings(settings)
+    writer = DBWriter(
+        settings.sqlite_path,
+        flush_rows=settings.write_flush_rows,
+        flush_seconds=settings.write_flush_seconds,
+        refresh_policy=policy,
+    )
+    writer.start()
 
-    # 1) Ingest posts (max accessible via multiple listings)
+    # Run journal: resume the last unfinished run (listing cursors + its stale leases) unless --fresh
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    unfinished = find_unfinished_run(conn)
+    if unfinished and args.resume:
+        run_id, stage, old_owner = unfinished
+        resume_run(conn, run_id, owner)
+        if old_owner:
+            writer.call(release_leases, old_owner)
+        checkpoints = load_checkpoints(conn, run_id)
+        print(f"[RUN] resuming run {run_id} (stopped in stage={stage}, {len(checkpoints)} listing checkpoints)")
+    else:
+        if unfinished:
+            print(f"[RUN] --fresh: abandoning {abandon_unfinished_runs(conn)} unfinished run(s)")
+        run_id = start_run(conn, owner)
+        checkpoints = {}
+        print(f"[RUN] starting run {run_id}")
+
+    # Databases created before the refresh queue existed get backfilled once
+    seeded = writer.call(seed_from_posts, policy, now_utc_int())
+    if seeded:
+        print(f"[RUN] refresh queue seeded with {seeded} due posts")
+
+    # 1) Ingest posts: every (subreddit, listing) pair is its own task.
+    # `seen` dedups ids across all listings this run; `stored` skips no-op rewrites.
     total_posts = 0
-    for sub_name, line_label in settings.subreddits.items():
-        try:
-            total_posts += ingest_subreddit_posts(conn, reddit, sub_name, line_label, settings)
-        except Exception as e:
-            print(f"[WARN] posts failed for r/{sub_name}: {e}")
+    seen = SeenIds()
+    stored = StoredHashes(settings.sqlite_path)
+
+    def run_listing(sub_name: str, line_label: str, listing: str, time_filter):
+        return ingest_listing(
+            writer, clients.get(), sub_name, line_label, listing, time_filter, settings, seen, stored,
+            run_id=run_id, checkpoint=checkpoints.get((sub_name, listing_name(listing, time_filter))),
+        )
 
-    print(f"\n[RUN] Posts ingestion complete. Upserted (this run): {total_posts}")
+    with ThreadPoolExecutor(max_workers=settings.ingest_workers, thread_name_prefix="posts") as pool:
+        futures = {
+            pool.submit(run_listing, sub_name, line_label, listing, time_filter): (sub_name, listing, time_filter)
+            for sub_name, line_label in settings.subreddits.items()
+            for listing, time_filter in LISTINGS
+        }
+        for fut in as_completed(futures):
+            sub_name, listing, time_filter = futures[fut]
+            try:
+                total_posts += fut.result()
+            except Exception as e:
+                print(f"[WARN] posts failed for r/{sub_name} {listing_name(listing, time_filter)}: {e}")
 
-    # 2) Ingest comments (only for posts that need it)
-    total_comments = 0
-    processed_posts = 0
+    writer.call(update_run, run_id, stage="comments", posts_written=total_posts)
+    print(f"\n[RUN] Posts ingestion complete. New or changed (this run): {total_posts}")
+    print(f"[RUN] rate limiter: waited {limiter.waited_seconds:.1f}s total across workers")
+    maintenance.at_stage_boundary(conn, "ingest posts", maint_policy)
 
-    for post_id in iter_post_ids_needing_comments(conn, only_recent_days=14):
-        try:
-            c, ingested_at = ingest_comments_for_post(conn, reddit, post_id, settings)
-            total_comments += c
-            processed_posts += 1
+    # 2) Ingest comments for due posts, highest refresh priority first, on a bounded worker pool.
+    # Posts were (re)queued by the writer as they were upserted above.
+    print(f"[RUN] refresh queue: {queue_stats(conn, now_utc_int())}")
 
-            if processed_posts % 25 == 0:
-                print(f"[COMMENTS] processed {processed_posts} posts; total comments upserted: {total_comments}")
+    def leased_post_ids():
+        while True:
+            batch = writer.call(lease_batch, owner, settings.refresh_lease_batch, settings.refresh_lease_seconds, now_utc_int())
+            if not batch:
+                return
+            yield from batch
 
-            time.sleep(settings.sleep_seconds_between_posts)
-        except Exception as e:
-            print(f"[WARN] comments failed for post {post_id}: {e}")
+    processed_posts, total_comments = ingest_comments_concurrently(writer, clients.get, leased_post_ids(), settings)
+    writer.call(update_run, run_id, stage="export", comment_posts=processed_posts, comments_written=total_comments)
 
+    writer.close()
+    print(f"[RUN] writer: {writer.flushes} flushes, {writer.flush_seconds_total:.2f}s total write time")
     print(f"\n[RUN] Comments ingestion complete. Posts processed: {processed_posts}, comments upserted: {total_comments}")
+    print(f"[RUN] refresh queue: {queue_stats(conn, now_utc_int())}")
+    maintenance.at_stage_boundary(conn, "ingest comments", maint_policy)
 
-    # 3) Export
-    pcount = export_posts(conn, settings, "posts.csv")
-    ccount = export_comments(conn, settings, "comments.csv")
-    print(f"[EXPORT] {settings.export_dir}/posts.csv rows={pcount}")
-    print(f"[EXPORT] {settings.export_dir}/comments.csv rows={ccount}")
+    # 3) Export (incremental by default: only rows retrieved since the last manifest)
+    if args.export:
+        pcount = export_posts(conn, settings, "posts.csv")
+        ccount = export_comments(conn, settings, "comments.csv")
+        print(f"[EXPORT] {settings.export_dir} posts rows={pcount} (format={settings.export_format}, incremental={settings.export_incremental})")
+        print(f"[EXPORT] {settings.export_dir} comments rows={ccount}")
 
+    update_run(conn, run_id, status="done")
     conn.close()
-    print("Done.")
+    print(f"Done. (run {run_id})")
 
 
 if __name__ == "__main__":
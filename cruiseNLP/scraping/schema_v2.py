@@ -0,0 +1,389 @@
+# cruiseNLP/scraping/schema_v2.py
+"""
+Schema v2 for the analytics tables: integer keys and interned dictionaries.
+
+v1 keys nlp_scores / extraction / themes by (object_type TEXT, object_id TEXT),
+repeats sentiment / theme / model labels as TEXT on every row and keeps ports
+and ships as JSON strings, so every join compares strings and every port / ship
+filter re-parses JSON. v2:
+
+  objects           one integer object_key per post / comment (object_type 1 / 2)
+  posts, comments   keyed by that object_key; the Reddit ids stay as UNIQUE columns
+  nlp_scores        object_key -> sentiment (-1 neg / 0 neu / 1 pos), scores, version_key
+  extraction        object_key -> line_key, confidence
+  port_mentions,    (port_key, object_key) WITHOUT ROWID, replacing the JSON arrays;
+  ship_mentions     clustered by entity, so "all comments about X" is one range read
+  themes            (object_key, theme_key) WITHOUT ROWID
+  near_dups         comment_key -> cluster_key (its representative's comment_key), for the feeds
+  ports, ships, cruise_lines, theme_labels, model_versions, sentiment_labels
+                    dictionaries (the API-facing slugs live only here)
+
+Only the posts / comments / NLP tables are migrated: ingestion bookkeeping
+(refresh queue, checkpoints, watermarks, scoring queue) keeps running on v1,
+and the API still reads v1. See api/queries_v2.py for the ported queries and
+api/bench_schema_v2.py for the size / latency comparison.
+
+Run from cruiseNLP/ (or as `python schema_v2.py ...` from scraping/, like its siblings):
+  python -m scraping.schema_v2 --src cruise_reddit.db --out cruise_reddit_v2.db
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+SCHEMA_VERSION = 2
+
+OBJECT_TYPES = {"post": 1, "comment": 2}
+SENTIMENT_CODES = {"neg": -1, "neu": 0, "pos": 1}
+
+SCHEMA_V2 = """
+PRAGMA journal_mode=WAL;
+PRAGMA foreign_keys=ON;
+
+CREATE TABLE IF NOT EXISTS schema_info (
+  key TEXT PRIMARY KEY,
+  value TEXT
+) WITHOUT ROWID;
+
+-- ---------- dictionaries ----------
+CREATE TABLE IF NOT EXISTS object_types (
+  object_type INTEGER PRIMARY KEY,
+  name TEXT NOT NULL UNIQUE
+);
+INSERT OR IGNORE INTO object_types (object_type, name) VALUES (1, 'post'), (2, 'comment');
+
+CREATE TABLE IF NOT EXISTS sentiment_labels (
+  sentiment INTEGER PRIMARY KEY,        -- -1 / 0 / 1
+  label TEXT NOT NULL UNIQUE            -- 'neg' / 'neu' / 'pos'
+);
+INSERT OR IGNORE INTO sentiment_labels (sentiment, label) VALUES (-1, 'neg'), (0, 'neu'), (1, 'pos');
+
+CREATE TABLE IF NOT EXISTS model_versions (
+  version_key INTEGER PRIMARY KEY,
+  model_version TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS theme_labels (
+  theme_key INTEGER PRIMARY KEY,
+  theme_label TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS ports (
+  port_key INTEGER PRIMARY KEY,
+  port_id TEXT NOT NULL UNIQUE          -- slug, as in v1 extraction.port_ids
+);
+
+CREATE TABLE IF NOT EXISTS ships (
+  ship_key INTEGER PRIMARY KEY,
+  ship_id TEXT NOT NULL UNIQUE
+);
+
+-- one row per distinct TRIM(cruise_line); line_id is the URL slug and isn't
+-- unique when two spellings differ only in case, same as v1
+CREATE TABLE IF NOT EXISTS cruise_lines (
+  line_key INTEGER PRIMARY KEY,
+  line_name TEXT NOT NULL UNIQUE,
+  line_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cruise_lines_slug ON cruise_lines(line_id);
+
+-- ---------- raw data ----------
+CREATE TABLE IF NOT EXISTS objects (
+  object_key INTEGER PRIMARY KEY,
+  object_type INTEGER NOT NULL REFERENCES object_types(object_type)
+);
+
+CREATE TABLE IF NOT EXISTS posts (
+  post_key INTEGER PRIMARY KEY REFERENCES objects(object_key),
+  post_id TEXT NOT NULL UNIQUE,
+  subreddit TEXT NOT NULL,
+  cruise_line_from_subreddit TEXT,
+  created_utc INTEGER,
+  title TEXT,
+  selftext TEXT,
+  author TEXT,
+  score INTEGER,
+  num_comments INTEGER,
+  url TEXT,
+  permalink TEXT,
+  over_18 INTEGER,
+  is_self INTEGER,
+  link_flair_text TEXT,
+  retrieved_at_utc INTEGER,
+  content_hash TEXT
+);
+
+CREATE TABLE IF NOT EXISTS comments (
+  comment_key INTEGER PRIMARY KEY REFERENCES objects(object_key),
+  comment_id TEXT NOT NULL UNIQUE,
+  post_key INTEGER NOT NULL REFERENCES posts(post_key),
+  subreddit TEXT NOT NULL,
+  created_utc INTEGER,
+  body TEXT,
+  author TEXT,
+  score INTEGER,
+  permalink TEXT,
+  retrieved_at_utc INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_posts_subreddit_created ON posts(subreddit, created_utc);
+CREATE INDEX IF NOT EXISTS idx_comments_post ON comments(post_key);
+
+-- ---------- NLP ----------
+CREATE TABLE IF NOT EXISTS nlp_scores (
+  object_key INTEGER PRIMARY KEY REFERENCES objects(object_key),
+  sentiment INTEGER REFERENCES sentiment_labels(sentiment),
+  sentiment_score REAL,
+  severity_score REAL,
+  version_key INTEGER REFERENCES model_versions(version_key),
+  scored_at_utc INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS extraction (
+  object_key INTEGER PRIMARY KEY REFERENCES objects(object_key),
+  line_key INTEGER REFERENCES cruise_lines(line_key),
+  confidence REAL,
+  extracted_at_utc INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_extraction_line ON extraction(line_key) WHERE line_key IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS port_mentions (
+  port_key INTEGER NOT NULL REFERENCES ports(port_key),
+  object_key INTEGER NOT NULL REFERENCES objects(object_key),
+  PRIMARY KEY (port_key, object_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_port_mentions_object ON port_mentions(object_key);
+
+CREATE TABLE IF NOT EXISTS ship_mentions (
+  ship_key INTEGER NOT NULL REFERENCES ships(ship_key),
+  object_key INTEGER NOT NULL REFERENCES objects(object_key),
+  PRIMARY KEY (ship_key, object_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_ship_mentions_object ON ship_mentions(object_key);
+
+CREATE TABLE IF NOT EXISTS themes (
+  object_key INTEGER NOT NULL REFERENCES objects(object_key),
+  theme_key INTEGER NOT NULL REFERENCES theme_labels(theme_key),
+  theme_score REAL,
+  version_key INTEGER REFERENCES model_versions(version_key),
+  labeled_at_utc INTEGER,
+  PRIMARY KEY (object_key, theme_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_themes_theme ON themes(theme_key);
+
+-- near-duplicate clusters (NLP/near_dup.py); signatures and LSH bands stay in v1, where indexing runs
+CREATE TABLE IF NOT EXISTS near_dups (
+  comment_key INTEGER PRIMARY KEY REFERENCES comments(comment_key),
+  cluster_key INTEGER NOT NULL REFERENCES comments(comment_key)
+);
+"""
+
+
+def init_db_v2(conn: sqlite3.Connection) -> None:
+    conn.executescript(SCHEMA_V2)
+    conn.execute("INSERT OR REPLACE INTO schema_info (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+    conn.commit()
+
+
+# ---------- migration v1 -> v2 ----------
+# Run in order with the v1 database attached as "src". key_map assigns object
+# keys: posts first, then comments, each in created_utc order, so a month of
+# comments sits on neighbouring pages.
+_MIGRATION_STEPS: Tuple[Tuple[str, str], ...] = (
+    ("object keys", """
+        CREATE TEMP TABLE key_map (
+          object_key INTEGER PRIMARY KEY,
+          object_type INTEGER NOT NULL,
+          object_id TEXT NOT NULL
+        );
+        INSERT INTO key_map (object_type, object_id)
+          SELECT 1, post_id FROM src.posts ORDER BY created_utc, post_id;
+        INSERT INTO key_map (object_type, object_id)
+          SELECT 2, comment_id FROM src.comments ORDER BY created_utc, comment_id;
+        CREATE UNIQUE INDEX temp.idx_key_map ON key_map(object_id, object_type);
+        INSERT INTO objects (object_key, object_type) SELECT object_key, object_type FROM key_map;
+    """),
+    ("posts", """
+        INSERT INTO posts
+          SELECT k.object_key, p.post_id, p.subreddit, p.cruise_line_from_subreddit, p.created_utc,
+                 p.title, p.selftext, p.author, p.score, p.num_comments, p.url, p.permalink,
+                 p.over_18, p.is_self, p.link_flair_text, p.retrieved_at_utc, p.content_hash
+          FROM key_map k JOIN src.posts p ON p.post_id = k.object_id
+          WHERE k.object_type = 1
+          ORDER BY k.object_key;
+    """),
+    ("comments", """
+        INSERT INTO comments
+          SELECT k.object_key, c.comment_id, pk.object_key, c.subreddit, c.created_utc,
+                 c.body, c.author, c.score, c.permalink, c.retrieved_at_utc
+          FROM key_map k
+          JOIN src.comments c ON c.comment_id = k.object_id
+          JOIN key_map pk ON pk.object_id = c.post_id AND pk.object_type = 1
+          WHERE k.object_type = 2
+          ORDER BY k.object_key;
+    """),
+    ("dictionaries", """
+        INSERT OR IGNORE INTO model_versions (model_version)
+          SELECT model_version FROM src.nlp_scores WHERE model_version IS NOT NULL
+          UNION SELECT model_version FROM src.themes WHERE model_version IS NOT NULL;
+        INSERT OR IGNORE INTO theme_labels (theme_label)
+          SELECT DISTINCT theme_label FROM src.themes ORDER BY theme_label;
+        INSERT OR IGNORE INTO cruise_lines (line_name, line_id)
+          SELECT TRIM(cruise_line), LOWER(REPLACE(TRIM(cruise_line), ' ', '-'))
+          FROM src.extraction
+          WHERE cruise_line IS NOT NULL AND TRIM(cruise_line) <> ''
+          GROUP BY TRIM(cruise_line)
+          ORDER BY TRIM(cruise_line);
+        INSERT OR IGNORE INTO ports (port_id)
+          SELECT DISTINCT je.value FROM src.extraction e JOIN json_each(e.port_ids) je
+          WHERE e.port_ids IS NOT NULL AND e.port_ids != '[]'
+          ORDER BY 1;
+        INSERT OR IGNORE INTO ships (ship_id)
+          SELECT DISTINCT je.value FROM src.extraction e JOIN json_each(e.ship_ids) je
+          WHERE e.ship_ids IS NOT NULL AND e.ship_ids != '[]'
+          ORDER BY 1;
+    """),
+    ("nlp_scores", """
+        INSERT INTO nlp_scores
+          SELECT k.object_key,
+                 CASE s.sentiment_label WHEN 'neg' THEN -1 WHEN 'neu' THEN 0 WHEN 'pos' THEN 1 END,
+                 s.sentiment_score, s.severity_score, v.version_key, s.scored_at_utc
+          FROM src.nlp_scores s
+          JOIN key_map k
+            ON k.object_id = s.object_id AND k.object_type = CASE s.object_type WHEN 'post' THEN 1 ELSE 2 END
+          LEFT JOIN model_versions v ON v.model_version = s.model_version
+          ORDER BY k.object_key;
+    """),
+    ("extraction", """
+        INSERT INTO extraction
+          SELECT k.object_key, l.line_key, e.confidence, e.extracted_at_utc
+          FROM src.extraction e
+          JOIN key_map k
+            ON k.object_id = e.object_id AND k.object_type = CASE e.object_type WHEN 'post' THEN 1 ELSE 2 END
+          LEFT JOIN cruise_lines l ON l.line_name = TRIM(e.cruise_line)
+          ORDER BY k.object_key;
+    """),
+    ("port_mentions", """
+        INSERT OR IGNORE INTO port_mentions (port_key, object_key)
+          SELECT p.port_key, k.object_key
+          FROM src.extraction e
+          JOIN key_map k
+            ON k.object_id = e.object_id AND k.object_type = CASE e.object_type WHEN 'post' THEN 1 ELSE 2 END
+          JOIN json_each(e.port_ids) je
+          JOIN ports p ON p.port_id = je.value
+          WHERE e.port_ids IS NOT NULL AND e.port_ids != '[]'
+          ORDER BY 1, 2;
+    """),
+    ("ship_mentions", """
+        INSERT OR IGNORE INTO ship_mentions (ship_key, object_key)
+          SELECT sh.ship_key, k.object_key
+          FROM src.extraction e
+          JOIN key_map k
+            ON k.object_id = e.object_id AND k.object_type = CASE e.object_type WHEN 'post' THEN 1 ELSE 2 END
+          JOIN json_each(e.ship_ids) je
+          JOIN ships sh ON sh.ship_id = je.value
+          WHERE e.ship_ids IS NOT NULL AND e.ship_ids != '[]'
+          ORDER BY 1, 2;
+    """),
+    ("themes", """
+        INSERT INTO themes
+          SELECT k.object_key, tl.theme_key, t.theme_score, v.version_key, t.labeled_at_utc
+          FROM src.themes t
+          JOIN key_map k
+            ON k.object_id = t.object_id AND k.object_type = CASE t.object_type WHEN 'post' THEN 1 ELSE 2 END
+          JOIN theme_labels tl ON tl.theme_label = t.theme_label
+          LEFT JOIN model_versions v ON v.model_version = t.model_version
+          ORDER BY 1, 2;
+    """),
+    ("near_dups", """
+        INSERT INTO near_dups
+          SELECT k.object_key, ck.object_key
+          FROM src.near_dups d
+          JOIN key_map k ON k.object_id = d.comment_id AND k.object_type = 2
+          JOIN key_map ck ON ck.object_id = d.cluster_id AND ck.object_type = 2
+          ORDER BY 1;
+    """),
+)
+
+# steps copying a v1 table that older databases don't have yet (skipped there)
+_OPTIONAL_STEPS = ("near_dups",)
+
+# v1 rows whose post / comment is gone have no object key and are dropped
+_ORPHANS = {
+    "nlp_scores": "SELECT (SELECT COUNT(*) FROM src.nlp_scores) - (SELECT COUNT(*) FROM nlp_scores)",
+    "extraction": "SELECT (SELECT COUNT(*) FROM src.extraction) - (SELECT COUNT(*) FROM extraction)",
+    "themes": "SELECT (SELECT COUNT(*) FROM src.themes) - (SELECT COUNT(*) FROM themes)",
+    "near_dups": "SELECT (SELECT COUNT(*) FROM src.near_dups) - (SELECT COUNT(*) FROM near_dups)",
+}
+
+
+def migrate(src_path: str, out_path: str) -> Dict[str, float]:
+    """
+    Builds a v2 database at out_path from the v1 database at src_path (only
+    read from). Writes to <out_path>.building and renames when done. Returns
+    seconds per step.
+    """
+    building = out_path + ".building"
+    for p in (building, building + "-wal", building + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+
+    # uri=True so the source can be attached with mode=ro
+    conn = sqlite3.connect(building, uri=True)
+    init_db_v2(conn)
+    # nothing reads the file until it's renamed: skip the journal
+    conn.execute("PRAGMA journal_mode=OFF;")
+    conn.execute("PRAGMA synchronous=OFF;")
+    conn.execute("PRAGMA foreign_keys=OFF;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("ATTACH DATABASE ? AS src", (Path(src_path).resolve().as_uri() + "?mode=ro",))
+
+    src_tables = {name for (name,) in conn.execute("SELECT name FROM src.sqlite_master WHERE type = 'table'")}
+    timings: Dict[str, float] = {}
+    for step, sql in _MIGRATION_STEPS:
+        if step in _OPTIONAL_STEPS and step not in src_tables:
+            continue
+        t0 = time.perf_counter()
+        conn.executescript("BEGIN;" + sql + "COMMIT;")
+        timings[step] = round(time.perf_counter() - t0, 3)
+        print(f"[V2] {step:<14} {timings[step]:.1f}s")
+
+    for table, sql in _ORPHANS.items():
+        if table not in src_tables:
+            continue
+        (n,) = conn.execute(sql).fetchone()
+        if n:
+            print(f"[V2] {table}: dropped {n} row(s) without a post / comment")
+
+    conn.execute("DETACH DATABASE src")
+    t0 = time.perf_counter()
+    conn.execute("ANALYZE;")
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.commit()
+    timings["analyze"] = round(time.perf_counter() - t0, 3)
+    conn.close()
+
+    os.replace(building, out_path)
+    return timings
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Migrate a v1 cruise_reddit.db to schema v2")
+    ap.add_argument("--src", default=os.getenv("SQLITE_PATH", "cruise_reddit.db"))
+    ap.add_argument("--out", default=None, help="default: <src>_v2.db")
+    args = ap.parse_args()
+
+    out = args.out or os.path.splitext(args.src)[0] + "_v2.db"
+    if os.path.abspath(out) == os.path.abspath(args.src):
+        ap.error("--out must differ from --src")
+    t0 = time.perf_counter()
+    migrate(args.src, out)
+    print(f"[V2] wrote {out} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
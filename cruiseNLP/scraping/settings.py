@@ -1,9 +1,18 @@
 import os
 from dataclasses import dataclass
 from typing import Dict
-from dotenv import load_dotenv
 
-load_dotenv()
+_dotenv_loaded = False
+
+
+def _load_dotenv_once() -> None:
+    # at first load_settings() rather than at import; python-dotenv never overrides
+    # variables already set in the environment
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
 
 
 @dataclass(frozen=True)
@@ -12,6 +21,11 @@ class Settings:
     reddit_client_id: str
     reddit_client_secret: str
     reddit_user_agent: str
+    # Override API hosts (e.g. a local fake_reddit.py server); empty = reddit.com
+    reddit_oauth_url: str
+    reddit_url: str
+    # Append every API response to this gzip JSONL fixture (see recording.py); empty = off
+    reddit_record_path: str
 
     # Storage
     sqlite_path: str
@@ -21,6 +35,7 @@ class Settings:
 
     # Ingestion knobs
     per_listing_limit: int
+    listing_stop_after_unchanged: int
 
     # Comment knobs
     replace_more_limit: int
@@ -28,12 +43,48 @@ class Settings:
 
     # Throttle
     sleep_seconds_between_posts: float
+    requests_per_minute: float
+
+    # Writer batching
+    write_flush_rows: int
+    write_flush_seconds: float
+
+    # Concurrency
+    ingest_workers: int
+    comment_workers: int
+    progress_every_seconds: float
+
+    # Comment refresh queue (see refresh_queue.py)
+    subreddit_weights: Dict[str, float]
+    refresh_lease_batch: int
+    refresh_lease_seconds: int
+    refresh_recent_days: int
+    refresh_min_interval_seconds: int
+    refresh_backoff_base_seconds: int
+    refresh_backoff_max_seconds: int
+
+    # Streaming NLP (see NLP/stream_scorer.py)
+    stream_scoring: bool
+    stream_batch_size: int
+    stream_poll_seconds: float
+
+    # Database maintenance (see maintenance.py)
+    maint_wal_limit_mb: int
+    maint_checkpoint_timeout_seconds: float
+    maint_analysis_limit: int
+    maint_vacuum_pages: int
 
     # Export
     export_dir: str
+    export_format: str
+    export_compression: str
+    export_incremental: bool
+    export_chunk_size: int
 
 
 def load_settings() -> Settings:
+    _load_dotenv_once()
+
     # You can add/remove here freely.
     # Keys must match subreddit names WITHOUT "r/" prefix.
     subreddits = {
@@ -54,6 +105,12 @@ def load_settings() -> Settings:
         "VirginVoyages": "Virgin",
     }
 
+    # Comment-refresh priority multipliers (default 1.0). Brand subs first, catch-all subs last.
+    subreddit_weights = {
+        "Cruise": 0.8,
+        "Cruises": 0.8,
+    }
+
     client_id = os.getenv("REDDIT_CLIENT_ID", "").strip()
     client_secret = os.getenv("REDDIT_CLIENT_SECRET", "").strip()
     user_agent = os.getenv("REDDIT_USER_AGENT", "").strip() or "RoyalCaribbeanNLP:v0.1"
@@ -61,22 +118,87 @@ def load_settings() -> Settings:
     sqlite_path = os.getenv("SQLITE_PATH", "cruise_reddit.db").strip()
 
     per_listing_limit = int(os.getenv("PER_LISTING_LIMIT", "1000"))
+    # stop paging a listing after this many stored-and-unchanged posts in a row (0 = never)
+    listing_stop_after_unchanged = int(os.getenv("LISTING_STOP_AFTER_UNCHANGED", "100"))
     replace_more_limit = int(os.getenv("REPLACE_MORE_LIMIT", "32"))
     max_comments_per_post = int(os.getenv("MAX_COMMENTS_PER_POST", "2000"))
 
     sleep_seconds_between_posts = float(os.getenv("SLEEP_BETWEEN_POSTS", "0.2"))
+    # Reddit allows ~100 requests/min per OAuth client; stay a little under it
+    requests_per_minute = float(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "90"))
+    ingest_workers = int(os.getenv("INGEST_WORKERS", "4"))
+
+    write_flush_rows = int(os.getenv("WRITE_FLUSH_ROWS", "2000"))
+    write_flush_seconds = float(os.getenv("WRITE_FLUSH_SECONDS", "2.0"))
+    comment_workers = int(os.getenv("COMMENT_WORKERS", "4"))
+    progress_every_seconds = float(os.getenv("PROGRESS_EVERY_SECONDS", "30"))
+
+    refresh_lease_batch = int(os.getenv("REFRESH_LEASE_BATCH", "50"))
+    refresh_lease_seconds = int(os.getenv("REFRESH_LEASE_SECONDS", "900"))
+    refresh_recent_days = int(os.getenv("REFRESH_RECENT_DAYS", "14"))
+    refresh_min_interval_seconds = int(os.getenv("REFRESH_MIN_INTERVAL_SECONDS", "1800"))
+    refresh_backoff_base_seconds = int(os.getenv("REFRESH_BACKOFF_BASE_SECONDS", "300"))
+    refresh_backoff_max_seconds = int(os.getenv("REFRESH_BACKOFF_MAX_SECONDS", "86400"))
+
+    reddit_oauth_url = os.getenv("REDDIT_OAUTH_URL", "").strip()
+    reddit_url = os.getenv("REDDIT_URL", "").strip()
+    reddit_record_path = os.getenv("REDDIT_RECORD_PATH", "").strip()
+
+    # 1 = queue new/changed posts and comments for NLP/stream_scorer.py as they are written
+    stream_scoring = os.getenv("STREAM_SCORING", "0").strip() not in ("0", "false", "no", "")
+    stream_batch_size = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+    stream_poll_seconds = float(os.getenv("STREAM_POLL_SECONDS", "1.0"))
+
+    # -wal size kept after a checkpoint; how long a TRUNCATE checkpoint may wait; ANALYZE sample
+    # size per index (0 = exact); free pages released per stage boundary
+    maint_wal_limit_mb = int(os.getenv("MAINT_WAL_LIMIT_MB", "64"))
+    maint_checkpoint_timeout_seconds = float(os.getenv("MAINT_CHECKPOINT_TIMEOUT_SECONDS", "5"))
+    maint_analysis_limit = int(os.getenv("MAINT_ANALYSIS_LIMIT", "2000"))
+    maint_vacuum_pages = int(os.getenv("MAINT_VACUUM_PAGES", "10000"))
 
     export_dir = os.getenv("EXPORT_DIR", "exports").strip()
+    export_format = os.getenv("EXPORT_FORMAT", "csv").strip().lower()            # csv | parquet | arrow
+    export_compression = os.getenv("EXPORT_COMPRESSION", "none").strip().lower()  # none | gzip | zstd
+    export_incremental = os.getenv("EXPORT_INCREMENTAL", "0").strip() not in ("0", "false", "no")
+    export_chunk_size = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
 
     return Settings(
         reddit_client_id=client_id,
         reddit_client_secret=client_secret,
         reddit_user_agent=user_agent,
+        reddit_oauth_url=reddit_oauth_url,
+        reddit_url=reddit_url,
+        reddit_record_path=reddit_record_path,
         sqlite_path=sqlite_path,
         subreddits=subreddits,
         per_listing_limit=per_listing_limit,
+        listing_stop_after_unchanged=listing_stop_after_unchanged,
         replace_more_limit=replace_more_limit,
         max_comments_per_post=max_comments_per_post,
         sleep_seconds_between_posts=sleep_seconds_between_posts,
+        requests_per_minute=requests_per_minute,
+        write_flush_rows=write_flush_rows,
+        write_flush_seconds=write_flush_seconds,
+        ingest_workers=ingest_workers,
+        comment_workers=comment_workers,
+        progress_every_seconds=progress_every_seconds,
+        subreddit_weights=subreddit_weights,
+        refresh_lease_batch=refresh_lease_batch,
+        refresh_lease_seconds=refresh_lease_seconds,
+        refresh_recent_days=refresh_recent_days,
+        refresh_min_interval_seconds=refresh_min_interval_seconds,
+        refresh_backoff_base_seconds=refresh_backoff_base_seconds,
+        refresh_backoff_max_seconds=refresh_backoff_max_seconds,
+        stream_scoring=stream_scoring,
+        stream_batch_size=stream_batch_size,
+        stream_poll_seconds=stream_poll_seconds,
+        maint_wal_limit_mb=maint_wal_limit_mb,
+        maint_checkpoint_timeout_seconds=maint_checkpoint_timeout_seconds,
+        maint_analysis_limit=maint_analysis_limit,
+        maint_vacuum_pages=maint_vacuum_pages,
         export_dir=export_dir,
+        export_format=export_format,
+        export_compression=export_compression,
+        export_incremental=export_incremental,
+        export_chunk_size=export_chunk_size,
     )
@@ -0,0 +1,58 @@
+# cruiseNLP/tests/test_columnar.py
+"""
+The NumPy engine (api/columnar.py) against the SQLite queries it stands in for,
+on a small generated database (bench/analytics.py). api/bench_columnar.py runs
+the same sweep at benchmark scale.
+
+Run from cruiseNLP/:
+  python -m pytest tests
+"""
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from api import queries_duckdb as QD  # noqa: E402
+from api.bench_columnar import MISSING_ID, parity_sweep  # noqa: E402
+from api.columnar import ROUTES, Columns  # noqa: E402
+from bench.analytics import generate  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("columnar") / "bench.db")
+    generate(path, 4000, seed=11)
+    return path
+
+
+@pytest.fixture(scope="module")
+def sq(db_path):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def cols(db_path):
+    loader = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return Columns(loader)
+    finally:
+        loader.close()
+
+
+def test_every_routed_query_has_a_route():
+    assert set(QD.ROUTED) <= set(ROUTES)
+
+
+def test_routes_match_sqlite(sq, cols):
+    checks, mismatches = parity_sweep(sq, cols, 10)
+    assert checks > len(QD.ROUTED)
+    assert mismatches == []
+
+
+def test_unknown_entity_is_empty(cols):
+    assert ROUTES["PORT_TREND"](cols, MISSING_ID) == []
+    assert ROUTES["LINE_PORTS"](cols, MISSING_ID, 10) == []